@@ -1,5 +1,6 @@
 # manage.py
 
+import click
 from src.models.user import User, db
 
 def register_commands(app):
@@ -16,4 +17,1732 @@ def register_commands(app):
 
             user.is_admin = True
             db.session.commit()
-            print(f"Sucesso! Usuário '{user.username}' ({user.email}) foi promovido a administrador.")
\ No newline at end of file
+            from src.services.identidade import cache_identidade
+            cache_identidade.invalidar(user.id)
+            print(f"Sucesso! Usuário '{user.username}' ({user.email}) foi promovido a administrador.")
+
+    @app.cli.command("rebuild-stats")
+    def rebuild_stats_command():
+        """Reconstrói o resumo de estatísticas a partir da tabela de ninhos."""
+        from src.models.estatisticas import reconstruir_resumo
+        with app.app_context():
+            reconstruir_resumo()
+            print("Resumo de estatísticas reconstruído.")
+
+    @app.cli.command("verify-stats")
+    @click.option("--fix", is_flag=True, help="Reconstrói o resumo se houver divergências.")
+    @click.option("--lotes", default=50, show_default=True,
+                  help="Lotes de gravações aleatórias conferidos antes num banco temporário (0 pula).")
+    @click.option("--semente", default=42, show_default=True)
+    def verify_stats_command(fix, lotes, semente):
+        """
+        Compara o resumo de estatísticas com os agregados recalculados. Antes,
+        num banco temporário, roda `lotes` lotes aleatórios de inserções,
+        alterações e remoções de ninhos (alguns desfeitos com rollback) e
+        confere o resumo depois de cada um.
+        """
+        from src.models.estatisticas import verificar_resumo, reconstruir_resumo
+        if lotes:
+            import os
+            import random
+            import tempfile
+            from src.main import create_app
+            from src.models.ninho import Ninho
+            from src.services.dados_sinteticos import REGIOES, RISCOS, STATUS, gerar_dados, linhas_ninhos
+
+            rng = random.Random(semente)
+            alteracoes = {
+                'regiao': lambda: rng.choice(REGIOES)[0],
+                'quantidade_ovos': lambda: rng.randint(1, 180),
+                'status': lambda: rng.choice(STATUS)[0],
+                'risco': lambda: rng.choice(RISCOS)[0],
+                'predadores': lambda: rng.random() < 0.5,
+            }
+            with tempfile.TemporaryDirectory() as pasta:
+                temporario = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(pasta, 'resumo.db')}",
+                                         'RATE_LIMIT_ENABLED': False,
+                                         'IDENTITY_CACHE_SIGNAL_FILE': os.path.join(pasta, 'identidade.sinal')})
+                with temporario.app_context():
+                    db.create_all()
+                    gerar_dados(3, 300, semente=semente)
+                    usuarios = [user.id for user in User.query.all()]
+                    novos = linhas_ninhos(rng, lotes * 20, f'carga-{semente}')
+                    for numero in range(1, lotes + 1):
+                        ids = [id_ for (id_,) in db.session.query(Ninho.id)]
+                        desfeito = numero % 5 == 0
+                        # Um ninho pode ser alterado mais de uma vez e removido no mesmo lote, e o
+                        # lote pode ter vários flushes antes do commit
+                        for _ in range(rng.randint(1, 20)):
+                            operacao = rng.choice(('inserir', 'alterar', 'alterar', 'remover')) if ids else 'inserir'
+                            if operacao == 'inserir':
+                                db.session.add(Ninho(usuario_id=rng.choice(usuarios), **next(novos)))
+                            elif operacao == 'alterar':
+                                ninho = db.session.get(Ninho, rng.choice(ids))
+                                if ninho is not None:
+                                    for campo in rng.sample(sorted(alteracoes), rng.randint(1, 3)):
+                                        setattr(ninho, campo, alteracoes[campo]())
+                            else:
+                                ninho = db.session.get(Ninho, ids.pop(rng.randrange(len(ids))))
+                                db.session.delete(ninho)
+                            if rng.random() < 0.3:
+                                db.session.flush()
+                        if desfeito:
+                            db.session.flush()
+                            db.session.rollback()
+                        else:
+                            db.session.commit()
+                        divergencias = verificar_resumo()
+                        for (dimensao, chave), (armazenado, recalculado) in sorted(divergencias.items()):
+                            print(f"lote {numero}{' (rollback)' if desfeito else ''}: {dimensao}[{chave}]: "
+                                  f"armazenado={armazenado} recalculado={recalculado}")
+                        if divergencias:
+                            db.engine.dispose()
+                            raise SystemExit(1)
+                    total = Ninho.query.count()
+                    db.engine.dispose()
+            print(f"Resumo exato depois de cada um dos {lotes} lotes aleatórios ({total} ninhos no banco temporário).")
+
+        with app.app_context():
+            divergencias = verificar_resumo()
+            if not divergencias:
+                print("Resumo de estatísticas consistente.")
+                return
+            for (dimensao, chave), (armazenado, recalculado) in sorted(divergencias.items()):
+                print(f"{dimensao}[{chave}]: armazenado={armazenado} recalculado={recalculado}")
+            if fix:
+                reconstruir_resumo()
+                print("Resumo reconstruído.")
+            else:
+                raise SystemExit(1)
+
+    @app.cli.command("rebuild-ranking")
+    def rebuild_ranking_command():
+        """Reconstrói a pontuação materializada do ranking."""
+        from src.models.pontuacao import reconstruir_pontuacao
+        with app.app_context():
+            reconstruir_pontuacao()
+            print("Pontuação do ranking reconstruída.")
+
+    @app.cli.command("verify-ranking")
+    @click.option("--fix", is_flag=True, help="Reconstrói a pontuação se houver divergências.")
+    def verify_ranking_command(fix):
+        """Compara a pontuação materializada com o cálculo SQL do ranking."""
+        from src.models.pontuacao import verificar_pontuacao, reconstruir_pontuacao
+        with app.app_context():
+            divergencias = verificar_pontuacao()
+            if not divergencias:
+                print("Pontuação do ranking consistente.")
+                return
+            for periodo, usuarios in divergencias.items():
+                for user_id, (armazenado, calculado) in sorted(usuarios.items()):
+                    print(f"{periodo} usuario={user_id}: armazenado={armazenado} sql={calculado}")
+            if fix:
+                reconstruir_pontuacao()
+                print("Pontuação reconstruída.")
+            else:
+                raise SystemExit(1)
+
+    @app.cli.command("send-mail-queue")
+    def send_mail_queue_command():
+        """Envia agora todos os e-mails prontos da fila de saída."""
+        from src.services.fila_email import fila_email
+        with app.app_context():
+            total = fila_email.processar_tudo()
+            print(f"{total} e-mail(s) processado(s).")
+
+    @app.cli.command("verify-mail-queue")
+    @click.option("--mensagens", default=40, show_default=True, help="Mensagens disputadas por workers simultâneos.")
+    @click.option("--workers", default=4, show_default=True)
+    def verify_mail_queue_command(mensagens, workers):
+        """
+        Fila de e-mails contra um servidor SMTP local de teste, num banco
+        temporário: entrega; conexão recusada, reagendamento com backoff
+        exponencial e entrega quando o servidor volta; desistência após
+        MAIL_QUEUE_MAX_RETRIES; e `workers` threads esvaziando a fila ao mesmo
+        tempo sem que nenhuma mensagem chegue duas vezes. O relógio da fila é
+        adiantado direto na coluna proxima_tentativa, sem esperar o backoff.
+        """
+        import os
+        import socket
+        import socketserver
+        import tempfile
+        import threading
+        from collections import Counter
+        from datetime import datetime
+        from src.main import create_app
+        from src.models.mensagem import EmailPendente
+        from src.services.fila_email import fila_email
+
+        recebidas = []
+        trava = threading.Lock()
+
+        class SessaoSMTP(socketserver.StreamRequestHandler):
+            """O mínimo do SMTP que o smtplib usa; guarda o assunto de cada mensagem recebida."""
+
+            def responder(self, linha):
+                self.wfile.write(linha.encode() + b'\r\n')
+
+            def handle(self):
+                self.responder('220 localhost SMTP de teste')
+                while linha := self.rfile.readline():
+                    comando = linha.decode('ascii', 'replace').strip().upper()
+                    if comando == 'DATA':
+                        self.responder('354 termine com "."')
+                        cabecalhos = []
+                        while (linha := self.rfile.readline()) not in (b'.\r\n', b''):
+                            cabecalhos.append(linha.decode('utf-8', 'replace'))
+                        assunto = next((c.split(':', 1)[1].strip() for c in cabecalhos if c.lower().startswith('subject:')), None)
+                        with trava:
+                            recebidas.append(assunto)
+                        self.responder('250 recebida')
+                    elif comando == 'QUIT':
+                        self.responder('221 até logo')
+                        return
+                    else:
+                        self.responder('250 ok')
+
+        class ServidorSMTP(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        def subir(porta):
+            servidor = ServidorSMTP(('127.0.0.1', porta), SessaoSMTP)
+            threading.Thread(target=servidor.serve_forever, daemon=True).start()
+            return servidor
+
+        def derrubar(servidor):
+            # Porta fechada: a conexão seguinte é recusada
+            servidor.shutdown()
+            servidor.server_close()
+
+        with socket.socket() as livre:
+            livre.bind(('127.0.0.1', 0))
+            porta = livre.getsockname()[1]
+
+        falhas = []
+
+        def conferir(condicao, descricao):
+            print(f"{'ok' if condicao else 'FALHOU'} {descricao}")
+            if not condicao:
+                falhas.append(descricao)
+
+        with tempfile.TemporaryDirectory() as pasta:
+            temporario = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(pasta, 'fila.db')}",
+                                     'RATE_LIMIT_ENABLED': False,
+                                     'IDENTITY_CACHE_SIGNAL_FILE': os.path.join(pasta, 'identidade.sinal'),
+                                     'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': porta, 'MAIL_USE_TLS': False,
+                                     'MAIL_USERNAME': None, 'MAIL_PASSWORD': None,
+                                     'MAIL_DEFAULT_SENDER': 'fila@exemplo.org',
+                                     'MAIL_QUEUE_WORKERS': 0, 'MAIL_QUEUE_BATCH_SIZE': 5,
+                                     'MAIL_QUEUE_MAX_RETRIES': 3, 'MAIL_QUEUE_RETRY_BASE': 30})
+            base = temporario.config['MAIL_QUEUE_RETRY_BASE']
+
+            def enfileirar(prefixo, quantidade):
+                return [fila_email.enfileirar(f'{prefixo}-{numero}', ['voluntario@exemplo.org'], 'Corpo').id
+                        for numero in range(quantidade)]
+
+            def estado(ids):
+                db.session.expire_all()
+                return [db.session.get(EmailPendente, email_id) for email_id in ids]
+
+            def adiantar_relogio(ids):
+                EmailPendente.query.filter(EmailPendente.id.in_(ids)).update(
+                    {'proxima_tentativa': datetime.utcnow()}, synchronize_session=False)
+                db.session.commit()
+
+            servidor = subir(porta)
+            try:
+                with temporario.app_context():
+                    db.create_all()
+
+                    entregues = enfileirar('entrega', 3)
+                    fila_email.processar_tudo()
+                    conferir(all(email.status == 'enviado' for email in estado(entregues))
+                             and sorted(recebidas) == ['entrega-0', 'entrega-1', 'entrega-2'],
+                             "entrega: 3 mensagens enviadas e recebidas pelo servidor")
+
+                    derrubar(servidor)
+                    reenviadas = enfileirar('reenvio', 2)
+                    fila_email.processar_tudo()
+                    primeira = estado(reenviadas)
+                    espera = (primeira[0].proxima_tentativa - datetime.utcnow()).total_seconds()
+                    conferir(all(email.status == 'pendente' and email.tentativas == 1 and email.ultimo_erro
+                                 for email in primeira) and base - 5 < espera <= base,
+                             f"conexão recusada: reagendadas para daqui a {espera:.0f} s (base {base} s)")
+                    conferir(fila_email.processar_tudo() == 0, "antes do backoff vencer, nada é reenviado")
+                    adiantar_relogio(reenviadas)
+                    fila_email.processar_tudo()
+                    espera = (estado(reenviadas)[0].proxima_tentativa - datetime.utcnow()).total_seconds()
+                    conferir(2 * base - 5 < espera <= 2 * base, f"segunda recusa: backoff dobra para {espera:.0f} s")
+
+                    desistencias = enfileirar('desiste', 1)
+                    for _ in range(temporario.config['MAIL_QUEUE_MAX_RETRIES']):
+                        adiantar_relogio(desistencias)
+                        fila_email.processar_tudo()
+                    conferir(estado(desistencias)[0].status == 'falhou',
+                             f"desistência após {temporario.config['MAIL_QUEUE_MAX_RETRIES']} tentativas")
+
+                    servidor = subir(porta)
+                    adiantar_relogio(reenviadas + desistencias)
+                    fila_email.processar_tudo()
+                    conferir(all(email.status == 'enviado' for email in estado(reenviadas))
+                             and Counter(recebidas)['reenvio-0'] == Counter(recebidas)['reenvio-1'] == 1,
+                             "servidor de volta: as reagendadas chegam uma vez")
+                    conferir(estado(desistencias)[0].status == 'falhou' and 'desiste-0' not in recebidas,
+                             "a mensagem descartada não é reenviada")
+
+                    disputadas = enfileirar('disputa', mensagens)
+
+                def esvaziar():
+                    with temporario.app_context():
+                        fila_email.processar_tudo()
+
+                threads = [threading.Thread(target=esvaziar) for _ in range(workers)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                with temporario.app_context():
+                    repetidas = [assunto for assunto, vezes in Counter(recebidas).items() if vezes > 1]
+                    conferir(all(email.status == 'enviado' for email in estado(disputadas)) and not repetidas
+                             and sum(assunto.startswith('disputa-') for assunto in recebidas) == mensagens,
+                             f"{workers} workers simultâneos: {mensagens} mensagens, cada uma recebida uma vez"
+                             + (f" (repetidas: {', '.join(repetidas)})" if repetidas else ''))
+                    db.engine.dispose()
+            finally:
+                derrubar(servidor)
+
+        if falhas:
+            raise SystemExit(1)
+
+    @app.cli.command("clean-uploads")
+    def clean_uploads_command():
+        """Apaga as sessões de upload retomável abandonadas (mais velhas que UPLOAD_SESSION_TTL)."""
+        from src.services.envios import envios
+        print(f"{envios.limpar_expiradas()} sessão(ões) de upload apagada(s).")
+
+    @app.cli.command("rebuild-map-grid")
+    def rebuild_map_grid_command():
+        """Reconstrói a grade de agrupamentos do mapa."""
+        from src.models.mapa import reconstruir_grade
+        with app.app_context():
+            reconstruir_grade()
+            print("Grade do mapa reconstruída.")
+
+    @app.cli.command("verify-map-grid")
+    @click.option("--fix", is_flag=True, help="Reconstrói a grade se houver divergências.")
+    def verify_map_grid_command(fix):
+        """Confere contagem, somas e centroide de cada célula da grade contra os ninhos com coordenadas."""
+        from src.models.mapa import verificar_grade, reconstruir_grade
+        with app.app_context():
+            divergencias = verificar_grade()
+            if not divergencias:
+                print("Grade do mapa consistente.")
+                return
+            for zoom, celulas in sorted(divergencias.items()):
+                print(f"zoom {zoom}: {len(celulas)} célula(s) divergente(s)")
+                for chave, grade, esperado in celulas[:5]:
+                    print(f"  {chave}: grade={grade} esperado={esperado}")
+            if fix:
+                reconstruir_grade()
+                print("Grade reconstruída.")
+            else:
+                raise SystemExit(1)
+
+    @app.cli.command("bench-password-hash")
+    @click.option("--metodo", "metodos", multiple=True, help="Método do Werkzeug a medir (repetível). Padrão: o configurado.")
+    @click.option("--concorrencia", default=16, show_default=True, help="Logins simultâneos.")
+    @click.option("--logins", default=64, show_default=True, help="Total de verificações por método.")
+    @click.option("--workers", type=int, default=None, help="Tamanho do pool de hash (0 = na thread da requisição). Padrão: o configurado.")
+    def bench_password_hash_command(metodos, concorrencia, logins, workers):
+        """Mede a vazão de verificação de senha (o custo dominante do login) com o pool configurado."""
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from src.services.senhas import ServicoSenhas
+        for metodo in metodos or (app.config['PASSWORD_HASH_METHOD'],):
+            servico = ServicoSenhas()
+            servico.configurar(metodo, workers=app.config['PASSWORD_HASH_WORKERS'] if workers is None else workers,
+                               max_pendentes=concorrencia)
+            hash_senha = servico.gerar('senha-de-teste')
+
+            def login():
+                inicio = time.perf_counter()
+                servico.verificar(hash_senha, 'senha-de-teste')
+                return time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concorrencia) as clientes:
+                latencias = sorted(clientes.map(lambda _: login(), range(logins)))
+            duracao = time.perf_counter() - inicio
+            p95 = latencias[int(len(latencias) * 0.95) - 1]
+            print(f"{servico.prefixo(metodo)}: {logins / duracao:.1f} logins/s, "
+                  f"p50 {latencias[len(latencias) // 2] * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms")
+
+    @app.cli.command("import-nests")
+    @click.argument("arquivo", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--email", required=True, help="Email do voluntário dono dos ninhos.")
+    @click.option("--lote", default=1000, show_default=True, help="Linhas por transação.")
+    def import_nests_command(arquivo, email, lote):
+        """Importa ninhos de um arquivo .json, .csv ou .xlsx (reimportar o mesmo arquivo é seguro)."""
+        from src.services.importacao import importar_ninhos, ler_arquivo, ArquivoInvalido, ImportacaoInterrompida
+        with app.app_context():
+            user = User.query.filter_by(email=email).first()
+            if not user:
+                print(f"Erro: Usuário com email '{email}' não encontrado.")
+                raise SystemExit(1)
+            falha = None
+            try:
+                with open(arquivo, 'rb') as entrada:
+                    relatorio = importar_ninhos(ler_arquivo(entrada, arquivo), user.id, lote)
+            except ImportacaoInterrompida as e:
+                relatorio, falha = e.relatorio, e
+            except ArquivoInvalido as e:
+                print(f"Erro: {e}")
+                raise SystemExit(1)
+            for erro in relatorio['erros']:
+                print(f"linha {erro['linha']}: {erro['erro']}")
+            print(f"{relatorio['inseridos']} inserido(s), {relatorio['ignorados']} ignorado(s), "
+                  f"{len(relatorio['erros'])} com erro.")
+            if falha is not None:
+                raise SystemExit(1)
+
+    @app.cli.command("db-upgrade")
+    @click.option("--ate", type=int, default=None, help="Aplica as migrações só até esta versão.")
+    def db_upgrade_command(ate):
+        """Cria as tabelas, aplica as migrações pendentes e monta os dados derivados."""
+        from src.models.esquema import preparar_banco
+        with app.app_context():
+            aplicadas = preparar_banco(ate)
+            print(f"Migrações aplicadas: {', '.join(map(str, aplicadas))}." if aplicadas else "Esquema já atualizado.")
+
+    @app.cli.command("db-status")
+    def db_status_command():
+        """Lista as migrações de esquema e se já foram aplicadas."""
+        from src.models.esquema import MIGRACOES, versoes_aplicadas
+        with app.app_context():
+            aplicadas = versoes_aplicadas()
+            for versao, descricao, _ in MIGRACOES:
+                print(f"[{'x' if versao in aplicadas else ' '}] {versao:03d} {descricao}")
+
+    @app.cli.command("verify-indexes")
+    def verify_indexes_command():
+        """Roda EXPLAIN nas consultas principais e falha se alguma ler uma tabela ou um índice inteiro."""
+        from src.models.planos import verificar_planos
+        with app.app_context():
+            problemas = verificar_planos()
+            if not problemas:
+                print("Todas as consultas monitoradas usam índices.")
+                return
+            for nome, varreduras in problemas.items():
+                print(f"{nome}: {'; '.join(varreduras)}")
+            raise SystemExit(1)
+
+    @app.cli.command("verify-pagination")
+    @click.option("--limite", default=50, show_default=True, help="Ninhos por página.")
+    def verify_pagination_command(limite):
+        """
+        Percorre as listagens paginadas por cursor (todas, de um voluntário e de
+        uma região) e falha se a ordem quebrar ou algum ninho repetir ou faltar.
+        Ninhos com a mesma data_registro são inseridos numa fronteira de página
+        e desfeitos ao final (nada é gravado). Mede também a página funda.
+        """
+        import time
+        from datetime import datetime
+        from sqlalchemy import func
+        from src.models.ninho import Ninho
+        from src.services.paginacao import paginar_ninhos
+
+        def percorrer(*filtros):
+            chaves, cursor, paginas = [], None, []
+            while True:
+                args = {'limit': str(limite), 'fields': 'id,data_registro'}
+                if cursor:
+                    args['cursor'] = cursor
+                inicio = time.perf_counter()
+                pagina = paginar_ninhos(args, *filtros)
+                paginas.append(time.perf_counter() - inicio)
+                chaves += [(datetime.fromisoformat(n['data_registro']), n['id']) for n in pagina['ninhos']]
+                cursor = pagina['proximo_cursor']
+                if not cursor:
+                    return chaves, paginas
+
+        with app.app_context():
+            primeiro = Ninho.query.order_by(Ninho.data_registro.desc(), Ninho.id.desc()).offset(limite - 3).first()
+            if primeiro is None:
+                print(f"Erro: o banco precisa de ao menos {limite} ninhos (use seed-data).")
+                raise SystemExit(1)
+            # Empates de data_registro atravessando a fronteira entre a primeira e a segunda página
+            for numero in range(7):
+                db.session.add(Ninho(regiao=primeiro.regiao, quantidade_ovos=1, status='intacto', risco='estável',
+                                     dias_para_eclosao=10, usuario_id=primeiro.usuario_id,
+                                     data_registro=primeiro.data_registro, id_cliente=f'verify-pagination-{numero}'))
+            db.session.flush()
+            falhou = False
+            try:
+                for titulo, filtros in (('todos', ()), ('voluntário', (Ninho.usuario_id == primeiro.usuario_id,)),
+                                        ('região', (Ninho.regiao == primeiro.regiao,))):
+                    chaves, paginas = percorrer(*filtros)
+                    esperado = db.session.query(func.count(Ninho.id)).filter(*filtros).scalar()
+                    ordenada = all(a > b for a, b in zip(chaves, chaves[1:]))
+                    repetidos = len(chaves) - len({chave[1] for chave in chaves})
+                    ok = ordenada and not repetidos and len(chaves) == esperado
+                    falhou |= not ok
+                    print(f"{titulo}: {len(chaves)} de {esperado} ninhos em {len(paginas)} páginas, "
+                          f"{'em ordem' if ordenada else 'FORA DE ORDEM'}, {repetidos} repetido(s); "
+                          f"primeira página {paginas[0] * 1000:.2f} ms, última {paginas[-1] * 1000:.2f} ms")
+            finally:
+                db.session.rollback()
+            if falhou:
+                raise SystemExit(1)
+
+    @app.cli.command("verify-query-count")
+    @click.option("--usuarios", default=60, show_default=True, help="Voluntários no banco maior.")
+    @click.option("--ninhos", default=3000, show_default=True, help="Ninhos no banco maior.")
+    def verify_query_count_command(usuarios, ninhos):
+        """
+        Guarda contra N+1: conta os comandos SQL de cada listagem num banco
+        temporário pequeno e de novo depois de multiplicar usuários e ninhos, e
+        falha se a contagem mudar. As buscas geográficas, que ampliam o raio em
+        rodadas, só não podem crescer (num banco mais denso fazem menos rodadas).
+        O banco configurado não é tocado.
+        """
+        import os
+        import tempfile
+        from sqlalchemy import event
+        from src.main import create_app
+        from src.services.cache_respostas import cache_respostas
+        from src.services.dados_sinteticos import gerar_dados
+
+        # (rota, contagem exata); False: a contagem só não pode crescer
+        rotas = [('/api/ninhos?limit=500', True),
+                 ('/api/relatorios/ninhos/data?limit=500', True),
+                 ('/api/relatorios/ninhos/data?limit=500&format=columnar', True),
+                 ('/api/admin/users', True),
+                 ('/api/ranking', True),
+                 ('/api/ranking?periodo=mes&limite=50', True),
+                 ('/api/ranking/estatisticas', True),
+                 ('/api/ninhos/area?min_lat=-90&min_lon=-180&max_lat=90&max_lon=180&limite=500', True),
+                 ('/api/busca?q=voluntario&limite=50', True),
+                 ('/api/ninhos/proximos?lat=-2.55&lon=-52.05&k=200', False),
+                 ('/api/ninhos/raio?lat=-2.55&lon=-52.05&raio_km=50&limite=500', False)]
+        pequeno = (max(2, usuarios // 10), max(20, ninhos // 10))
+
+        with tempfile.TemporaryDirectory() as pasta:
+            temporario = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(pasta, 'contagem.db')}",
+                                     'RATE_LIMIT_ENABLED': False, 'RESPONSE_CACHE_BACKEND': 'memoria'})
+            cliente = temporario.test_client()
+            contagem = [0]
+
+            def contar(*_):
+                contagem[0] += 1
+
+            def medir(quantidade_usuarios, quantidade_ninhos):
+                with temporario.app_context():
+                    gerar_dados(quantidade_usuarios, quantidade_ninhos, admins=1)
+                    usuario_id = User.query.filter_by(username='voluntario0001').one().id
+                with cliente.session_transaction() as sessao:
+                    sessao['user_id'] = usuario_id
+                # Uma volta fora da contagem: preparo do banco e caches do processo (identidade, FTS)
+                for rota, _ in rotas:
+                    cliente.get(rota)
+                cache_respostas.backend.limpar()
+                medidas = {}
+                for rota, _ in rotas:
+                    contagem[0] = 0
+                    resposta = cliente.get(rota)
+                    medidas[rota] = (contagem[0], resposta.status_code, len(resposta.get_data()))
+                return medidas
+
+            with temporario.app_context():
+                db.create_all()
+                event.listen(db.engine, 'before_cursor_execute', contar)
+            try:
+                antes, depois = medir(*pequeno), medir(usuarios, ninhos)
+            finally:
+                with temporario.app_context():
+                    event.remove(db.engine, 'before_cursor_execute', contar)
+                    db.engine.dispose()
+
+        falhou = False
+        print(f"{pequeno[0]} -> {usuarios} voluntários, {pequeno[1]} -> {ninhos} ninhos")
+        for rota, exata in rotas:
+            (comandos, status, tamanho), (comandos_depois, status_depois, tamanho_depois) = antes[rota], depois[rota]
+            ok = status == status_depois == 200 and (comandos_depois == comandos if exata else comandos_depois <= comandos)
+            falhou |= not ok
+            print(f"{'ok' if ok else 'FALHOU'} {rota}: {comandos} -> {comandos_depois} comando(s) SQL, "
+                  f"{tamanho} -> {tamanho_depois} bytes")
+        if falhou:
+            raise SystemExit(1)
+
+    @app.cli.command("verify-identity-cache")
+    @click.option("--rodadas", default=20, show_default=True, help="Desativações e reativações seguidas, sem pausa.")
+    def verify_identity_cache_command(rodadas):
+        """
+        Revogação entre workers: num banco temporário, um segundo
+        CacheIdentidade (outro worker, que só compartilha o arquivo de sinal)
+        guarda a identidade de um voluntário enquanto o app o desativa, troca a
+        senha e o remove pelas rotas; cada mudança tem de valer já na consulta
+        seguinte do outro worker. O banco configurado não é tocado.
+        """
+        import os
+        import tempfile
+        from itsdangerous import URLSafeTimedSerializer
+        from sqlalchemy import event
+        from src.main import create_app
+        from src.services.dados_sinteticos import gerar_usuarios
+        from src.services.identidade import CacheIdentidade
+
+        with tempfile.TemporaryDirectory() as pasta:
+            sinal = os.path.join(pasta, 'identidade.sinal')
+            temporario = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(pasta, 'identidade.db')}",
+                                     'IDENTITY_CACHE_SIGNAL_FILE': sinal, 'RATE_LIMIT_ENABLED': False})
+            outro = CacheIdentidade()
+            outro.arquivo_sinal, outro.ttl = sinal, 3600
+            consultas = [0]
+
+            def contar(*_):
+                consultas[0] += 1
+
+            def consultas_ao_obter(user_id):
+                db.session.remove()  # sessão nova, como em cada requisição do outro worker
+                consultas[0] = 0
+                identidade = outro.obter(user_id)
+                return identidade, consultas[0]
+
+            falhas = []
+            with temporario.app_context():
+                db.create_all()
+                event.listen(db.engine, 'before_cursor_execute', contar)
+                admin_id, voluntario_id = gerar_usuarios(2, 'senha123', admins=1)
+                email = db.session.get(User, voluntario_id).email
+            administrador, voluntario = temporario.test_client(), temporario.test_client()
+            for cliente, user_id in ((administrador, admin_id), (voluntario, voluntario_id)):
+                with cliente.session_transaction() as sessao:
+                    sessao['user_id'] = user_id
+            try:
+                with temporario.app_context():
+                    ativo = True
+                    for rodada in range(rodadas):
+                        identidade, _ = consultas_ao_obter(voluntario_id)  # em cache no outro worker
+                        if identidade.ativo != ativo:
+                            falhas.append(f"rodada {rodada}: outro worker viu ativo={identidade.ativo} antes da mudança")
+                        ativo = not ativo
+                        administrador.put(f'/api/admin/users/{voluntario_id}', json={'ativo': ativo})
+                        identidade, _ = consultas_ao_obter(voluntario_id)
+                        if identidade.ativo != ativo:
+                            falhas.append(f"rodada {rodada}: desativação/reativação não chegou ao outro worker")
+                    if not ativo:
+                        administrador.put(f'/api/admin/users/{voluntario_id}', json={'ativo': True})
+                    if voluntario.get('/api/auth/me').status_code != 200:
+                        falhas.append("voluntário reativado não conseguiu acessar /api/auth/me")
+
+                    consultas_ao_obter(voluntario_id)
+                    _, em_cache = consultas_ao_obter(voluntario_id)
+                    token = URLSafeTimedSerializer(temporario.config['SECRET_KEY']).dumps(email, salt='email-confirm-salt')
+                    voluntario.post('/api/auth/reset-password', json={'token': token, 'password': 'outra-senha'})
+                    _, depois_da_troca = consultas_ao_obter(voluntario_id)
+                    if em_cache or not depois_da_troca:
+                        falhas.append("troca de senha não esvaziou o cache do outro worker")
+
+                    administrador.delete(f'/api/admin/users/{voluntario_id}')
+                    identidade, _ = consultas_ao_obter(voluntario_id)
+                    if identidade is not None:
+                        falhas.append("usuário removido continua em cache no outro worker")
+                    if voluntario.get('/api/auth/me').status_code != 401:
+                        falhas.append("sessão do usuário removido continua valendo")
+            finally:
+                with temporario.app_context():
+                    event.remove(db.engine, 'before_cursor_execute', contar)
+                    db.engine.dispose()
+
+        for falha in falhas:
+            print(f"FALHOU {falha}")
+        if falhas:
+            raise SystemExit(1)
+        print(f"Revogação imediata no outro worker: {rodadas} desativações/reativações, troca de senha e remoção.")
+
+    @app.cli.command("bench-identity-cache")
+    @click.option("--consultas", default=20000, show_default=True, help="Autorizações medidas em cada modo.")
+    def bench_identity_cache_command(consultas):
+        """Custo da autorização por requisição: identidade do cache (leitura do contador de sinal) contra ir ao banco."""
+        import time
+        from src.services.identidade import CacheIdentidade
+        with app.app_context():
+            ids = [user_id for user_id, in db.session.query(User.id).limit(100)]
+            if not ids:
+                print("Erro: cadastre ao menos um usuário antes do benchmark.")
+                raise SystemExit(1)
+            cache = CacheIdentidade()
+            cache.arquivo_sinal = app.config['IDENTITY_CACHE_SIGNAL_FILE']
+
+            def banco(user_id):
+                user = db.session.get(User, user_id)
+                db.session.expunge(user)  # sem o mapa de identidade da sessão, como em cada requisição nova
+                return user.ativo, user.is_admin, user.to_dict()
+
+            for nome, obter in (('cache', cache.obter), ('banco', banco)):
+                inicio = time.perf_counter()
+                for numero in range(consultas):
+                    obter(ids[numero % len(ids)])
+                duracao = time.perf_counter() - inicio
+                print(f"{nome}: {duracao / consultas * 1e6:.1f} µs por autorização")
+
+    @app.cli.command("verify-response-cache")
+    def verify_response_cache_command():
+        """
+        O cache de respostas nunca serve dado velho: num banco temporário com o
+        cache em SQLite, uma gravação feita por este processo e outra feita
+        por um segundo processo (import-nests) avançam a versão dos dados, e o
+        GET seguinte é MISS com o total novo. Com o arquivo do cache quebrado,
+        a rota continua respondendo. O banco configurado não é tocado.
+        """
+        import json
+        import os
+        import sqlite3
+        import subprocess
+        import sys
+        import tempfile
+        from src.main import create_app
+        from src.models.versao import versao_atual
+        from src.services.dados_sinteticos import gerar_dados
+
+        with tempfile.TemporaryDirectory() as pasta:
+            uri = f"sqlite:///{os.path.join(pasta, 'respostas.db')}"
+            arquivo_cache = os.path.join(pasta, 'cache_respostas.db')
+            temporario = create_app({'SQLALCHEMY_DATABASE_URI': uri, 'RATE_LIMIT_ENABLED': False,
+                                     'RESPONSE_CACHE_BACKEND': 'sqlite', 'RESPONSE_CACHE_PATH': arquivo_cache,
+                                     'IDENTITY_CACHE_SIGNAL_FILE': os.path.join(pasta, 'identidade.sinal')})
+            with temporario.app_context():
+                db.create_all()
+                gerar_dados(2, 50, admins=1)
+                user = User.query.filter_by(username='voluntario0001').one()
+                usuario_id, email = user.id, user.email
+            cliente = temporario.test_client()
+            with cliente.session_transaction() as sessao:
+                sessao['user_id'] = usuario_id
+
+            def estatisticas():
+                resposta = cliente.get('/api/estatisticas')
+                with temporario.app_context():
+                    versao = versao_atual()
+                return resposta.status_code, resposta.headers.get('X-Cache'), resposta.get_json()['total_ninhos'], versao
+
+            ninho = {'regiao': 'Rio Trombetas', 'quantidade_ovos': 80, 'status': 'intacto',
+                     'risco': 'estável', 'dias_para_eclosao': 30}
+            etapas = [('primeira leitura', estatisticas(), 'MISS', 50)]
+            etapas.append(('leitura repetida', estatisticas(), 'HIT', 50))
+
+            cliente.post('/api/ninhos', json=ninho)
+            etapas.append(('depois de gravar neste processo', estatisticas(), 'MISS', 51))
+            etapas.append(('leitura repetida', estatisticas(), 'HIT', 51))
+
+            arquivo = os.path.join(pasta, 'ninho.json')
+            with open(arquivo, 'w', encoding='utf-8') as saida:
+                json.dump([dict(ninho, id_cliente='verify-response-cache')], saida)
+            outro = subprocess.run([sys.executable, '-m', 'flask', '--app', 'src.main', 'import-nests', arquivo,
+                                    '--email', email], env=dict(os.environ, DATABASE_URL=uri),
+                                   cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+            if outro.returncode:
+                print(f"Erro no import-nests do segundo processo: {outro.stderr or outro.stdout}")
+                raise SystemExit(1)
+            etapas.append(('depois de gravar em outro processo', estatisticas(), 'MISS', 52))
+
+            with sqlite3.connect(arquivo_cache) as conn:
+                conn.execute('DROP TABLE resposta')
+            etapas.append(('com o arquivo do cache quebrado', estatisticas(), 'MISS', 52))
+
+            with temporario.app_context():
+                db.engine.dispose()
+
+        falhou = False
+        versao_anterior = None
+        for titulo, (status, cache, total, versao), cache_esperado, total_esperado in etapas:
+            avancou = versao_anterior is not None and versao > versao_anterior
+            ok = status == 200 and cache == cache_esperado and total == total_esperado
+            if 'gravar' in titulo:
+                ok &= avancou
+            falhou |= not ok
+            print(f"{'ok' if ok else 'FALHOU'} {titulo}: HTTP {status}, {cache}, total_ninhos={total} "
+                  f"(esperado {cache_esperado}, {total_esperado}), versão {versao}")
+            versao_anterior = versao
+        if falhou:
+            raise SystemExit(1)
+
+    @app.cli.command("bench-db-concurrency")
+    @click.option("--segundos", default=5.0, show_default=True, help="Duração da medição.")
+    @click.option("--leitores", default=4, show_default=True, help="Threads lendo o painel.")
+    def bench_db_concurrency_command(segundos, leitores):
+        """
+        Mede a latência das leituras do painel (estatísticas e primeira página
+        de ninhos) enquanto uma thread grava ninhos sem parar. Os ninhos
+        gravados são removidos ao final. Use um banco de teste.
+        """
+        import threading
+        import time
+        from src.models.ninho import Ninho
+        from src.models.estatisticas import obter_resumo
+        from src.services.paginacao import paginar_ninhos
+        from src.services.perfil_banco import estado_pool
+
+        with app.app_context():
+            user = User.query.first()
+            if not user:
+                print("Erro: cadastre ao menos um usuário antes do benchmark.")
+                raise SystemExit(1)
+            usuario_id = user.id
+            db.session.remove()
+
+        fim = time.perf_counter() + segundos
+        latencias, gravados = [], []
+
+        def gravar():
+            with app.app_context():
+                while time.perf_counter() < fim:
+                    ninho = Ninho(regiao='bench', quantidade_ovos=1, status='intacto', risco='estável',
+                                  dias_para_eclosao=10, usuario_id=usuario_id, id_cliente=f'bench-{len(gravados)}')
+                    db.session.add(ninho)
+                    db.session.commit()
+                    gravados.append(ninho.id)
+
+        def ler():
+            with app.app_context():
+                while time.perf_counter() < fim:
+                    inicio = time.perf_counter()
+                    obter_resumo()
+                    paginar_ninhos({})
+                    db.session.rollback()
+                    latencias.append(time.perf_counter() - inicio)
+
+        threads = [threading.Thread(target=gravar)] + [threading.Thread(target=ler) for _ in range(leitores)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with app.app_context():
+            modo = db.session.execute(db.text('PRAGMA journal_mode')).scalar() if db.engine.dialect.name == 'sqlite' else '-'
+            for ninho in Ninho.query.filter(Ninho.id.in_(gravados)):
+                db.session.delete(ninho)
+            db.session.commit()
+            latencias.sort()
+            por_ms = lambda fracao: latencias[min(int(len(latencias) * fracao), len(latencias) - 1)] * 1000
+            print(f"journal_mode={modo}: {len(gravados)} gravações, {len(latencias)} leituras; "
+                  f"leitura p50 {por_ms(0.5):.1f} ms, p99 {por_ms(0.99):.1f} ms, máx {latencias[-1] * 1000:.1f} ms")
+            print(estado_pool(db.engine))
+
+    @app.cli.command("bench-metrics")
+    @click.option("--requisicoes", default=2000, show_default=True, help="Requisições por rodada.")
+    @click.option("--rota", default="/api/estatisticas", show_default=True, help="Rota medida (GET).")
+    def bench_metrics_command(requisicoes, rota):
+        """Mede o custo da instrumentação: a mesma rota com as métricas ligadas e desligadas."""
+        import time
+        from src.services.metricas import metricas
+        with app.app_context():
+            user = User.query.first()
+            if not user:
+                print("Erro: cadastre ao menos um usuário antes do benchmark.")
+                raise SystemExit(1)
+            usuario_id = user.id
+        cliente = app.test_client()
+        with cliente.session_transaction() as sessao:
+            sessao['user_id'] = usuario_id
+
+        def rodada():
+            inicio = time.perf_counter()
+            for _ in range(requisicoes):
+                cliente.get(rota)
+            return (time.perf_counter() - inicio) / requisicoes
+
+        ativo = metricas.ativo
+        tempos = {True: [], False: []}
+        try:
+            for _ in range(5):  # alterna as rodadas para diluir ruído e aquecimento
+                for ligado in (False, True):
+                    metricas.ativo = ligado
+                    tempos[ligado].append(rodada())
+        finally:
+            metricas.ativo = ativo
+        sem, com = min(tempos[False]), min(tempos[True])
+        print(f"{rota}: sem métricas {sem * 1e6:.0f} µs/req, com métricas {com * 1e6:.0f} µs/req, "
+              f"sobrecarga {(com - sem) / sem * 100:+.1f}%")
+
+    @app.cli.command("seed-data")
+    @click.option("--usuarios", default=50, show_default=True, help="Quantidade de voluntários (voluntario0001...).")
+    @click.option("--ninhos", default=10000, show_default=True, help="Quantidade de ninhos.")
+    @click.option("--semente", default=42, show_default=True, help="Mesma semente, mesmos dados.")
+    @click.option("--senha", default="senha123", show_default=True, help="Senha de todos os voluntários gerados.")
+    @click.option("--admins", default=0, show_default=True, help="Quantos dos primeiros voluntários são administradores.")
+    def seed_data_command(usuarios, ninhos, semente, senha, admins):
+        """Popula o banco com dados sintéticos reprodutíveis. Apenas para bancos de teste."""
+        from src.services.dados_sinteticos import gerar_dados
+        with app.app_context():
+            relatorio = gerar_dados(usuarios, ninhos, semente, senha, admins)
+            print(f"{relatorio['usuarios']} voluntário(s); {relatorio['inseridos']} ninho(s) inserido(s), "
+                  f"{relatorio['ignorados']} já existente(s).")
+
+    @app.cli.command("load-test")
+    @click.option("--url", default=None, help="Servidor em execução. Sem ela, o app roda neste processo.")
+    @click.option("--concorrencia", default=8, show_default=True, help="Voluntários virtuais simultâneos.")
+    @click.option("--duracao", default=30.0, show_default=True, help="Segundos de carga.")
+    @click.option("--usuarios", default=50, show_default=True, help="Voluntários gerados pelo seed-data a usar.")
+    @click.option("--senha", default="senha123", show_default=True)
+    @click.option("--admin", default=None, help="Username de administrador (habilita a exportação no cenário).")
+    @click.option("--saida", type=click.Path(dir_okay=False), default=None, help="Grava o resultado em JSON.")
+    @click.option("--base", type=click.Path(exists=True, dir_okay=False), default=None, help="Resultado de referência.")
+    @click.option("--tolerancia", default=0.2, show_default=True, help="Piora aceita em relação à referência.")
+    @click.option("--com-limites", is_flag=True, help="Mantém os limites de requisições ligados (sem --url).")
+    def load_test_command(url, concorrencia, duracao, usuarios, senha, admin, saida, base, tolerancia, com_limites):
+        """Teste de carga ponta a ponta: p50/p95/p99 e vazão por endpoint, comparados a uma referência."""
+        import itertools
+        import json
+        from src.services.carga import ClienteHTTP, ClienteLocal, comparar_com_base, executar_carga
+        from src.services.limites import limitador
+        nomes = [f'voluntario{numero:04d}' for numero in range(1, usuarios + 1)]
+        # O teste mede capacidade, não a política de limites: os relogins do cenário logo esgotariam os baldes
+        limitador.ativo = com_limites
+        # Cada voluntário virtual com o próprio IP, como aparelhos diferentes em campo
+        ips = (f'10.0.{numero // 256}.{numero % 256}' for numero in itertools.count(1))
+        criar_cliente = (lambda: ClienteHTTP(url)) if url else (lambda: ClienteLocal(app, next(ips)))
+        resultado = executar_carga(criar_cliente, nomes, senha, concorrencia, duracao, admin=admin)
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        print(texto)
+        if saida:
+            with open(saida, 'w', encoding='utf-8') as arquivo:
+                arquivo.write(texto)
+        if base:
+            with open(base, encoding='utf-8') as arquivo:
+                regressoes = comparar_com_base(resultado, json.load(arquivo), tolerancia)
+            for regressao in regressoes:
+                print(f"REGRESSÃO {regressao}")
+            if regressoes:
+                raise SystemExit(1)
+
+    @app.cli.command("bench-rate-limit")
+    @click.option("--duracao", default=10.0, show_default=True, help="Segundos de cada fase.")
+    @click.option("--concorrencia", default=4, show_default=True, help="Voluntários virtuais nas rotas baratas.")
+    @click.option("--inundacao", default=8, show_default=True, help="Clientes martelando login e exportação.")
+    @click.option("--usuarios", default=20, show_default=True, help="Voluntários gerados pelo seed-data a usar.")
+    @click.option("--senha", default="senha123", show_default=True)
+    @click.option("--admin", default="voluntario0001", show_default=True, help="Administrador que pede as exportações.")
+    def bench_rate_limit_command(duracao, concorrencia, inundacao, usuarios, senha, admin):
+        """Latência das rotas baratas com as rotas caras inundadas, com e sem os limites de requisições."""
+        import itertools
+        import threading
+        import time
+        from src.services.carga import CENARIO, ClienteLocal, executar_carga
+        from src.services.limites import limitador
+
+        baratas = [item for item in CENARIO if item[0] in ('listar_ninhos', 'estatisticas', 'ranking_mes', 'relatorios')]
+        caras = [('login', 5, 'POST', '/api/auth/login'),
+                 ('exportar_xlsx', 1, 'GET', '/api/relatorios/ninhos/export?formato=xlsx')]
+        nomes = [f'voluntario{numero:04d}' for numero in range(2, usuarios + 1)]
+
+        def fase(titulo, ativo, com_inundacao):
+            limitador.ativo = ativo
+            limitador.limpar_contadores()
+            ips = (f'10.1.0.{numero}' for numero in itertools.count(1))
+            resultado = {}
+            baratas_em_curso = threading.Thread(target=lambda: resultado.update(baratas=executar_carga(
+                lambda: ClienteLocal(app, next(ips)), nomes, senha, concorrencia, duracao, cenario=baratas)))
+            baratas_em_curso.start()
+            if com_inundacao:
+                # Um único cliente abusivo (mesmo IP) em várias conexões, depois que os voluntários já entraram
+                time.sleep(0.5)
+                resultado['caras'] = executar_carga(lambda: ClienteLocal(app, '10.9.9.9'), nomes, senha, inundacao,
+                                                    duracao - 0.5, admin=admin, cenario=caras,
+                                                    admins=inundacao // 2)
+            baratas_em_curso.join()
+            print(f"\n{titulo}")
+            for grupo in ('baratas', 'caras'):
+                for nome, item in resultado.get(grupo, {}).get('endpoints', {}).items():
+                    print(f"  {nome}: {item['requisicoes']} req, p50 {item['p50_ms']} ms, p95 {item['p95_ms']} ms, "
+                          f"{item['erros']} rejeitada(s)/erro(s)")
+            rejeicoes = limitador.estado()['rejeicoes']
+            if rejeicoes:
+                print("  rejeições: " + ', '.join(f"{r['regra']}/{r['motivo']}={r['quantidade']}" for r in rejeicoes))
+
+        ativo = limitador.ativo
+        try:
+            fase("Sem inundação", True, False)
+            fase("Inundação sem limites", False, True)
+            fase("Inundação com limites", True, True)
+        finally:
+            limitador.ativo = ativo
+
+    @app.cli.command("bench-startup")
+    @click.option("--execucoes", default=5, show_default=True, help="Processos novos iniciados.")
+    @click.option("--rota", default="/", show_default=True, help="Rota da primeira requisição (GET).")
+    def bench_startup_command(execucoes, rota):
+        """Mede o cold start de um worker: tempo de import do app e até a primeira resposta."""
+        import json
+        import os
+        import statistics
+        import subprocess
+        import sys
+        roteiro = (
+            "import json, sys, time\n"
+            "inicio = time.perf_counter()\n"
+            "from src.main import app\n"
+            "importado = time.perf_counter()\n"
+            "status = app.test_client().get(sys.argv[1]).status_code\n"
+            "fim = time.perf_counter()\n"
+            "print(json.dumps({'importacao': importado - inicio, 'primeira': fim - importado, 'status': status,"
+            " 'modulos': len(sys.modules)}))\n"
+        )
+        raiz = os.path.dirname(os.path.abspath(__file__))
+        medidas = []
+        for _ in range(execucoes):
+            saida = subprocess.run([sys.executable, "-c", roteiro, rota], cwd=raiz, capture_output=True, text=True, check=True)
+            medidas.append(json.loads(saida.stdout.strip().splitlines()[-1]))
+        for campo, titulo in (("importacao", "import do app"), ("primeira", "primeira requisição")):
+            valores = [medida[campo] * 1000 for medida in medidas]
+            print(f"{titulo}: mediana {statistics.median(valores):.0f} ms, máx {max(valores):.0f} ms")
+        print(f"status {medidas[-1]['status']}, {medidas[-1]['modulos']} módulos carregados")
+
+    @app.cli.command("backfill-hatch-dates")
+    @click.option("--lote", default=5000, show_default=True, help="Ninhos atualizados por transação.")
+    def backfill_hatch_dates_command(lote):
+        """Preenche a data prevista de eclosão dos ninhos gravados antes da coluna existir."""
+        from src.models.eclosao import garantir_datas_eclosao
+        with app.app_context():
+            print(f"{garantir_datas_eclosao(lote)} ninho(s) atualizado(s).")
+
+    @app.cli.command("bench-hatch-calendar")
+    @click.option("--repeticoes", default=20, show_default=True)
+    def bench_hatch_calendar_command(repeticoes):
+        """Mede o calendário de eclosões e a contagem de prestes a eclodir contra o cálculo linha a linha."""
+        import statistics
+        import time
+        from datetime import timedelta
+        from src.models.ninho import Ninho
+        from sqlalchemy import func
+        from src.models.eclosao import calendario, contar_prestes_eclodir, data_prevista, hoje, PRESTES_ECLODIR_DIAS
+
+        def medir(funcao, vezes=repeticoes):
+            tempos = []
+            for _ in range(vezes):
+                inicio = time.perf_counter()
+                funcao()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            return statistics.median(tempos)
+
+        def linha_a_linha():
+            # O que seria preciso sem a coluna: ler todos os ninhos e calcular a data de cada um
+            dia, limite = hoje(), hoje() + timedelta(days=PRESTES_ECLODIR_DIAS)
+            return sum(1 for registro, dias in db.session.query(Ninho.data_registro, Ninho.dias_para_eclosao)
+                       if dia <= data_prevista(registro, dias) <= limite)
+
+        with app.app_context():
+            total = Ninho.query.count()
+            dia = hoje()
+            print(f"{total} ninhos")
+            print(f"prestes a eclodir (índice): {medir(contar_prestes_eclodir):.2f} ms")
+            print(f"calendário 30 dias por dia: {medir(lambda: calendario(dia, dia + timedelta(days=30))):.2f} ms")
+            print(f"calendário 1 ano por semana: {medir(lambda: calendario(dia, dia + timedelta(days=365), 'semana')):.2f} ms")
+            regiao = db.session.query(Ninho.regiao).group_by(Ninho.regiao).order_by(func.count().desc()).limit(1).scalar()
+            if regiao:
+                # A maior região: sem o índice (regiao, data_prevista_eclosao), lê todos os ninhos dela
+                print(f"calendário 30 dias, região {regiao}: "
+                      f"{medir(lambda: calendario(dia, dia + timedelta(days=30), regiao=regiao)):.2f} ms")
+            print(f"prestes a eclodir (linha a linha): {medir(linha_a_linha, min(repeticoes, 3)):.2f} ms")
+
+    @app.cli.command("bench-ranking")
+    @click.option("--repeticoes", default=20, show_default=True)
+    def bench_ranking_command(repeticoes):
+        """
+        Mede o ranking lido da pontuação materializada (top-N, total, posição
+        de um voluntário e o custo que a manutenção acrescenta a cada gravação)
+        contra o JOIN + GROUP BY original sobre os ninhos. Para a escala de
+        referência, rode antes seed-data --usuarios 50000 --ninhos 1000000.
+        """
+        import statistics
+        import time
+        from datetime import datetime
+        from src.models.ninho import Ninho
+        from src.models.pontuacao import posicao_usuario, ranking_sql, ranking_top, total_no_ranking
+
+        def medir(funcao, vezes=repeticoes):
+            tempos = []
+            for _ in range(vezes):
+                inicio = time.perf_counter()
+                funcao()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            return statistics.median(tempos)
+
+        def gravar():
+            # Um ninho novo e a atualização da pontuação no mesmo flush, desfeitos em seguida
+            db.session.add(Ninho(regiao='bench-ranking', quantidade_ovos=1, status='intacto', risco='crítico',
+                                 dias_para_eclosao=10, usuario_id=usuario_id, data_registro=datetime.utcnow()))
+            db.session.flush()
+            db.session.rollback()
+
+        def ranking_original(periodo):
+            totais = ranking_sql(periodo)
+            return sorted(totais.items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))
+
+        with app.app_context():
+            ninhos, usuarios = Ninho.query.count(), User.query.count()
+            print(f"{ninhos} ninhos, {usuarios} usuários, {total_no_ranking()} no ranking geral")
+            ranking = ranking_top('geral')
+            if not ranking:
+                print("Erro: o ranking está vazio (use seed-data).")
+                raise SystemExit(1)
+            usuario_id = ranking[len(ranking) // 2]['user_id']
+            for periodo in ('geral', 'mes'):
+                for limite in (10, 100):
+                    print(f"{periodo} top {limite}: {medir(lambda: ranking_top(periodo, limite)):.2f} ms")
+                print(f"{periodo} completo: {medir(lambda: ranking_top(periodo), min(repeticoes, 5)):.2f} ms")
+                print(f"{periodo} total no ranking: {medir(lambda: total_no_ranking(periodo)):.2f} ms")
+                print(f"{periodo} posição de um voluntário do meio: {medir(lambda: posicao_usuario(usuario_id, periodo)):.2f} ms")
+            print(f"gravação de um ninho (pontuação e demais resumos): {medir(gravar):.2f} ms")
+            for periodo in ('geral', 'mes'):
+                print(f"{periodo} pelo SQL original (JOIN + GROUP BY): "
+                      f"{medir(lambda: ranking_original(periodo), min(repeticoes, 3)):.2f} ms")
+
+    @app.cli.command("rebuild-search")
+    def rebuild_search_command():
+        """Reconstrói o índice de busca de regiões e voluntários."""
+        from src.models.busca import reconstruir_busca
+        with app.app_context():
+            reconstruir_busca()
+            print("Índice de busca reconstruído.")
+
+    @app.cli.command("verify-search")
+    @click.option("--fix", is_flag=True, help="Reconstrói o índice se houver divergências.")
+    def verify_search_command(fix):
+        """Compara os termos de busca com os recalculados de ninhos e usuários e confere buscas sem trigramas."""
+        from src.models.busca import buscar, verificar_busca, reconstruir_busca
+        with app.app_context():
+            # Palavras curtas não deixam trigrama sem espaço: a busca cai no prefixo em vez de um MATCH vazio
+            for consulta in ('ab cd', 'a b c d', 'xy z', 'ab'):
+                try:
+                    buscar(consulta)
+                except Exception as e:
+                    print(f"Busca {consulta!r} falhou: {e}")
+                    raise SystemExit(1)
+            divergencias = verificar_busca()
+            if not divergencias:
+                print("Índice de busca consistente.")
+                return
+            for (tipo, chave), (armazenado, esperado) in sorted(divergencias.items()):
+                print(f"{tipo} {chave!r}: armazenado={armazenado} esperado={esperado}")
+            if fix:
+                reconstruir_busca()
+                print("Índice de busca reconstruído.")
+            else:
+                raise SystemExit(1)
+
+    @app.cli.command("bench-search")
+    @click.option("--repeticoes", default=20, show_default=True)
+    def bench_search_command(repeticoes):
+        """Mede a busca indexada contra a varredura com LIKE nas tabelas de ninhos e usuários."""
+        import statistics
+        import time
+        from sqlalchemy import func, or_
+        from src.models.ninho import Ninho
+        from src.models.busca import buscar, normalizar
+
+        def medir(funcao):
+            tempos, resultado = [], None
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                resultado = funcao()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            return statistics.median(tempos), len(resultado)
+
+        def varredura(consulta):
+            padrao = f'%{consulta}%'
+            regioes = db.session.query(Ninho.regiao).filter(Ninho.regiao.ilike(padrao)).distinct().all()
+            return regioes + User.query.filter(or_(User.username.ilike(padrao), User.nome_completo.ilike(padrao))).all()
+
+        with app.app_context():
+            regiao = db.session.query(Ninho.regiao).group_by(Ninho.regiao).order_by(func.count().desc()).first()
+            usuario = User.query.order_by(User.id).first()
+            if not regiao or not usuario:
+                print("Erro: o banco precisa ter ninhos e usuários.")
+                raise SystemExit(1)
+            regiao = regiao[0]
+            palavra = max(regiao.split(), key=len)
+            consultas = {
+                'nome exato': regiao,
+                'sem acentos, minúsculas': normalizar(regiao),
+                'prefixo': palavra[:4],
+                'erro de digitação': palavra[:2] + palavra[3] + palavra[2] + palavra[4:],
+                'voluntário (prefixo)': usuario.username[:5],
+            }
+            print(f"{Ninho.query.count()} ninhos, {User.query.count()} usuários")
+            for titulo, consulta in consultas.items():
+                indexada, achados = medir(lambda: buscar(consulta))
+                like, achados_like = medir(lambda: varredura(consulta))
+                print(f"{titulo} ({consulta!r}): índice {indexada:.2f} ms ({achados} resultado(s)), "
+                      f"LIKE {like:.2f} ms ({achados_like} resultado(s))")
+
+    @app.cli.command("bench-analytics")
+    @click.option("--repeticoes", default=5, show_default=True)
+    @click.option("--dias", default=365, show_default=True, help="Tamanho do intervalo analisado, terminando hoje.")
+    def bench_analytics_command(repeticoes, dias):
+        """Mede as tendências com NumPy contra GROUP BY em SQL e um laço em Python puro, conferindo os resultados."""
+        import statistics
+        import time
+        from datetime import date, datetime, timedelta
+        from sqlalchemy import func
+        from src.models.ninho import Ninho
+        from src.models.eclosao import hoje
+        from src.services.analise import consulta_colunas, inicio_do_periodo, periodos, tendencias
+
+        def medir(funcao):
+            tempos, resultado = [], None
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                resultado = funcao()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            return statistics.median(tempos), resultado
+
+        def percentil(ordenados, p):
+            posicao = (len(ordenados) - 1) * p / 100
+            abaixo = int(posicao)
+            acima = min(abaixo + 1, len(ordenados) - 1)
+            return ordenados[abaixo] + (posicao - abaixo) * (ordenados[acima] - ordenados[abaixo])
+
+        def python_puro(inicio, fim, granularidade):
+            # Mesmas colunas, lidas como linhas e agregadas uma a uma em dicionários
+            datas = periodos(inicio, fim, granularidade)
+            posicao = {data: i for i, data in enumerate(datas)}
+            total, predadores = [0] * len(datas), [0] * len(datas)
+            por_regiao, por_risco, ovos = {}, {}, [[] for _ in datas]
+            for registro, regiao, risco, quantidade, predador in consulta_colunas(inicio, fim):
+                i = posicao[inicio_do_periodo(date.fromisoformat(str(registro)[:10]), granularidade)]
+                total[i] += 1
+                predadores[i] += predador
+                por_regiao.setdefault(regiao, [0] * len(datas))[i] += 1
+                por_risco.setdefault(risco, [0] * len(datas))[i] += 1
+                ovos[i].append(quantidade)
+            for lista in ovos:
+                lista.sort()
+            return {
+                'total': total, 'por_regiao': por_regiao, 'por_risco': por_risco,
+                'p50': [round(percentil(lista, 50), 2) if lista else None for lista in ovos],
+                'taxa': [round(p / t, 4) if t else None for p, t in zip(predadores, total)],
+            }
+
+        def sql_group_by(inicio, fim, granularidade):
+            # Uma consulta agregada por dimensão; percentis ficam de fora (o SQLite não tem)
+            formato = {'dia': '%Y-%m-%d', 'semana': '%Y-%W', 'mes': '%Y-%m'}[granularidade]
+            periodo = func.strftime(formato, Ninho.data_registro)
+            faixa = (Ninho.data_registro >= datetime.combine(inicio, datetime.min.time()),
+                     Ninho.data_registro < datetime.combine(fim + timedelta(days=1), datetime.min.time()))
+            return [
+                db.session.query(periodo, func.count(), func.sum(Ninho.predadores), func.avg(Ninho.quantidade_ovos))
+                .filter(*faixa).group_by(periodo).all(),
+                db.session.query(periodo, Ninho.regiao, func.count()).filter(*faixa).group_by(periodo, Ninho.regiao).all(),
+                db.session.query(periodo, Ninho.risco, func.count()).filter(*faixa).group_by(periodo, Ninho.risco).all(),
+            ]
+
+        with app.app_context():
+            fim = hoje()
+            inicio = fim - timedelta(days=dias - 1)
+            print(f"{Ninho.query.count()} ninhos, {dias} dias")
+            for granularidade in ('dia', 'semana', 'mes'):
+                numpy_ms, resultado = medir(lambda: tendencias(inicio, fim, granularidade))
+                sql_ms, _ = medir(lambda: sql_group_by(inicio, fim, granularidade))
+                python_ms, referencia = medir(lambda: python_puro(inicio, fim, granularidade))
+                confere = (resultado['ninhos']['total'] == referencia['total']
+                           and resultado['ninhos']['por_regiao'] == referencia['por_regiao']
+                           and resultado['ninhos']['por_risco'] == referencia['por_risco']
+                           and resultado['ovos']['percentis_por_periodo']['p50'] == referencia['p50']
+                           and resultado['predadores']['taxa'] == referencia['taxa'])
+                print(f"{granularidade}: NumPy {numpy_ms:.1f} ms, SQL GROUP BY {sql_ms:.1f} ms (sem percentis), "
+                      f"Python puro {python_ms:.1f} ms; resultados {'iguais' if confere else 'DIFERENTES'}")
+                if not confere:
+                    raise SystemExit(1)
+
+    @app.cli.command("bench-upload")
+    @click.option("--tamanho-mb", default=8.0, show_default=True, help="Tamanho aproximado da foto de teste.")
+    @click.option("--parte-kb", default=1024, show_default=True, help="Tamanho de cada parte do upload retomável.")
+    @click.option("--usuario", default="voluntario0002", show_default=True, help="Voluntário gerado pelo seed-data.")
+    @click.option("--senha", default="senha123", show_default=True)
+    def bench_upload_command(tamanho_mb, parte_kb, usuario, senha):
+        """Confere o protocolo do upload retomável e compara o pico de memória com o upload multipart."""
+        import hashlib
+        import io
+        import os
+        import tempfile
+        import time
+        import tracemalloc
+        from PIL import Image
+        from werkzeug.datastructures import FileStorage
+        from werkzeug.test import encode_multipart
+        from src.services.imagens import aguardar_processamento
+
+        def foto(caminho):
+            # Ruído não comprime: o JPEG sai perto de 1,2 byte por pixel em qualidade 95
+            lado = int((tamanho_mb * 1024 * 1024 / 1.2) ** 0.5)
+            Image.frombytes('RGB', (lado, lado), os.urandom(lado * lado * 3)).save(caminho, 'JPEG', quality=95)
+            with open(caminho, 'rb') as arquivo:
+                return hashlib.file_digest(arquivo, 'sha256').hexdigest()
+
+        def conferir(condicao, descricao):
+            print(f"  {'ok  ' if condicao else 'FALHOU'} {descricao}")
+            if not condicao:
+                raise SystemExit(1)
+
+        def parte(arquivo, id_envio, deslocamento, tamanho, enviados=None):
+            # Corpo lido direto do arquivo; `enviados` menor que `tamanho` simula a conexão caindo no meio
+            arquivo.seek(deslocamento)
+            corpo = arquivo if enviados is None else io.BytesIO(arquivo.read(enviados))
+            return cliente.put(f'/api/upload/sessoes/{id_envio}?deslocamento={deslocamento}', input_stream=corpo,
+                               headers={'Content-Length': str(tamanho), 'Content-Type': 'application/octet-stream'})
+
+        def enviar_em_partes(arquivo, tamanho, sha256):
+            id_envio = cliente.post('/api/upload/sessoes', json={'nome': 'foto.jpg', 'tamanho': tamanho}).get_json()['id']
+            bloco = parte_kb * 1024
+            for deslocamento in range(0, tamanho, bloco):
+                parte(arquivo, id_envio, deslocamento, min(bloco, tamanho - deslocamento))
+            return cliente.post(f'/api/upload/sessoes/{id_envio}/concluir', json={'sha256': sha256})
+
+        def pico(funcao):
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            resposta = funcao()
+            duracao = time.perf_counter() - inicio
+            _, maximo = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return resposta, maximo / 1024 / 1024, duracao * 1000
+
+        def apagar(resposta):
+            dados = resposta.get_json()
+            aguardar_processamento(os.path.basename(dados['file_path']))
+            for relativo in [dados['file_path'], *dados['miniaturas'].values()]:
+                caminho = os.path.join(app.static_folder, relativo)
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+
+        cliente = app.test_client()
+        resposta = cliente.post('/api/auth/login', json={'username': usuario, 'password': senha})
+        if resposta.status_code != 200:
+            raise SystemExit(f"Login de {usuario} falhou ({resposta.status_code}); rode seed-data antes.")
+
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'foto.jpg')
+            sha256 = foto(caminho)
+            tamanho = os.path.getsize(caminho)
+            print(f"Foto de teste: {tamanho / 1024 / 1024:.1f} MB, partes de {parte_kb} KB")
+
+            print("Protocolo:")
+            with open(caminho, 'rb') as arquivo:
+                estado = cliente.post('/api/upload/sessoes', json={'nome': 'foto.jpg', 'tamanho': tamanho}).get_json()
+                id_envio, metade = estado['id'], tamanho // 2
+                resposta = parte(arquivo, id_envio, 1000, 1000)
+                conferir(resposta.status_code == 409 and resposta.get_json()['recebido'] == 0,
+                         "parte fora de ordem recusada com 409 e o deslocamento a retomar")
+                resposta = parte(arquivo, id_envio, 0, metade, enviados=metade - 12345)
+                recebido = cliente.get(f'/api/upload/sessoes/{id_envio}').get_json()['recebido']
+                conferir(recebido == metade - 12345, f"parte interrompida guarda o que chegou ({recebido} bytes)")
+                resposta = parte(arquivo, id_envio, recebido - 4096, tamanho - recebido + 4096)
+                conferir(resposta.status_code == 200 and resposta.get_json()['recebido'] == tamanho,
+                         "retomada a partir do deslocamento informado (com reenvio sobreposto)")
+                resposta = cliente.post(f'/api/upload/sessoes/{id_envio}/concluir', json={'sha256': '0' * 64})
+                conferir(resposta.status_code == 400, "SHA-256 errado recusado")
+                resposta = cliente.post(f'/api/upload/sessoes/{id_envio}/concluir', json={'sha256': sha256})
+                conferir(resposta.status_code == 200, "SHA-256 certo conclui o envio")
+                conferir(cliente.get(f'/api/upload/sessoes/{id_envio}').status_code == 404, "sessão concluída some")
+            apagar(resposta)
+
+            print("Pico de memória alocada no processo web (tracemalloc):")
+            sha256 = foto(caminho)
+            with open(caminho, 'rb') as arquivo, open(os.path.join(pasta, 'corpo'), 'wb') as saida:
+                fronteira, corpo = encode_multipart({'file': FileStorage(arquivo, 'foto.jpg')})
+                saida.write(corpo)
+            del corpo
+            with open(os.path.join(pasta, 'corpo'), 'rb') as arquivo:
+                resposta, maximo, ms = pico(lambda: cliente.post(
+                    '/api/upload', input_stream=arquivo, content_type=f'multipart/form-data; boundary={fronteira}',
+                    headers={'Content-Length': str(os.path.getsize(arquivo.name))}))
+            conferir(resposta.status_code == 200, f"multipart: {maximo:.1f} MB, {ms:.0f} ms")
+            apagar(resposta)
+
+            sha256 = foto(caminho)
+            with open(caminho, 'rb') as arquivo:
+                resposta, maximo, ms = pico(lambda: enviar_em_partes(arquivo, os.path.getsize(caminho), sha256))
+            conferir(resposta.status_code == 200, f"em partes: {maximo:.1f} MB, {ms:.0f} ms")
+            apagar(resposta)
+
+    @app.cli.command("bench-json")
+    @click.option("--ninhos", "quantidades", multiple=True, type=int, default=(10000, 100000), show_default=True,
+                  help="Tamanho da listagem (repetível).")
+    @click.option("--repeticoes", default=5, show_default=True)
+    def bench_json_command(quantidades, repeticoes):
+        """Mede serialização (json padrão x orjson, linhas x colunar) e bytes enviados com e sem compressão."""
+        import random
+        import statistics
+        import time
+        from collections import namedtuple
+        from flask.json.provider import DefaultJSONProvider
+        from src.models.serializacao import CAMPOS_NINHO_PADRAO, linha_para_dict, linhas_para_colunas
+        from src.services.dados_sinteticos import linhas_ninhos
+        from src.services.respostas import ProvedorJSON, compressao, orjson
+
+        Linha = namedtuple('Linha', CAMPOS_NINHO_PADRAO)
+        provedores = [('json padrão', DefaultJSONProvider(app))]
+        if orjson is not None:
+            provedores.append(('orjson', ProvedorJSON(app)))
+        else:
+            print("orjson não instalado: só o json padrão é medido")
+
+        def medir(funcao):
+            tempos, resultado = [], None
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                resultado = funcao()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            return statistics.median(tempos), resultado
+
+        for quantidade in quantidades:
+            # Mesmas colunas e distribuições de uma página de /api/ninhos, sem depender do banco
+            linhas = [
+                Linha(id=numero + 1, foto_path=None, data_prevista_eclosao=ninho['data_registro'].date(),
+                      usuario_id=numero % 50 + 1, usuario_nome=f'voluntario{numero % 50 + 1:04d}',
+                      **{campo: ninho[campo] for campo in CAMPOS_NINHO_PADRAO if campo in ninho})
+                for numero, ninho in enumerate(linhas_ninhos(random.Random(42), quantidade, semente=42))
+            ]
+            formatos = {
+                'linhas': lambda: {'ninhos': [linha_para_dict(linha, CAMPOS_NINHO_PADRAO) for linha in linhas]},
+                'colunar': lambda: {'campos': CAMPOS_NINHO_PADRAO, 'colunas': linhas_para_colunas(linhas, CAMPOS_NINHO_PADRAO)},
+            }
+            print(f"\n{quantidade} ninhos")
+            for formato, montar in formatos.items():
+                corpo = None
+                for nome, provedor in provedores:
+                    ms, corpo = medir(lambda: provedor.response(montar()).get_data())
+                    print(f"  {formato}, {nome}: {ms:.0f} ms para montar e serializar")
+                tamanhos = [f"sem compressão {len(corpo) / 1024:.0f} KB"]
+                for codificacao in compressao.codificacoes():
+                    ms, comprimido = medir(lambda: compressao.comprimir(corpo, codificacao))
+                    tamanhos.append(f"{codificacao} {len(comprimido) / 1024:.0f} KB ({ms:.0f} ms)")
+                print(f"  {formato}, bytes: " + ', '.join(tamanhos))
+
+    @app.cli.command("bench-export")
+    @click.option("--formato", "formatos", multiple=True, type=click.Choice(['csv', 'xlsx']), default=('csv', 'xlsx'),
+                  show_default=True, help="Formato medido (repetível).")
+    @click.option("--comparar", is_flag=True, help="Mede também o .xlsx montado todo em memória, como antes do streaming.")
+    def bench_export_command(formatos, comparar):
+        """
+        Exportação de ninhos pela rota: tempo até o primeiro byte, tempo total,
+        bytes, pico de memória Python (tracemalloc, numa segunda passada) e o
+        pico de RSS do processo. O RSS só sobe, por isso a referência em
+        memória (--comparar) roda por último.
+        """
+        import io
+        import resource
+        import time
+        import tracemalloc
+        from src.models.ninho import Ninho
+        from src.services.limites import limitador
+
+        with app.app_context():
+            admin = User.query.filter_by(is_admin=True, ativo=True).first()
+            if admin is None:
+                print("Erro: o benchmark precisa de um administrador ativo (seed-data --admins 1).")
+                raise SystemExit(1)
+            admin_id, total = admin.id, Ninho.query.count()
+        cliente = app.test_client()
+        with cliente.session_transaction() as sessao:
+            sessao['user_id'] = admin_id
+        limitador.ativo = False  # mede a exportação, não a regra de limite
+
+        def exportar(formato):
+            inicio = time.perf_counter()
+            resposta = cliente.get(f'/api/relatorios/ninhos/export?formato={formato}', buffered=False)
+            primeiro, tamanho = None, 0
+            for bloco in resposta.response:
+                primeiro = primeiro or time.perf_counter()
+                tamanho += len(bloco)
+            resposta.close()
+            return primeiro - inicio, time.perf_counter() - inicio, tamanho
+
+        def xlsx_em_memoria():
+            # A versão anterior ao streaming: todos os ninhos em lista e a planilha inteira num BytesIO
+            from openpyxl import Workbook
+            from src.routes.relatorios import CABECALHO_EXPORTACAO, CAMPOS_EXPORTACAO
+            from src.models.serializacao import consultar_ninhos
+            inicio = time.perf_counter()
+            with app.app_context():
+                ninhos = consultar_ninhos(CAMPOS_EXPORTACAO).order_by(Ninho.id).all()
+                wb = Workbook()
+                ws = wb.active
+                ws.append(CABECALHO_EXPORTACAO)
+                for ninho in ninhos:
+                    ws.append([ninho.id, ninho.regiao, ninho.quantidade_ovos, ninho.status, ninho.risco,
+                               ninho.dias_para_eclosao, 'Sim' if ninho.predadores else 'Não', ninho.latitude,
+                               ninho.longitude, ninho.data_registro.strftime('%Y-%m-%d %H:%M'), ninho.usuario_id,
+                               ninho.usuario_nome_completo])
+                saida = io.BytesIO()
+                wb.save(saida)
+            duracao = time.perf_counter() - inicio
+            return duracao, duracao, saida.getbuffer().nbytes
+
+        def rss_mb():
+            # ru_maxrss vem em KB no Linux
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        medidas = [(formato, lambda formato=formato: exportar(formato)) for formato in formatos]
+        if comparar:
+            medidas.append(('xlsx em memória (antes)', xlsx_em_memoria))
+        print(f"{total} ninhos; RSS inicial {rss_mb():.0f} MB")
+        for nome, medir in medidas:
+            primeiro_byte, duracao, tamanho = medir()
+            tracemalloc.start()
+            medir()
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{nome}: primeiro byte {primeiro_byte * 1000:.0f} ms, total {duracao:.2f} s, "
+                  f"{tamanho / 1024 / 1024:.1f} MB; pico Python {pico / 1024 / 1024:.1f} MB, "
+                  f"pico de RSS do processo {rss_mb():.0f} MB")
+
+    @app.cli.command("bench-import")
+    @click.option("--linhas", default=100000, show_default=True, help="Linhas por arquivo.")
+    @click.option("--formato", "formatos", multiple=True, type=click.Choice(['json', 'csv', 'xlsx']),
+                  default=('json', 'csv', 'xlsx'), show_default=True, help="Formato medido (repetível).")
+    @click.option("--um-a-um", default=5000, show_default=True,
+                  help="Linhas enviadas uma por requisição (POST /api/ninhos), como antes da importação em lote.")
+    def bench_import_command(linhas, formatos, um_a_um):
+        """
+        Importação em lote pela rota (/api/ninhos/lote) num banco temporário:
+        tempo e linhas/s por formato, o reenvio do mesmo arquivo (tudo ignorado)
+        e, para comparar, ninhos criados um por requisição, com um commit cada.
+        Sem MAX_CONTENT_LENGTH: 100 mil linhas em JSON passam dos 16 MB.
+        """
+        import csv
+        import io
+        import json
+        import os
+        import random
+        import tempfile
+        import time
+        from src.main import create_app
+        from src.models.ninho import Ninho
+        from src.services.dados_sinteticos import gerar_dados
+
+        rng = random.Random(42)
+        regioes = ['Rio Trombetas', 'Praia do Tabuleiro', 'Rio Xingu', 'Baixo Amazonas', 'Rio Tapajós']
+        campos = ['id_cliente', 'regiao', 'quantidade_ovos', 'status', 'risco', 'dias_para_eclosao',
+                  'predadores', 'latitude', 'longitude']
+
+        def gerar_linhas(prefixo, quantidade):
+            return [{'id_cliente': f'{prefixo}-{i}', 'regiao': rng.choice(regioes), 'quantidade_ovos': rng.randint(20, 150),
+                     'status': rng.choice(['intacto', 'danificado', 'eclodido']), 'risco': rng.choice(['estável', 'alto']),
+                     'dias_para_eclosao': rng.randint(0, 70), 'predadores': rng.random() < 0.2,
+                     'latitude': round(rng.uniform(-3, -1), 6), 'longitude': round(rng.uniform(-56, -50), 6)}
+                    for i in range(quantidade)]
+
+        def arquivo(formato, dados):
+            if formato == 'json':
+                return json.dumps(dados).encode()
+            if formato == 'csv':
+                texto = io.StringIO()
+                escritor = csv.DictWriter(texto, campos)
+                escritor.writeheader()
+                escritor.writerows(dados)
+                return texto.getvalue().encode()
+            from openpyxl import Workbook
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet()
+            ws.append(campos)
+            for linha in dados:
+                ws.append([linha[campo] for campo in campos])
+            saida = io.BytesIO()
+            wb.save(saida)
+            return saida.getvalue()
+
+        with tempfile.TemporaryDirectory() as pasta:
+            temporario = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(pasta, 'importacao.db')}",
+                                     'RATE_LIMIT_ENABLED': False, 'MAX_CONTENT_LENGTH': None,
+                                     'IDENTITY_CACHE_SIGNAL_FILE': os.path.join(pasta, 'identidade.sinal')})
+            with temporario.app_context():
+                db.create_all()
+                gerar_dados(1, 0)
+                usuario_id = User.query.first().id
+            cliente = temporario.test_client()
+            with cliente.session_transaction() as sessao:
+                sessao['user_id'] = usuario_id
+
+            def enviar(formato, corpo):
+                inicio = time.perf_counter()
+                resposta = cliente.post('/api/ninhos/lote', data={'arquivo': (io.BytesIO(corpo), f'ninhos.{formato}')})
+                duracao = time.perf_counter() - inicio
+                if resposta.status_code != 200:
+                    print(f"Erro: HTTP {resposta.status_code}: {resposta.get_json()}")
+                    raise SystemExit(1)
+                return duracao, resposta.get_json()
+
+            for formato in formatos:
+                corpo = arquivo(formato, gerar_linhas(formato, linhas))
+                duracao, relatorio = enviar(formato, corpo)
+                print(f"{formato}: {linhas} linhas ({len(corpo) / 1024 / 1024:.1f} MB) em {duracao:.2f} s, "
+                      f"{linhas / duracao:.0f} linhas/s; {relatorio['inseridos']} inserido(s), "
+                      f"{len(relatorio['erros'])} com erro")
+                duracao, relatorio = enviar(formato, corpo)
+                print(f"  reenvio: {duracao:.2f} s, {relatorio['ignorados']} ignorado(s), "
+                      f"{relatorio['inseridos']} inserido(s)")
+
+            if um_a_um:
+                inicio = time.perf_counter()
+                for linha in gerar_linhas('um', um_a_um):
+                    cliente.post('/api/ninhos', json=linha)
+                duracao = time.perf_counter() - inicio
+                print(f"um por requisição: {um_a_um} linhas em {duracao:.2f} s, {um_a_um / duracao:.0f} linhas/s "
+                      f"({linhas / (um_a_um / duracao):.0f} s estimados para {linhas})")
+            with temporario.app_context():
+                print(f"{Ninho.query.count()} ninhos no banco temporário")
+                db.engine.dispose()
+
+    @app.cli.command("bench-static")
+    @click.option("--requisicoes", default=2000, show_default=True, help="Requisições por cenário.")
+    def bench_static_command(requisicoes):
+        """
+        Requisições por segundo dos arquivos estáticos servidos pelo manifesto
+        em memória, e de uma foto enviada pela rota de uploads, contra o
+        send_from_directory de antes. Só a view é trocada: os hooks (métricas,
+        compressão) são os mesmos nas duas medições.
+        """
+        import io
+        import os
+        import time
+        from flask import send_from_directory
+        from PIL import Image
+        from src.routes.upload import UPLOAD_FOLDER
+        from src.services.imagens import hash_conteudo, nome_arquivo
+        from src.services.limites import limitador
+
+        def send_from_directory_antes(path):
+            if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
+                return send_from_directory(app.static_folder, path)
+            return send_from_directory(app.static_folder, 'index.html')
+
+        # Uma foto com nome derivado do conteúdo, como as gravadas pelo upload; apagada ao fim
+        saida = io.BytesIO()
+        Image.new('RGB', (2048, 1536), (40, 90, 60)).save(saida, 'JPEG', quality=85)
+        foto = nome_arquivo(hash_conteudo(saida.getvalue()))
+        caminho_foto = os.path.join(app.static_folder, UPLOAD_FOLDER, foto)
+        foto_existia = os.path.exists(caminho_foto)
+        if not foto_existia:
+            os.makedirs(os.path.dirname(caminho_foto), exist_ok=True)
+            with open(caminho_foto, 'wb') as arquivo:
+                arquivo.write(saida.getvalue())
+
+        cenarios = [('index.html', '/', {}),
+                    ('app.js', '/app.js', {}),
+                    ('app.js com gzip', '/app.js', {'Accept-Encoding': 'gzip'}),
+                    ('app.js revalidado (304)', '/app.js', {'Accept-Encoding': 'gzip'}),
+                    ('upload', f'/{UPLOAD_FOLDER}/{foto}', {}),
+                    ('upload revalidado (304)', f'/{UPLOAD_FOLDER}/{foto}', {})]
+        cliente = app.test_client()
+        limitador.ativo = False  # mede os estáticos, não a regra de limite
+        manifesto = app.view_functions['serve']
+        try:
+            for nome, view in (('send_from_directory (antes)', send_from_directory_antes), ('manifesto', manifesto)):
+                app.view_functions['serve'] = view
+                print(nome)
+                for titulo, caminho, cabecalhos in cenarios:
+                    if titulo.endswith('(304)'):
+                        cabecalhos = dict(cabecalhos, **{'If-None-Match': cliente.get(caminho, headers=cabecalhos).headers['ETag']})
+                    cliente.get(caminho, headers=cabecalhos)  # aquecimento (o manifesto é montado no primeiro acesso)
+                    inicio = time.perf_counter()
+                    for _ in range(requisicoes):
+                        resposta = cliente.get(caminho, headers=cabecalhos)
+                        tamanho = len(resposta.get_data())  # o corpo é lido, como o servidor faria ao enviar
+                        resposta.close()
+                    duracao = time.perf_counter() - inicio
+                    cache = resposta.headers.get('Cache-Control')
+                    print(f"  {titulo}: {requisicoes / duracao:.0f} req/s, HTTP {resposta.status_code}, {tamanho} bytes"
+                          + (f", Cache-Control: {cache}" if cache else ''))
+        finally:
+            app.view_functions['serve'] = manifesto
+            if not foto_existia:
+                os.remove(caminho_foto)
+
+    @app.cli.command("bench-geo")
+    @click.option("--consultas", default=50, show_default=True, help="Pontos sorteados por cenário.")
+    @click.option("--semente", default=1, show_default=True)
+    def bench_geo_command(consultas, semente):
+        """Mede as buscas por área, raio e k vizinhos e confere cada resultado contra a força bruta sobre todos os ninhos."""
+        import random
+        import statistics
+        import time
+        import numpy as np
+        from src.models.ninho import Ninho
+        from src.models.geo import RAIO_TERRA_KM, area_do_raio, ninhos_na_area, ninhos_no_raio, ninhos_proximos
+        from src.models.serializacao import CAMPOS_NINHO_PADRAO, consultar_ninhos
+
+        with app.app_context():
+            todos = np.array(db.session.query(Ninho.id, Ninho.latitude, Ninho.longitude).filter(
+                Ninho.latitude != None, Ninho.longitude != None).all(), dtype=float)
+            if not len(todos):
+                print("Erro: nenhum ninho com coordenadas (use seed-data).")
+                raise SystemExit(1)
+            ids, lat, lon = todos[:, 0].astype(int), np.radians(todos[:, 1]), np.radians(todos[:, 2])
+            print(f"{len(ids)} ninhos com coordenadas")
+
+            def forca_bruta(latitude, longitude):
+                # Mesma fórmula de haversine_km, sobre todos os ninhos de uma vez
+                lat0, lon0 = np.radians(latitude), np.radians(longitude)
+                a = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat0) * np.cos(lat) * np.sin((lon - lon0) / 2) ** 2
+                return 2 * RAIO_TERRA_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+            rng = random.Random(semente)
+            centros = []
+            for _ in range(consultas):
+                ninho_id = int(ids[rng.randrange(len(ids))])
+                latitude, longitude = todos[ids == ninho_id][0, 1:]
+                centros.append((latitude + rng.gauss(0, 0.05), longitude + rng.gauss(0, 0.05)))
+
+            # Retângulos do tamanho de uma tela de mapa (lado em km), centrados nos mesmos pontos
+            cenarios = [(f'área {2 * lado} km x {2 * lado} km, limite {limite}', 'area', lado, limite)
+                        for lado, limite in ((1, 500), (5, 500))]
+            cenarios += [(f'raio {raio} km, limite {limite}', 'raio', raio, limite)
+                         for raio, limite in ((1, 500), (5, 500), (20, 500), (20, 5000))]
+            cenarios += [(f'{k} mais próximos', 'proximos', None, k) for k in (1, 10, 100)]
+            falhou = False
+            for titulo, tipo, raio, limite in cenarios:
+                tempos, resultados, divergentes = [], [], 0
+                for latitude, longitude in centros:
+                    inicio = time.perf_counter()
+                    if tipo == 'area':
+                        encontrados = ninhos_na_area(consultar_ninhos(CAMPOS_NINHO_PADRAO),
+                                                     *area_do_raio(latitude, longitude, raio), limite)
+                    elif tipo == 'proximos':
+                        encontrados = ninhos_proximos(consultar_ninhos(CAMPOS_NINHO_PADRAO), latitude, longitude, limite)
+                    else:
+                        encontrados = ninhos_no_raio(consultar_ninhos(CAMPOS_NINHO_PADRAO), latitude, longitude, raio, limite)
+                    tempos.append((time.perf_counter() - inicio) * 1000)
+                    resultados.append(encontrados)
+                    db.session.rollback()
+
+                # Conferidas depois de medidas: a força bruta sobre todos os ninhos entre uma consulta
+                # e outra tiraria do cache o que uma sequência de buscas de verdade manteria
+                for (latitude, longitude), encontrados in zip(centros, resultados):
+                    if tipo == 'area':
+                        # Qualquer subconjunto serve até o limite: todos dentro, sem repetição, e tantos quantos couberem
+                        min_lat, min_lon, max_lat, max_lon = area_do_raio(latitude, longitude, raio)
+                        dentro = ((todos[:, 1] >= min_lat) & (todos[:, 1] <= max_lat)
+                                  & (todos[:, 2] >= min_lon) & (todos[:, 2] <= max_lon))
+                        obtidos = {linha.id for linha in encontrados}
+                        if (len(obtidos) != len(encontrados) or len(obtidos) != min(limite, int(dentro.sum()))
+                                or not obtidos <= set(ids[dentro].tolist())):
+                            divergentes += 1
+                        continue
+
+                    distancias = forca_bruta(latitude, longitude)
+                    por_id = dict(zip(ids.tolist(), distancias.tolist()))
+                    esperadas = np.sort(distancias if tipo == 'proximos' else distancias[distancias <= raio])[:limite]
+                    obtidas = [distancia for distancia, _ in encontrados]
+                    # Mesmas distâncias (empates podem trocar de id) e cada id na distância informada
+                    if (len(obtidas) != len(esperadas) or not np.allclose(obtidas, esperadas, atol=1e-9)
+                            or any(abs(por_id[linha.id] - distancia) > 1e-9 for distancia, linha in encontrados)):
+                        divergentes += 1
+                falhou |= bool(divergentes)
+                tempos.sort()
+                print(f"{titulo}: p50 {statistics.median(tempos):.2f} ms, p95 {tempos[int(len(tempos) * 0.95)]:.2f} ms; "
+                      f"{'confere com a força bruta' if not divergentes else f'{divergentes} DIVERGENTE(S)'}")
+            if falhou:
+                raise SystemExit(1)
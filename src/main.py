@@ -1,68 +1,135 @@
 import os
 import sys
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
-from flask_mail import Mail
 from src.models.user import db
+from src.services.fila_email import fila_email
+from src.services.identidade import cache_identidade
+from src.services.senhas import senhas
+from src.services.perfil_banco import perfil_banco
+from src.services.cache_respostas import cache_respostas
+from src.services.metricas import metricas
+from src.services.limites import limitador
+from src.services.envios import envios
+from src.services.respostas import ProvedorJSON, compressao
+from src.services.estaticos import ManifestoEstatico
 from src.routes.auth import auth_bp
 from src.routes.ninhos import ninhos_bp
-from src.routes.upload import upload_bp
+from src.routes.upload import upload_bp, uploaded_file, UPLOAD_FOLDER
 from src.routes.ranking import ranking_bp
 from src.routes.admin import admin_bp
 from src.routes.relatorios import relatorios_bp
 from src.routes.contact import contact_bp
+from src.routes.mapa import mapa_bp
+from src.routes.busca import busca_bp
 
 # --- IMPORTAÇÃO DO MANAGE ATUALIZADA ---
 from manage import register_commands
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-
-app.config.from_mapping(
-    SECRET_KEY=os.environ.get('SECRET_KEY', 'chave-local-padrao'),
-    MAX_CONTENT_LENGTH=16 * 1024 * 1024,
-    MAIL_SERVER='smtp.gmail.com',
-    MAIL_PORT=587,
-    MAIL_USE_TLS=True,
-    MAIL_USERNAME=os.environ.get('EMAIL_USER'),
-    MAIL_PASSWORD=os.environ.get('EMAIL_PASS'),
-    SQLALCHEMY_DATABASE_URI=os.environ.get('DATABASE_URL') or f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}",
-    SQLALCHEMY_TRACK_MODIFICATIONS=False
-)
-
-CORS(app)
-mail = Mail(app)
-db.init_app(app)
-
-# --- REGISTRO DOS COMANDOS ATUALIZADO ---
-register_commands(app)
-
-# Registro dos Blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(ninhos_bp, url_prefix='/api')
-app.register_blueprint(upload_bp, url_prefix='/api')
-app.register_blueprint(ranking_bp, url_prefix='/api')
-app.register_blueprint(admin_bp, url_prefix='/api/admin')
-app.register_blueprint(relatorios_bp, url_prefix='/api')
-app.register_blueprint(contact_bp, url_prefix='/api')
-
-from src.models.ninho import Ninho
-
-with app.app_context():
-    db.create_all()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder = app.static_folder
-    if path != "" and os.path.exists(os.path.join(static_folder, path)):
-        return send_from_directory(static_folder, path)
-    else:
-        return send_from_directory(static_folder, 'index.html')
+
+def preparar_na_primeira_requisicao(app):
+    """
+    Cria as tabelas, aplica as migrações e monta os dados derivados na
+    primeira requisição de cada processo, e não ao importar o módulo: comandos
+    da CLI e o boot dos workers não tocam o banco. Em um banco já preparado
+    são só algumas consultas de verificação.
+    """
+    from src.models.esquema import preparar_banco
+    lock = threading.Lock()
+    preparado = []
+
+    def preparar():
+        if preparado:
+            return
+        with lock:
+            if not preparado:
+                preparar_banco()
+                preparado.append(True)
+
+    app.before_request(preparar)
+
+
+def create_app(config=None):
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.json = ProvedorJSON(app)
+
+    app.config.from_mapping(
+        SECRET_KEY=os.environ.get('SECRET_KEY', 'chave-local-padrao'),
+        MAX_CONTENT_LENGTH=16 * 1024 * 1024,
+        IMAGE_WORKERS=int(os.environ.get('IMAGE_WORKERS', 2)),
+        IMAGE_TIMEOUT=int(os.environ.get('IMAGE_TIMEOUT', 30)),
+        PASSWORD_HASH_METHOD=os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+        PASSWORD_HASH_WORKERS=int(os.environ.get('PASSWORD_HASH_WORKERS', 0)),
+        MAIL_SERVER=os.environ.get('MAIL_SERVER', 'smtp.gmail.com'),
+        MAIL_PORT=int(os.environ.get('MAIL_PORT', 587)),
+        MAIL_USE_TLS=os.environ.get('MAIL_USE_TLS', 'true').lower() == 'true',
+        MAIL_USERNAME=os.environ.get('EMAIL_USER'),
+        MAIL_PASSWORD=os.environ.get('EMAIL_PASS'),
+        SQLALCHEMY_DATABASE_URI=os.environ.get('DATABASE_URL') or f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        WEB_THREADS=int(os.environ.get('WEB_THREADS', 1)),
+        SQLITE_JOURNAL_MODE=os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        RESPONSE_CACHE_BACKEND=os.environ.get('RESPONSE_CACHE_BACKEND', 'memoria'),
+        RATE_LIMIT_ENABLED=os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true',
+        RATE_LIMIT_BACKEND=os.environ.get('RATE_LIMIT_BACKEND', 'sqlite'),
+        PROXY_COUNT=int(os.environ.get('PROXY_COUNT', 0)),
+        COMPRESS_ENABLED=os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true',
+        COMPRESS_MIN_SIZE=int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    )
+    if config:
+        app.config.from_mapping(config)
+
+    if app.config['PROXY_COUNT']:
+        # Atrás de proxies reversos: o IP do cliente (usado nos limites por IP) vem do X-Forwarded-For
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_COUNT'], x_proto=app.config['PROXY_COUNT'])
+
+    CORS(app)
+    perfil_banco.init_app(app)  # antes do db.init_app: define as opções do engine
+    db.init_app(app)
+    preparar_na_primeira_requisicao(app)  # antes dos demais hooks que consultam o banco
+    fila_email.init_app(app)  # o Flask-Mail só é carregado no primeiro envio
+    cache_identidade.init_app(app)
+    senhas.init_app(app)
+    cache_respostas.init_app(app)
+    metricas.init_app(app)
+    compressao.init_app(app)  # depois das métricas: elas contam os bytes comprimidos
+    limitador.init_app(app)
+    envios.init_app(app)
+
+    # --- REGISTRO DOS COMANDOS ATUALIZADO ---
+    register_commands(app)
+
+    # Registro dos Blueprints
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(ninhos_bp, url_prefix='/api')
+    app.register_blueprint(upload_bp, url_prefix='/api')
+    app.register_blueprint(ranking_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(relatorios_bp, url_prefix='/api')
+    app.register_blueprint(contact_bp, url_prefix='/api')
+    app.register_blueprint(mapa_bp, url_prefix='/api')
+    app.register_blueprint(busca_bp, url_prefix='/api')
+
+    manifesto_estatico = ManifestoEstatico(app.static_folder, ignorar=(UPLOAD_FOLDER,), recarregar=app.debug)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if path.startswith(f'{UPLOAD_FOLDER}/'):
+            return uploaded_file(path[len(UPLOAD_FOLDER) + 1:])
+        return manifesto_estatico.responder(path) or manifesto_estatico.responder('index.html')
+
+    return app
+
+
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,265 @@
+import re
+import unicodedata
+from collections import defaultdict
+from sqlalchemy import event, func, text, bindparam, delete, update, or_
+from sqlalchemy.orm import Session
+from src.models.user import User, db
+from src.models.ninho import Ninho
+from src.models.eventos import alteracoes, inserir_ausentes
+
+PALAVRAS_VAZIAS = {'a', 'as', 'o', 'os', 'de', 'da', 'das', 'do', 'dos', 'e', 'em', 'na', 'nas', 'no', 'nos'}
+TABELA_FTS = 'termo_busca_fts'
+MAX_CANDIDATOS = 200
+PONTUACAO_MINIMA = 0.3
+_fts_disponivel = set()
+
+
+class TermoBusca(db.Model):
+    """
+    Índice de busca: um termo por região distinta (com o número de ninhos) e
+    um por voluntário, com o texto normalizado. Mantido a cada flush. No
+    SQLite é espelhado por triggers na tabela FTS5 termo_busca_fts (tokens de
+    trigramas); no PostgreSQL o texto tem um índice GIN de trigramas (pg_trgm).
+    Ambos são criados pela migração 4.
+    """
+    __tablename__ = 'termo_busca'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(10), nullable=False)  # 'regiao' ou 'usuario'
+    chave = db.Column(db.String(100), nullable=False)  # nome da região, ou id do voluntário
+    texto = db.Column(db.String(300), nullable=False)
+    contagem = db.Column(db.Integer, nullable=False, default=0)  # ninhos da região; 1 para voluntário ativo
+
+    __table_args__ = (
+        db.Index('uq_termo_busca_tipo_chave', 'tipo', 'chave', unique=True),
+        db.Index('ix_termo_busca_texto', 'texto'),
+    )
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos nem pontuação e sem palavras vazias: 'Praia do Tabuleiro' -> 'praia tabuleiro'."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c)).lower()
+    palavras = re.sub(r'[\W_]+', ' ', sem_acentos).split()
+    return ' '.join([p for p in palavras if p not in PALAVRAS_VAZIAS] or palavras)
+
+
+def trigramas(palavra):
+    # Como no pg_trgm: a palavra ganha dois espaços antes e um depois
+    palavra = f'  {palavra} '
+    return {palavra[i:i + 3] for i in range(len(palavra) - 2)}
+
+
+def pontuar(termo, texto):
+    """
+    Nota de 0 a ~1,25: para cada palavra da busca, 1 se alguma palavra do texto
+    começa com ela, senão a maior semelhança de trigramas (Jaccard) com uma
+    palavra do texto, o que tolera erros de digitação; mais 0,25 se o texto
+    começa com a busca inteira.
+    """
+    palavras = texto.split()
+    notas = []
+    for consultada in termo.split():
+        if any(palavra.startswith(consultada) for palavra in palavras):
+            notas.append(1.0)
+            continue
+        procurados = trigramas(consultada)
+        notas.append(max((len(procurados & trigramas(p)) / len(procurados | trigramas(p)) for p in palavras), default=0.0))
+    return sum(notas) / len(notas) + (0.25 if texto.startswith(termo) else 0.0)
+
+
+def termo_regiao(regiao, contagem=0):
+    return {'tipo': 'regiao', 'chave': regiao, 'texto': normalizar(regiao), 'contagem': contagem}
+
+
+def termo_usuario(valores):
+    return {
+        'tipo': 'usuario', 'chave': str(valores['id']),
+        'texto': normalizar(f"{valores['username']} {valores['nome_completo']}"),
+        'contagem': 1 if valores['ativo'] else 0,
+    }
+
+
+@event.listens_for(Session, 'after_flush')
+def atualizar_busca(session, flush_context):
+    regioes = defaultdict(int)
+    for antes, depois in alteracoes(session, Ninho, ('regiao',)):
+        if antes is not None:
+            regioes[antes['regiao']] -= 1
+        if depois is not None:
+            regioes[depois['regiao']] += 1
+    regioes = {regiao: delta for regiao, delta in regioes.items() if delta}
+    usuarios = list(alteracoes(session, User, ('id', 'username', 'nome_completo', 'ativo')))
+    if not regioes and not usuarios:
+        return
+
+    conn = session.connection()
+    tabela = TermoBusca.__table__
+    chaves = ('tipo', 'chave')
+    if regioes:
+        inserir_ausentes(conn, tabela, chaves, [termo_regiao(regiao) for regiao, delta in regioes.items() if delta > 0])
+        conn.execute(
+            update(tabela).where(tabela.c.tipo == 'regiao', tabela.c.chave == bindparam('regiao'))
+            .values(contagem=tabela.c.contagem + bindparam('delta')),
+            [{'regiao': regiao, 'delta': delta} for regiao, delta in sorted(regioes.items())]
+        )
+
+    removidos = [str(antes['id']) for antes, depois in usuarios if depois is None]
+    if removidos:
+        conn.execute(delete(tabela).where(tabela.c.tipo == 'usuario', tabela.c.chave.in_(removidos)))
+    novos = [termo_usuario(depois) for antes, depois in usuarios if antes is None]
+    alterados = [termo_usuario(depois) for antes, depois in usuarios if antes is not None and depois is not None]
+    inserir_ausentes(conn, tabela, chaves, novos)
+    if alterados:
+        conn.execute(
+            update(tabela).where(tabela.c.tipo == 'usuario', tabela.c.chave == bindparam('usuario'))
+            .values(texto=bindparam('novo_texto'), contagem=bindparam('nova_contagem')),
+            [{'usuario': t['chave'], 'novo_texto': t['texto'], 'nova_contagem': t['contagem']} for t in alterados]
+        )
+
+
+def criar_indice_textual(conn):
+    """Índice de trigramas sobre termo_busca.texto, conforme o banco. Sem suporte, a busca usa LIKE."""
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS ix_termo_busca_trgm ON termo_busca USING gin (texto gin_trgm_ops)'))
+    elif conn.dialect.name == 'sqlite':
+        # FTS5 com conteúdo externo: a tabela virtual guarda só o índice e as triggers a mantêm em dia
+        conn.exec_driver_sql(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS}
+            USING fts5(texto, content='termo_busca', content_rowid='id', tokenize='trigram')""")
+        conn.exec_driver_sql(f"""CREATE TRIGGER IF NOT EXISTS termo_busca_ai AFTER INSERT ON termo_busca BEGIN
+            INSERT INTO {TABELA_FTS}(rowid, texto) VALUES (new.id, new.texto); END""")
+        conn.exec_driver_sql(f"""CREATE TRIGGER IF NOT EXISTS termo_busca_ad AFTER DELETE ON termo_busca BEGIN
+            INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, texto) VALUES ('delete', old.id, old.texto); END""")
+        conn.exec_driver_sql(f"""CREATE TRIGGER IF NOT EXISTS termo_busca_au AFTER UPDATE OF texto ON termo_busca BEGIN
+            INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, texto) VALUES ('delete', old.id, old.texto);
+            INSERT INTO {TABELA_FTS}(rowid, texto) VALUES (new.id, new.texto); END""")
+        conn.exec_driver_sql(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')")
+
+
+def _tem_fts(conn):
+    url = str(conn.engine.url)
+    if url not in _fts_disponivel and conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (TABELA_FTS,)).first():
+        _fts_disponivel.add(url)
+    return url in _fts_disponivel
+
+
+def _candidatos(termo, tipo):
+    """Até MAX_CANDIDATOS termos que compartilham trigramas com a busca, pelo índice do banco."""
+    conn = db.session.connection()
+    tabela = TermoBusca.__table__
+    colunas = 'termo_busca.tipo, termo_busca.chave, termo_busca.texto, termo_busca.contagem'
+    filtro_tipo = ' AND termo_busca.tipo = :tipo' if tipo else ''
+    parametros = {'tipo': tipo, 'limite': MAX_CANDIDATOS}
+    compacto = termo.replace(' ', '')
+
+    if conn.dialect.name == 'postgresql':
+        sql = (f'SELECT {colunas} FROM termo_busca WHERE (texto % :termo OR texto LIKE :contem) '
+               f'AND contagem > 0{filtro_tipo} ORDER BY similarity(texto, :termo) DESC LIMIT :limite')
+        return conn.execute(text(sql), dict(parametros, termo=termo, contem=f'%{termo}%')).all()
+
+    # Qualquer trigrama em comum já torna o termo candidato (tolerância a erros); trigramas
+    # com espaço ficam de fora, e palavras curtas ('ab cd') podem não deixar nenhum
+    consulta = ' OR '.join(sorted({f'"{termo[i:i + 3]}"' for i in range(len(termo) - 2) if ' ' not in termo[i:i + 3]}))
+    if conn.dialect.name == 'sqlite' and consulta and _tem_fts(conn):
+        # O bm25 do FTS5 põe primeiro os que têm mais trigramas em comum
+        sql = (f'SELECT {colunas} FROM {TABELA_FTS} JOIN termo_busca ON termo_busca.id = {TABELA_FTS}.rowid '
+               f'WHERE {TABELA_FTS} MATCH :consulta AND termo_busca.contagem > 0{filtro_tipo} '
+               f'ORDER BY {TABELA_FTS}.rank LIMIT :limite')
+        return conn.execute(text(sql), dict(parametros, consulta=consulta)).all()
+
+    # Busca curta demais para trigramas (ou banco sem índice textual): prefixo pelo índice em texto,
+    # ou o início de cada palavra em qualquer posição
+    condicoes = [tabela.c.texto.between(termo, termo + '\uffff')]
+    if len(compacto) >= 3:
+        condicoes += [tabela.c.texto.contains(palavra[:3], autoescape=True) for palavra in termo.split()]
+    query = db.session.query(tabela.c.tipo, tabela.c.chave, tabela.c.texto, tabela.c.contagem)\
+        .filter(or_(*condicoes), tabela.c.contagem > 0)
+    if tipo:
+        query = query.filter(tabela.c.tipo == tipo)
+    return query.limit(MAX_CANDIDATOS).all()
+
+
+def buscar(consulta, tipo=None, limite=10):
+    """
+    Regiões e voluntários que casam com `consulta`, do mais ao menos
+    relevante. Grafias da mesma região que normalizam para o mesmo texto
+    ('Praia do Tabuleiro', 'praia tabuleiro') viram um resultado só, com o
+    número de ninhos de cada variante.
+    """
+    termo = normalizar(consulta)
+    if not termo:
+        return []
+
+    resultados = {}
+    for tipo_termo, chave, texto, contagem in _candidatos(termo, tipo):
+        nota = pontuar(termo, texto)
+        if nota < PONTUACAO_MINIMA:
+            continue
+        if tipo_termo == 'regiao':
+            item = resultados.setdefault(('regiao', texto), {'tipo': 'regiao', 'pontuacao': nota, 'ninhos': 0, 'variantes': {}})
+            item['ninhos'] += contagem
+            item['variantes'][chave] = contagem
+        else:
+            resultados[('usuario', chave)] = {'tipo': 'usuario', 'pontuacao': nota, 'id': int(chave)}
+
+    ordenados = sorted(resultados.values(), key=lambda item: (-item['pontuacao'], -item.get('ninhos', 0)))[:limite]
+    usuarios = {user.id: user for user in db.session.query(User.id, User.username, User.nome_completo).filter(
+        User.id.in_([item['id'] for item in ordenados if item['tipo'] == 'usuario']))}
+    for item in ordenados:
+        item['pontuacao'] = round(item['pontuacao'], 3)
+        if item['tipo'] == 'regiao':
+            item['regiao'] = max(item['variantes'], key=item['variantes'].get)
+        else:
+            user = usuarios[item['id']]
+            item.update(username=user.username, nome_completo=user.nome_completo)
+    return ordenados
+
+
+def recalcular_busca():
+    termos = {
+        ('regiao', regiao): (normalizar(regiao), contagem)
+        for regiao, contagem in db.session.query(Ninho.regiao, func.count(Ninho.id)).group_by(Ninho.regiao)
+    }
+    for user in db.session.query(User.id, User.username, User.nome_completo, User.ativo):
+        termo = termo_usuario(user._asdict())
+        termos[('usuario', termo['chave'])] = (termo['texto'], termo['contagem'])
+    return termos
+
+
+def busca_atual():
+    """Termos armazenados, ignorando regiões que ficaram sem ninhos."""
+    return {
+        (termo.tipo, termo.chave): (termo.texto, termo.contagem)
+        for termo in TermoBusca.query.all()
+        if termo.tipo == 'usuario' or termo.contagem
+    }
+
+
+def reconstruir_busca():
+    """Apaga e regrava os termos de busca a partir de ninhos e usuários."""
+    TermoBusca.query.delete()
+    linhas = [
+        {'tipo': tipo, 'chave': chave, 'texto': texto, 'contagem': contagem}
+        for (tipo, chave), (texto, contagem) in recalcular_busca().items()
+    ]
+    if linhas:
+        db.session.execute(TermoBusca.__table__.insert(), linhas)
+    db.session.commit()
+
+
+def verificar_busca():
+    """Retorna as divergências {(tipo, chave): (armazenado, recalculado)}."""
+    armazenado, recalculado = busca_atual(), recalcular_busca()
+    return {
+        chave: (armazenado.get(chave), recalculado.get(chave))
+        for chave in set(armazenado) | set(recalculado)
+        if armazenado.get(chave) != recalculado.get(chave)
+    }
+
+
+def garantir_busca():
+    """Constrói os termos na primeira execução sobre um banco já populado."""
+    if db.session.query(TermoBusca.id).first() is None:
+        reconstruir_busca()
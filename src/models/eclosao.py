@@ -0,0 +1,105 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, bindparam
+from src.models.user import db
+from src.models.ninho import Ninho
+from src.models.versao import avancar_versao
+
+# Um ninho está "prestes a eclodir" se a data prevista cai entre hoje e hoje + PRESTES_ECLODIR_DIAS
+PRESTES_ECLODIR_DIAS = 5
+JANELA_MAXIMA_DIAS = 366
+
+
+def hoje():
+    # As datas de registro são gravadas em UTC (datetime.utcnow)
+    return datetime.utcnow().date()
+
+
+def data_prevista(data_registro, dias_para_eclosao):
+    return (data_registro + timedelta(days=dias_para_eclosao)).date()
+
+
+@event.listens_for(Ninho, 'before_insert')
+@event.listens_for(Ninho, 'before_update')
+def atualizar_data_prevista(mapper, connection, ninho):
+    if ninho.data_registro is None:
+        ninho.data_registro = datetime.utcnow()
+    ninho.data_prevista_eclosao = data_prevista(ninho.data_registro, ninho.dias_para_eclosao)
+
+
+def filtro_janela(inicio, fim):
+    """Faixa de datas previstas: vira uma busca por faixa em ix_ninho_eclosao."""
+    return Ninho.data_prevista_eclosao.between(inicio, fim)
+
+
+def contar_prestes_eclodir(referencia=None):
+    referencia = referencia or hoje()
+    return db.session.query(func.count()).select_from(Ninho).filter(
+        filtro_janela(referencia, referencia + timedelta(days=PRESTES_ECLODIR_DIAS))
+    ).scalar()
+
+
+def consulta_calendario(inicio, fim, regiao=None):
+    """
+    Ninhos e ovos por (data prevista, região); coberta pelo índice
+    ix_ninho_eclosao ou, com `regiao`, por ix_ninho_regiao_eclosao (só a
+    faixa de datas da região é lida).
+    """
+    query = db.session.query(
+        Ninho.data_prevista_eclosao, Ninho.regiao, func.count(), func.sum(Ninho.quantidade_ovos)
+    ).filter(filtro_janela(inicio, fim))
+    if regiao:
+        query = query.filter(Ninho.regiao == regiao)
+    return query.group_by(Ninho.data_prevista_eclosao, Ninho.regiao)
+
+
+def calendario(inicio, fim, agrupar='dia', regiao=None):
+    """
+    Previsão de eclosões de `inicio` a `fim` (inclusive), um período por dia
+    ou por semana (de segunda a domingo), com os totais por região. A primeira
+    e a última semana ficam cortadas em `inicio` e `fim`: cada período traz
+    as datas que de fato cobre. Períodos sem ninhos aparecem zerados, para o
+    calendário não ter buracos.
+    """
+    def periodo(data):
+        return max(inicio, data - timedelta(days=data.weekday())) if agrupar == 'semana' else data
+
+    periodos = {}
+    data = inicio
+    while data <= fim:
+        periodos[data] = {'ninhos': 0, 'ovos': 0, 'por_regiao': defaultdict(int)}
+        # Na semana, a próxima segunda-feira
+        data += timedelta(days=7 - data.weekday() if agrupar == 'semana' else 1)
+
+    for data, nome_regiao, ninhos, ovos in consulta_calendario(inicio, fim, regiao):
+        item = periodos[periodo(data)]
+        item['ninhos'] += ninhos
+        item['ovos'] += int(ovos or 0)
+        item['por_regiao'][nome_regiao] += ninhos
+
+    inicios = list(periodos)
+    fins = [proximo - timedelta(days=1) for proximo in inicios[1:]] + [fim]
+    return [
+        {'inicio': data.isoformat(), 'fim': ate.isoformat(), 'ninhos': item['ninhos'], 'ovos': item['ovos'],
+         'por_regiao': dict(item['por_regiao'])}
+        for (data, item), ate in zip(periodos.items(), fins)
+    ]
+
+
+def garantir_datas_eclosao(lote=5000):
+    """Preenche data_prevista_eclosao dos ninhos gravados antes da coluna existir."""
+    total = 0
+    while True:
+        pendentes = db.session.query(Ninho.id, Ninho.data_registro, Ninho.dias_para_eclosao).filter(
+            Ninho.data_prevista_eclosao == None
+        ).limit(lote).all()
+        if not pendentes:
+            return total
+        db.session.execute(
+            Ninho.__table__.update().where(Ninho.__table__.c.id == bindparam('ninho_id')).values(data_prevista_eclosao=bindparam('data')),
+            [{'ninho_id': ninho_id, 'data': data_prevista(registro, dias)} for ninho_id, registro, dias in pendentes]
+        )
+        # As respostas em cache (estatísticas, calendário) passam a ver as datas novas
+        avancar_versao(db.session.connection())
+        db.session.commit()
+        total += len(pendentes)
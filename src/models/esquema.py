@@ -0,0 +1,153 @@
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from src.models.user import User, db
+from src.models.ninho import Ninho
+from src.models.pontuacao import PontuacaoUsuario
+from src.models.estatisticas import ResumoNinhos
+
+MIGRACOES = []
+
+
+class VersaoEsquema(db.Model):
+    """Migrações já aplicadas ao banco (uma linha por versão)."""
+    __tablename__ = 'versao_esquema'
+
+    versao = db.Column(db.Integer, primary_key=True)
+    descricao = db.Column(db.String(200), nullable=False)
+    aplicada_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+def migracao(versao, descricao):
+    """Registra uma migração. Ela recebe a conexão e deve poder rodar sobre um banco já atualizado."""
+    def registrar(funcao):
+        MIGRACOES.append((versao, descricao, funcao))
+        MIGRACOES.sort(key=lambda item: item[0])
+        return funcao
+    return registrar
+
+
+def adicionar_coluna(conn, coluna):
+    """ALTER TABLE ADD COLUMN, se a coluna (anulável) ainda não existir."""
+    tabela = coluna.table.name
+    if coluna.name not in {c['name'] for c in inspect(conn).get_columns(tabela)}:
+        tipo = coluna.type.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE "{tabela}" ADD COLUMN "{coluna.name}" {tipo}'))
+
+
+def criar_indices(conn, tabela, *nomes):
+    """Cria os índices declarados no modelo com esses nomes, se ainda não existirem."""
+    for indice in tabela.indexes:
+        if indice.name in nomes:
+            indice.create(conn, checkfirst=True)
+
+
+@migracao(1, 'Colunas celula_geo e id_cliente em ninho')
+def _colunas_geo_e_cliente(conn):
+    adicionar_coluna(conn, Ninho.__table__.c.celula_geo)
+    adicionar_coluna(conn, Ninho.__table__.c.id_cliente)
+    # ix_ninho_celula_geo foi substituído por ix_ninho_geo na migração 6
+    criar_indices(conn, Ninho.__table__, 'uq_ninho_usuario_id_cliente')
+
+
+@migracao(2, 'Índices das consultas de listagem, relatórios, ranking e estatísticas')
+def _indices_consultas(conn):
+    criar_indices(conn, Ninho.__table__, 'ix_ninho_usuario_data', 'ix_ninho_data_registro', 'ix_ninho_risco_regiao',
+                  'ix_ninho_regiao', 'ix_ninho_status_predadores', 'ix_ninho_dias_para_eclosao')
+    criar_indices(conn, User.__table__, 'ix_user_ativo')
+    criar_indices(conn, PontuacaoUsuario.__table__, 'ix_pontuacao_ranking')
+
+
+@migracao(3, 'Data prevista de eclosão indexada em ninho')
+def _data_prevista_eclosao(conn):
+    adicionar_coluna(conn, Ninho.__table__.c.data_prevista_eclosao)
+    criar_indices(conn, Ninho.__table__, 'ix_ninho_eclosao')
+    # "Prestes a eclodir" passou a ser uma faixa de datas; a contagem congelada no resumo e
+    # o índice em dias_para_eclosao que a sustentava não são mais usados
+    conn.execute(ResumoNinhos.__table__.delete().where(ResumoNinhos.dimensao == 'prestes_eclodir'))
+    conn.execute(text('DROP INDEX IF EXISTS ix_ninho_dias_para_eclosao'))
+
+
+@migracao(4, 'Índice de busca por regiões e voluntários')
+def _indice_busca(conn):
+    from src.models.busca import criar_indice_textual
+    criar_indices(conn, Ninho.__table__, 'ix_ninho_regiao_data')
+    conn.execute(text('DROP INDEX IF EXISTS ix_ninho_regiao'))
+    criar_indice_textual(conn)
+
+
+@migracao(5, 'Índice de cobertura das análises de tendências')
+def _indice_analise(conn):
+    criar_indices(conn, Ninho.__table__, 'ix_ninho_analise')
+
+
+@migracao(6, 'Índice de cobertura das buscas espaciais')
+def _indice_geo(conn):
+    criar_indices(conn, Ninho.__table__, 'ix_ninho_geo')
+    conn.execute(text('DROP INDEX IF EXISTS ix_ninho_celula_geo'))
+
+
+@migracao(7, 'Índice do calendário de eclosões por região')
+def _indice_eclosao_regiao(conn):
+    criar_indices(conn, Ninho.__table__, 'ix_ninho_regiao_eclosao')
+
+
+def versoes_aplicadas():
+    if not inspect(db.engine).has_table(VersaoEsquema.__tablename__):
+        return set()
+    with db.engine.connect() as conn:
+        return set(conn.execute(db.select(VersaoEsquema.versao)).scalars())
+
+
+def migracoes_pendentes():
+    aplicadas = versoes_aplicadas()
+    return [(versao, descricao) for versao, descricao, _ in MIGRACOES if versao not in aplicadas]
+
+
+def aplicar_migracoes(ate=None):
+    """
+    Aplica, em ordem, as migrações ainda não registradas em versao_esquema,
+    cada uma em sua própria transação. O db.create_all() cria as tabelas
+    novas; as migrações cuidam do que ele não faz (colunas e índices em
+    tabelas existentes). Retorna as versões aplicadas.
+    """
+    VersaoEsquema.__table__.create(db.engine, checkfirst=True)
+    ja_aplicadas = versoes_aplicadas()
+    aplicadas = []
+    for versao, descricao, funcao in MIGRACOES:
+        if versao in ja_aplicadas or (ate is not None and versao > ate):
+            continue
+        try:
+            with db.engine.begin() as conn:
+                funcao(conn)
+                conn.execute(VersaoEsquema.__table__.insert().values(
+                    versao=versao, descricao=descricao, aplicada_em=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # Outro processo aplicou a mesma versão ao mesmo tempo
+            continue
+        aplicadas.append(versao)
+    return aplicadas
+
+
+def preparar_banco(ate=None):
+    """
+    Deixa o banco pronto para a aplicação: cria as tabelas novas, aplica as
+    migrações e monta os dados derivados que ainda não existirem. Roda na
+    primeira requisição de cada processo e no comando db-upgrade.
+    """
+    from src.models.estatisticas import garantir_resumo
+    from src.models.pontuacao import garantir_pontuacao
+    from src.models.geo import garantir_celulas
+    from src.models.mapa import garantir_grade
+    from src.models.eclosao import garantir_datas_eclosao
+    from src.models.busca import garantir_busca
+    db.create_all()
+    aplicadas = aplicar_migracoes(ate)
+    garantir_celulas()
+    garantir_datas_eclosao()
+    garantir_resumo()
+    garantir_pontuacao()
+    garantir_grade()
+    garantir_busca()
+    return aplicadas
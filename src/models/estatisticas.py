@@ -0,0 +1,146 @@
+from collections import defaultdict
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.ninho import Ninho
+from src.models.eventos import alteracoes, incrementar
+from src.models.versao import avancar_versao
+from src.models.eclosao import contar_prestes_eclodir
+
+# Dimensões lidas por obter_resumo de uma vez (critico_regiao é consultada à parte)
+DIMENSOES_RESUMO = ('total', 'status', 'risco', 'predadores_danificados')
+CAMPOS = ('regiao', 'quantidade_ovos', 'status', 'risco', 'predadores')
+
+
+class ResumoNinhos(db.Model):
+    """
+    Agregados de Ninho mantidos incrementalmente a cada insert/update/delete,
+    para que /api/estatisticas não precise varrer a tabela de ninhos.
+    Cada linha é uma contagem (e soma de ovos) para uma dimensão e uma chave,
+    ex.: ('risco', 'crítico') ou ('critico_regiao', 'Praia do Tabuleiro').
+    """
+    __tablename__ = 'resumo_ninhos'
+
+    dimensao = db.Column(db.String(30), primary_key=True)
+    chave = db.Column(db.String(100), primary_key=True, default='')
+    contagem = db.Column(db.Integer, nullable=False, default=0)
+    soma_ovos = db.Column(db.Integer, nullable=False, default=0)
+
+
+def contribuicoes(valores):
+    """Linhas do resumo às quais um ninho com estes valores contribui."""
+    chaves = [('total', ''), ('status', valores['status']), ('risco', valores['risco'])]
+    if valores['risco'] == 'crítico':
+        chaves.append(('critico_regiao', valores['regiao']))
+    if valores['predadores'] and valores['status'] == 'danificado':
+        chaves.append(('predadores_danificados', ''))
+    return chaves
+
+
+@event.listens_for(Session, 'after_flush')
+def atualizar_resumo(session, flush_context):
+    deltas = defaultdict(lambda: [0, 0])
+    for antes, depois in alteracoes(session, Ninho, CAMPOS):
+        for valores, sinal in ((antes, -1), (depois, 1)):
+            if valores is None:
+                continue
+            valores = dict(valores, predadores=bool(valores['predadores']))
+            for chave in contribuicoes(valores):
+                deltas[chave][0] += sinal
+                deltas[chave][1] += sinal * valores['quantidade_ovos']
+
+    if not deltas:
+        return
+    conn = session.connection()
+    tabela = ResumoNinhos.__table__
+    incrementar(conn, tabela, ('dimensao', 'chave'), [
+        {'dimensao': dimensao, 'chave': chave, 'contagem': contagem, 'soma_ovos': soma_ovos}
+        for (dimensao, chave), (contagem, soma_ovos) in deltas.items()
+        if contagem or soma_ovos
+    ])
+
+
+def recalcular_resumo():
+    """Recalcula as linhas do resumo diretamente da tabela de ninhos."""
+    def agrupar(dimensao, coluna, *filtros):
+        consulta = db.session.query(coluna, func.count(Ninho.id), func.coalesce(func.sum(Ninho.quantidade_ovos), 0))
+        return {(dimensao, chave): (contagem, int(soma)) for chave, contagem, soma in consulta.filter(*filtros).group_by(coluna)}
+
+    def totalizar(dimensao, *filtros):
+        contagem, soma = db.session.query(func.count(Ninho.id), func.coalesce(func.sum(Ninho.quantidade_ovos), 0)).filter(*filtros).one()
+        return {(dimensao, ''): (contagem, int(soma))}
+
+    linhas = {}
+    linhas.update(totalizar('total'))
+    linhas.update(agrupar('status', Ninho.status))
+    linhas.update(agrupar('risco', Ninho.risco))
+    linhas.update(agrupar('critico_regiao', Ninho.regiao, Ninho.risco == 'crítico'))
+    linhas.update(totalizar('predadores_danificados', Ninho.predadores == True, Ninho.status == 'danificado'))
+    return {chave: valores for chave, valores in linhas.items() if valores[0] or chave == ('total', '')}
+
+
+def resumo_atual():
+    """Linhas do resumo armazenado, ignorando chaves que zeraram."""
+    return {
+        (linha.dimensao, linha.chave): (linha.contagem, linha.soma_ovos)
+        for linha in ResumoNinhos.query.all()
+        if linha.contagem or (linha.dimensao, linha.chave) == ('total', '')
+    }
+
+
+def reconstruir_resumo():
+    """Apaga e regrava o resumo a partir da tabela de ninhos."""
+    ResumoNinhos.query.delete()
+    for (dimensao, chave), (contagem, soma_ovos) in recalcular_resumo().items():
+        db.session.add(ResumoNinhos(dimensao=dimensao, chave=chave, contagem=contagem, soma_ovos=soma_ovos))
+    avancar_versao(db.session.connection())
+    db.session.commit()
+
+
+def verificar_resumo():
+    """Retorna as divergências {(dimensao, chave): (armazenado, recalculado)}."""
+    armazenado, recalculado = resumo_atual(), recalcular_resumo()
+    return {
+        chave: (armazenado.get(chave), recalculado.get(chave))
+        for chave in set(armazenado) | set(recalculado)
+        if armazenado.get(chave) != recalculado.get(chave)
+    }
+
+
+def garantir_resumo():
+    """Constrói o resumo na primeira execução sobre um banco já populado."""
+    if db.session.get(ResumoNinhos, ('total', '')) is None:
+        reconstruir_resumo()
+
+
+def obter_resumo():
+    """
+    Monta a resposta de /api/estatisticas lendo o resumo. Os ninhos prestes a
+    eclodir dependem da data de hoje e não cabem no resumo: são contados por
+    uma busca por faixa no índice de data prevista.
+    """
+    linhas = ResumoNinhos.query.filter(
+        ResumoNinhos.dimensao.in_(DIMENSOES_RESUMO), ResumoNinhos.contagem > 0
+    ).all()
+    por_dimensao = defaultdict(dict)
+    for linha in linhas:
+        por_dimensao[linha.dimensao][linha.chave] = linha
+
+    critico = por_dimensao['risco'].get('crítico')
+    regiao_critica = ResumoNinhos.query.filter(
+        ResumoNinhos.dimensao == 'critico_regiao', ResumoNinhos.contagem > 0
+    ).order_by(ResumoNinhos.contagem.desc()).first()
+
+    def contagem(dimensao):
+        linha = por_dimensao[dimensao].get('')
+        return linha.contagem if linha else 0
+
+    return {
+        'total_ninhos': contagem('total'),
+        'ninhos_por_status': {chave: linha.contagem for chave, linha in por_dimensao['status'].items()},
+        'ninhos_por_risco': {chave: linha.contagem for chave, linha in por_dimensao['risco'].items()},
+        'ninhos_prestes_eclodir': contar_prestes_eclodir(),
+        'media_ovos_critico': round(critico.soma_ovos / critico.contagem, 2) if critico else 0,
+        'regiao_mais_criticos': regiao_critica.chave if regiao_critica else None,
+        'ninhos_predadores_danificados': contagem('predadores_danificados')
+    }
@@ -0,0 +1,89 @@
+from importlib import import_module
+from sqlalchemy import inspect, update, insert, select
+
+
+def _valor_antigo(obj, campo):
+    """Valor do campo antes das alterações pendentes na sessão."""
+    historico = inspect(obj).attrs[campo].history
+    if historico.deleted:
+        return historico.deleted[0]
+    if historico.unchanged:
+        return historico.unchanged[0]
+    return getattr(obj, campo)
+
+
+def alteracoes(session, modelo, campos):
+    """
+    Percorre os objetos de `modelo` alterados no flush atual e devolve pares
+    (antes, depois) com os valores de `campos`. Inserções chegam como
+    (None, depois) e remoções como (antes, None).
+    Deve ser chamado em um listener 'after_flush', quando a sessão ainda
+    mantém o estado anterior ao flush.
+    """
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, modelo):
+                yield None, {c: getattr(obj, c) for c in campos}
+        for obj in session.deleted:
+            if isinstance(obj, modelo):
+                yield {c: _valor_antigo(obj, c) for c in campos}, None
+        for obj in session.dirty:
+            if isinstance(obj, modelo) and session.is_modified(obj):
+                antes = {c: _valor_antigo(obj, c) for c in campos}
+                depois = {c: getattr(obj, c) for c in campos}
+                if antes != depois:
+                    yield antes, depois
+
+
+def incrementar(conn, tabela, chaves, linhas, fixas=()):
+    """
+    Soma os deltas de cada linha (dicts com as colunas `chaves` e as colunas
+    a incrementar) à linha correspondente da tabela, criando-a se ainda não
+    existir; colunas em `fixas` só valem ao criar a linha. No SQLite e no
+    PostgreSQL é um único upsert em executemany; as linhas são ordenadas pela
+    chave para que transações concorrentes travem as mesmas linhas na mesma
+    ordem.
+    """
+    if not linhas:
+        return
+    linhas = sorted(linhas, key=lambda linha: tuple(linha[coluna] for coluna in chaves))
+    deltas = [coluna for coluna in linhas[0] if coluna not in chaves and coluna not in fixas]
+    dialeto = conn.dialect.name
+    if dialeto in ('sqlite', 'postgresql'):
+        # Importado aqui para não carregar os dois dialetos no boot
+        modulo = import_module(f'sqlalchemy.dialects.{dialeto}')
+        stmt = modulo.insert(tabela)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(chaves),
+            set_={coluna: tabela.c[coluna] + stmt.excluded[coluna] for coluna in deltas}
+        )
+        conn.execute(stmt, linhas)
+        return
+
+    for linha in linhas:
+        filtro = [tabela.c[coluna] == linha[coluna] for coluna in chaves]
+        resultado = conn.execute(
+            update(tabela).where(*filtro).values({tabela.c[c]: tabela.c[c] + linha[c] for c in deltas})
+        )
+        if resultado.rowcount == 0:
+            conn.execute(insert(tabela).values(**linha))
+
+
+def inserir_ausentes(conn, tabela, chaves, linhas):
+    """
+    Insere as linhas cuja chave ainda não existe na tabela, sem alterar as
+    que já existem (nem falhar se outra transação acabou de inseri-las).
+    """
+    if not linhas:
+        return
+    linhas = sorted(linhas, key=lambda linha: tuple(linha[coluna] for coluna in chaves))
+    dialeto = conn.dialect.name
+    if dialeto in ('sqlite', 'postgresql'):
+        modulo = import_module(f'sqlalchemy.dialects.{dialeto}')
+        conn.execute(modulo.insert(tabela).on_conflict_do_nothing(index_elements=list(chaves)), linhas)
+        return
+
+    for linha in linhas:
+        filtro = [tabela.c[coluna] == linha[coluna] for coluna in chaves]
+        if conn.execute(select(tabela.c[chaves[0]]).where(*filtro)).first() is None:
+            conn.execute(insert(tabela).values(**linha))
@@ -0,0 +1,171 @@
+import math
+from functools import lru_cache
+import numpy as np
+from sqlalchemy import event, or_, and_, bindparam, text
+from src.models.user import db
+from src.models.ninho import Ninho
+
+# Grade regular de RESOLUCAO graus (~1,1 km no equador). Cada ninho guarda o
+# número da célula em Ninho.celula_geo (indexado), e as buscas espaciais viram
+# buscas por faixas contíguas de células no índice, refinadas por lat/lon.
+RESOLUCAO = 0.01
+COLUNAS_GRADE = int(round(360 / RESOLUCAO))
+MAX_FAIXAS = 64
+RAIO_TERRA_KM = 6371.0088
+# Raio do primeiro passo das buscas por proximidade: pequeno, porque nas praias
+# de desova uma célula da grade chega a ter milhares de ninhos
+RAIO_INICIAL_KM = 0.05
+COLUNAS_AREA = [('id', np.int64), ('latitude', np.float64), ('longitude', np.float64)]
+
+
+def celula(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    linha = min(int((latitude + 90) // RESOLUCAO), int(round(180 / RESOLUCAO)) - 1)
+    coluna = min(int((longitude + 180) // RESOLUCAO), COLUNAS_GRADE - 1)
+    return linha * COLUNAS_GRADE + coluna
+
+
+@event.listens_for(Ninho, 'before_insert')
+@event.listens_for(Ninho, 'before_update')
+def atualizar_celula(mapper, connection, ninho):
+    ninho.celula_geo = celula(ninho.latitude, ninho.longitude)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def faixas_celulas(min_lat, min_lon, max_lat, max_lon):
+    """
+    Faixas (primeira, última) de células que cobrem o retângulo: uma por linha
+    da grade para retângulos pequenos; para os grandes, uma única faixa que
+    cobre todas as linhas (sempre refinada pelas coordenadas).
+    """
+    primeira, ultima = celula(min_lat, min_lon), celula(max_lat, max_lon)
+    coluna_min, coluna_max = primeira % COLUNAS_GRADE, ultima % COLUNAS_GRADE
+    linha_min, linha_max = primeira // COLUNAS_GRADE, ultima // COLUNAS_GRADE
+    if linha_max - linha_min + 1 <= MAX_FAIXAS:
+        return [(linha * COLUNAS_GRADE + coluna_min, linha * COLUNAS_GRADE + coluna_max)
+                for linha in range(linha_min, linha_max + 1)]
+    return [(primeira, ultima)]
+
+
+def filtro_area(min_lat, min_lon, max_lat, max_lon):
+    """Condição SQL para os ninhos dentro do retângulo."""
+    return and_(
+        or_(*[Ninho.celula_geo.between(inicio, fim) for inicio, fim in faixas_celulas(min_lat, min_lon, max_lat, max_lon)]),
+        Ninho.latitude.between(min_lat, max_lat),
+        Ninho.longitude.between(min_lon, max_lon)
+    )
+
+
+@lru_cache(maxsize=None)
+def _sql_area(quantidade_faixas):
+    """
+    (id, lat, lon) dos ninhos no retângulo, para `quantidade_faixas` faixas de
+    células. Montado uma vez por quantidade: os passos das buscas por
+    proximidade só trocam os parâmetros, sem remontar a expressão.
+    """
+    celulas = ' OR '.join(f'celula_geo BETWEEN :inicio{i} AND :fim{i}' for i in range(quantidade_faixas))
+    return text(f'SELECT id, latitude, longitude FROM {Ninho.__tablename__} WHERE ({celulas}) '
+                'AND latitude BETWEEN :min_lat AND :max_lat AND longitude BETWEEN :min_lon AND :max_lon')
+
+
+def _parametros_area(min_lat, min_lon, max_lat, max_lon):
+    faixas = faixas_celulas(min_lat, min_lon, max_lat, max_lon)
+    parametros = {'min_lat': min_lat, 'max_lat': max_lat, 'min_lon': min_lon, 'max_lon': max_lon}
+    for i, (inicio, fim) in enumerate(faixas):
+        parametros[f'inicio{i}'], parametros[f'fim{i}'] = inicio, fim
+    return _sql_area(len(faixas)), parametros
+
+
+def area_do_raio(latitude, longitude, raio_km):
+    """Retângulo que contém o círculo de `raio_km` em torno do ponto."""
+    delta_lat = math.degrees(raio_km / RAIO_TERRA_KM)
+    delta_lon = math.degrees(raio_km / (RAIO_TERRA_KM * max(math.cos(math.radians(latitude)), 1e-6)))
+    return (
+        max(latitude - delta_lat, -90.0), max(longitude - delta_lon, -180.0),
+        min(latitude + delta_lat, 90.0), min(longitude + delta_lon, 180.0)
+    )
+
+
+def ninhos_na_area(query, min_lat, min_lon, max_lat, max_lon, limite):
+    return query.filter(filtro_area(min_lat, min_lon, max_lat, max_lon)).limit(limite).all()
+
+
+def _mais_proximos(latitude, longitude, k, raio_maximo_km):
+    """
+    [(distância, id)] dos k ninhos mais próximos a até `raio_maximo_km`, em
+    ordem. O raio começa em RAIO_INICIAL_KM e cresce até que haja k ninhos
+    dentro dele: tudo que está mais perto já foi visto, então a busca para ali
+    sem ler o resto do raio máximo. Cada passo lê só (id, lat, lon), pelo
+    índice de cobertura ix_ninho_geo; as linhas completas são buscadas
+    depois, só as k.
+    """
+    lat0, lon0 = math.radians(latitude), math.radians(longitude)
+    cos_lat0 = math.cos(lat0)
+    raio_km = min(RAIO_INICIAL_KM, raio_maximo_km)
+    while True:
+        # O termo `a` do haversine cresce com a distância: compará-lo com o do raio
+        # dispensa o asin e a raiz para cada linha lida; a distância sai só para as k
+        limite_a = math.sin(min(raio_km / (2 * RAIO_TERRA_KM), math.pi / 2)) ** 2
+        sql, parametros = _parametros_area(*area_do_raio(latitude, longitude, raio_km))
+        # Direto do cursor do driver para arrays: milhares de linhas por passo nas praias mais densas
+        resultado = db.session.connection().execute(sql, parametros)
+        try:
+            linhas = np.fromiter(resultado.cursor, dtype=COLUNAS_AREA)
+        finally:
+            resultado.close()
+        lat, lon = np.radians(linhas['latitude']), np.radians(linhas['longitude'])
+        a = np.sin((lat - lat0) / 2) ** 2 + cos_lat0 * np.cos(lat) * np.sin((lon - lon0) / 2) ** 2
+        perto = a <= limite_a
+        quantidade = int(perto.sum())
+        if quantidade >= k or raio_km >= raio_maximo_km:
+            a, ids = a[perto], linhas['id'][perto]
+            ordem = np.lexsort((ids, a))[:k]
+            distancias = 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.minimum(a[ordem], 1.0)))
+            return list(zip(distancias.tolist(), ids[ordem].tolist()))
+        # Próximo raio pela densidade vista até aqui (área proporcional a k), entre 2 e 8 vezes o atual
+        fator = math.sqrt(k / quantidade) * 1.2 if quantidade else 8
+        raio_km = min(raio_km * min(max(fator, 2), 8), raio_maximo_km)
+
+
+def _linhas_completas(query, encontrados):
+    if not encontrados:
+        return []
+    # Pela conexão, sem a camada de carregamento do ORM: a consulta só traz colunas
+    # e os ids vão num único parâmetro expandido, sem um literal por id na expressão
+    consulta = query.filter(Ninho.id.in_(bindparam('ids', expanding=True))).statement
+    resultado = db.session.connection().execute(consulta, {'ids': [ninho_id for _, ninho_id in encontrados]})
+    linhas = {linha.id: linha for linha in resultado.all()}
+    return [(distancia, linhas[ninho_id]) for distancia, ninho_id in encontrados if ninho_id in linhas]
+
+
+def ninhos_no_raio(query, latitude, longitude, raio_km, limite):
+    """Ninhos a até `raio_km` do ponto, do mais próximo ao mais distante (no máximo `limite`)."""
+    return _linhas_completas(query, _mais_proximos(latitude, longitude, limite, raio_km))
+
+
+def ninhos_proximos(query, latitude, longitude, k, raio_maximo_km=20000):
+    """Os k ninhos mais próximos do ponto."""
+    return _linhas_completas(query, _mais_proximos(latitude, longitude, k, raio_maximo_km))
+
+
+def garantir_celulas(lote=5000):
+    """Preenche celula_geo dos ninhos com coordenadas gravados antes do índice espacial."""
+    total = 0
+    while True:
+        pendentes = db.session.query(Ninho.id, Ninho.latitude, Ninho.longitude).filter(
+            Ninho.celula_geo == None, Ninho.latitude != None, Ninho.longitude != None
+        ).limit(lote).all()
+        if not pendentes:
+            return total
+        db.session.execute(
+            Ninho.__table__.update().where(Ninho.__table__.c.id == bindparam('ninho_id')).values(celula_geo=bindparam('celula')),
+            [{'ninho_id': ninho_id, 'celula': celula(latitude, longitude)} for ninho_id, latitude, longitude in pendentes]
+        )
+        db.session.commit()
+        total += len(pendentes)
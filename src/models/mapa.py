@@ -0,0 +1,180 @@
+import math
+from collections import defaultdict
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.ninho import Ninho
+from src.models.eventos import alteracoes, incrementar
+from src.models.versao import avancar_versao
+
+# Cada tile (z, x, y) é dividido em 2**SUBDIVISAO x 2**SUBDIVISAO agrupamentos,
+# que são as células do nível z + SUBDIVISAO da grade.
+SUBDIVISAO = 3
+ZOOM_MAXIMO = 12
+LATITUDE_MAXIMA = 85.05112878
+
+
+class CelulaMapa(db.Model):
+    """
+    Grade multirresolução (tiles Web Mercator) com a contagem de ninhos e a
+    soma das coordenadas por célula e risco. Atualizada a cada insert/update/
+    delete de Ninho, para que o endpoint de agrupamentos responda sem ler a
+    tabela de ninhos.
+    """
+    __tablename__ = 'celula_mapa'
+
+    zoom = db.Column(db.Integer, primary_key=True)
+    x = db.Column(db.Integer, primary_key=True)
+    y = db.Column(db.Integer, primary_key=True)
+    risco = db.Column(db.String(20), primary_key=True)
+    contagem = db.Column(db.Integer, nullable=False, default=0)
+    soma_lat = db.Column(db.Float, nullable=False, default=0)
+    soma_lon = db.Column(db.Float, nullable=False, default=0)
+
+
+def tile(latitude, longitude, zoom):
+    """Coordenadas (x, y) do tile Web Mercator que contém o ponto."""
+    n = 2 ** zoom
+    latitude = max(min(latitude, LATITUDE_MAXIMA), -LATITUDE_MAXIMA)
+    x = int((longitude + 180.0) / 360.0 * n)
+    lat_rad = math.radians(latitude)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def niveis(valores):
+    """Chaves da grade às quais um ninho contribui, uma por nível de zoom."""
+    if valores['latitude'] is None or valores['longitude'] is None:
+        return []
+    # O tile de um nível é o do nível mais fundo deslocado: calcula a projeção uma vez só.
+    fundo = ZOOM_MAXIMO + SUBDIVISAO
+    x, y = tile(valores['latitude'], valores['longitude'], fundo)
+    return [(zoom, x >> (fundo - zoom), y >> (fundo - zoom), valores['risco']) for zoom in range(fundo + 1)]
+
+
+@event.listens_for(Session, 'after_flush')
+def atualizar_grade(session, flush_context):
+    deltas = defaultdict(lambda: [0, 0.0, 0.0])
+    for antes, depois in alteracoes(session, Ninho, ('latitude', 'longitude', 'risco')):
+        for valores, sinal in ((antes, -1), (depois, 1)):
+            if valores is None:
+                continue
+            for chave in niveis(valores):
+                deltas[chave][0] += sinal
+                deltas[chave][1] += sinal * valores['latitude']
+                deltas[chave][2] += sinal * valores['longitude']
+
+    if not deltas:
+        return
+    conn = session.connection()
+    tabela = CelulaMapa.__table__
+    incrementar(conn, tabela, ('zoom', 'x', 'y', 'risco'), [
+        {'zoom': zoom, 'x': x, 'y': y, 'risco': risco, 'contagem': contagem, 'soma_lat': soma_lat, 'soma_lon': soma_lon}
+        for (zoom, x, y, risco), (contagem, soma_lat, soma_lon) in deltas.items()
+        # Ninho movido dentro da mesma célula: a contagem não muda, mas o centroide sim
+        if contagem or soma_lat or soma_lon
+    ])
+
+
+def agrupamentos(zoom, x, y):
+    """
+    Agrupamentos do tile (zoom, x, y): no máximo 4**SUBDIVISAO itens, cada um
+    com contagem, divisão por risco e centroide, independentemente de quantos
+    ninhos existam no tile.
+    """
+    fator = 2 ** SUBDIVISAO
+    celulas = CelulaMapa.query.filter(
+        CelulaMapa.zoom == zoom + SUBDIVISAO,
+        CelulaMapa.x.between(x * fator, x * fator + fator - 1),
+        CelulaMapa.y.between(y * fator, y * fator + fator - 1),
+        CelulaMapa.contagem > 0
+    ).all()
+
+    grupos = {}
+    for celula in celulas:
+        grupo = grupos.setdefault((celula.x, celula.y), {
+            'x': celula.x, 'y': celula.y, 'contagem': 0, 'por_risco': {}, 'soma_lat': 0.0, 'soma_lon': 0.0
+        })
+        grupo['contagem'] += celula.contagem
+        grupo['por_risco'][celula.risco] = celula.contagem
+        grupo['soma_lat'] += celula.soma_lat
+        grupo['soma_lon'] += celula.soma_lon
+
+    resultado = []
+    for grupo in grupos.values():
+        soma_lat, soma_lon = grupo.pop('soma_lat'), grupo.pop('soma_lon')
+        grupo['centroide'] = {
+            'latitude': round(soma_lat / grupo['contagem'], 6),
+            'longitude': round(soma_lon / grupo['contagem'], 6)
+        }
+        resultado.append(grupo)
+    return resultado
+
+
+def _totais_do_nivel(zoom):
+    """{(x, y, risco): [contagem, soma_lat, soma_lon]} de um nível, calculado a partir dos ninhos."""
+    colunas = db.session.query(Ninho.latitude, Ninho.longitude, Ninho.risco).filter(
+        Ninho.latitude != None, Ninho.longitude != None
+    )
+    totais = defaultdict(lambda: [0, 0.0, 0.0])
+    for latitude, longitude, risco in colunas.yield_per(10000):
+        chave = (*tile(latitude, longitude, zoom), risco)
+        totais[chave][0] += 1
+        totais[chave][1] += latitude
+        totais[chave][2] += longitude
+    return totais
+
+
+def reconstruir_grade():
+    """
+    Apaga e regrava a grade a partir dos ninhos com coordenadas. Um nível de
+    zoom por vez, para que a memória fique limitada às células de um nível.
+    """
+    CelulaMapa.query.delete()
+    for zoom in range(ZOOM_MAXIMO + SUBDIVISAO + 1):
+        totais = _totais_do_nivel(zoom)
+        linhas = [
+            {'zoom': zoom, 'x': x, 'y': y, 'risco': risco, 'contagem': contagem, 'soma_lat': soma_lat, 'soma_lon': soma_lon}
+            for (x, y, risco), (contagem, soma_lat, soma_lon) in totais.items()
+        ]
+        if linhas:
+            db.session.execute(insert(CelulaMapa), linhas)
+    avancar_versao(db.session.connection())
+    db.session.commit()
+
+
+def _confere(grade, esperado):
+    """Contagem igual e somas (e portanto centroides) iguais a menos do erro de arredondamento."""
+    if grade is None or esperado is None:
+        return False
+    return grade[0] == esperado[0] and all(
+        math.isclose(g, e, rel_tol=1e-9, abs_tol=1e-6) and math.isclose(g / grade[0], e / esperado[0], abs_tol=1e-7)
+        for g, e in zip(grade[1:], esperado[1:])
+    )
+
+
+def verificar_grade():
+    """
+    Confere, célula a célula e nível a nível, a contagem, as somas das
+    coordenadas e o centroide contra os ninhos com coordenadas. Retorna
+    {zoom: [((x, y, risco), grade, esperado), ...]} com as células divergentes.
+    """
+    divergencias = {}
+    for zoom in range(ZOOM_MAXIMO + SUBDIVISAO + 1):
+        esperado = _totais_do_nivel(zoom)
+        grade = {
+            (celula.x, celula.y, celula.risco): (celula.contagem, celula.soma_lat, celula.soma_lon)
+            for celula in CelulaMapa.query.filter(CelulaMapa.zoom == zoom, CelulaMapa.contagem != 0)
+        }
+        celulas = [(chave, grade.get(chave), tuple(esperado[chave]) if chave in esperado else None)
+                   for chave in grade.keys() | esperado.keys()
+                   if not _confere(grade.get(chave), esperado.get(chave))]
+        if celulas:
+            divergencias[zoom] = sorted(celulas, key=lambda celula: celula[0])
+    return divergencias
+
+
+def garantir_grade():
+    """Constrói a grade na primeira execução sobre um banco já populado."""
+    if CelulaMapa.query.first() is None and Ninho.query.filter(Ninho.latitude != None).first() is not None:
+        reconstruir_grade()
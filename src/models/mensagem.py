@@ -0,0 +1,36 @@
+import json
+from src.models.user import db
+from datetime import datetime
+
+
+class EmailPendente(db.Model):
+    """E-mail na fila de envio. Enviado em segundo plano por src/services/fila_email.py."""
+    __tablename__ = 'email_pendente'
+
+    id = db.Column(db.Integer, primary_key=True)
+    assunto = db.Column(db.String(255), nullable=False)
+    remetente = db.Column(db.String(120), nullable=True)
+    destinatarios = db.Column(db.Text, nullable=False)
+    corpo = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pendente')
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    proxima_tentativa = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    reservado_em = db.Column(db.DateTime, nullable=True)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    enviado_em = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_email_pendente_fila', 'status', 'proxima_tentativa'),
+    )
+
+    def __repr__(self):
+        return f'<EmailPendente {self.id} {self.status}>'
+
+    @property
+    def lista_destinatarios(self):
+        return json.loads(self.destinatarios)
+
+    @lista_destinatarios.setter
+    def lista_destinatarios(self, valor):
+        self.destinatarios = json.dumps(list(valor))
@@ -2,6 +2,29 @@ from src.models.user import db
 from datetime import datetime
 
 class Ninho(db.Model):
+    __table_args__ = (
+        # Identificador gerado pelo aplicativo de campo: torna a importação em lote idempotente
+        db.Index('uq_ninho_usuario_id_cliente', 'usuario_id', 'id_cliente', unique=True),
+        # Índices das consultas principais (criados em bancos existentes pela migração 2,
+        # conferidos por `flask verify-indexes`):
+        # listagem do voluntário e páginas dos relatórios, na ordem (data_registro, id)
+        db.Index('ix_ninho_usuario_data', 'usuario_id', 'data_registro', 'id'),
+        db.Index('ix_ninho_data_registro', 'data_registro', 'id'),
+        # ninhos críticos por região; distribuição e páginas de uma região (migração 4)
+        db.Index('ix_ninho_risco_regiao', 'risco', 'regiao'),
+        db.Index('ix_ninho_regiao_data', 'regiao', 'data_registro', 'id'),
+        # contagens do resumo de estatísticas
+        db.Index('ix_ninho_status_predadores', 'status', 'predadores'),
+        # calendário de eclosões e "prestes a eclodir": faixa de datas, coberta com região e ovos (migração 3)
+        db.Index('ix_ninho_eclosao', 'data_prevista_eclosao', 'regiao', 'quantidade_ovos'),
+        # o mesmo calendário filtrado por região: faixa de datas dentro da região (migração 7)
+        db.Index('ix_ninho_regiao_eclosao', 'regiao', 'data_prevista_eclosao', 'quantidade_ovos'),
+        # tendências (src/services/analise.py): faixa de data_registro coberta com as colunas analisadas (migração 5)
+        db.Index('ix_ninho_analise', 'data_registro', 'regiao', 'risco', 'quantidade_ovos', 'predadores'),
+        # buscas por área, raio e vizinhos (src/models/geo.py): faixas de células cobertas com as coordenadas (migração 6)
+        db.Index('ix_ninho_geo', 'celula_geo', 'latitude', 'longitude'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     regiao = db.Column(db.String(100), nullable=False)
     quantidade_ovos = db.Column(db.Integer, nullable=False)
@@ -11,9 +34,12 @@ class Ninho(db.Model):
     predadores = db.Column(db.Boolean, nullable=False, default=False)
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
+    celula_geo = db.Column(db.Integer, nullable=True)  # Mantida por src/models/geo.py
     foto_path = db.Column(db.String(255), nullable=True)
     data_registro = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    data_prevista_eclosao = db.Column(db.Date, nullable=True)  # Mantida por src/models/eclosao.py
     usuario_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    id_cliente = db.Column(db.String(64), nullable=True)
     
     usuario = db.relationship('User', backref=db.backref('ninhos', lazy=True, cascade="all, delete-orphan"))
 
@@ -30,6 +56,8 @@ class Ninho(db.Model):
             'longitude': self.longitude,
             'foto_path': self.foto_path,
             'data_registro': self.data_registro.isoformat(),
+            'data_prevista_eclosao': self.data_prevista_eclosao.isoformat() if self.data_prevista_eclosao else None,
             'usuario_id': self.usuario_id,
+            'id_cliente': self.id_cliente,
             'usuario_nome': self.usuario.username if self.usuario else None
         }
\ No newline at end of file
@@ -0,0 +1,106 @@
+import json
+from datetime import date, datetime
+from sqlalchemy import event, func
+from src.models.user import User, db
+from src.models.ninho import Ninho
+from src.models.estatisticas import ResumoNinhos, DIMENSOES_RESUMO
+from src.models.eclosao import consulta_calendario, filtro_janela
+from src.models.pontuacao import PontuacaoUsuario, _ranking_query, consulta_ranking
+from src.models.serializacao import CAMPOS_NINHO_PADRAO
+from src.services.paginacao import LIMITE_PADRAO, consulta_pagina
+from src.services.analise import consulta_colunas
+
+
+def consultas_monitoradas():
+    """
+    As consultas do caminho quente, montadas como as rotas as montam, com
+    parâmetros representativos: nenhuma delas pode ler a tabela inteira.
+    """
+    meio_da_lista = (datetime(2024, 1, 1), 1000)
+    return {
+        'listar_ninhos': consulta_pagina(CAMPOS_NINHO_PADRAO, None, LIMITE_PADRAO + 1, Ninho.usuario_id == 1),
+        'listar_ninhos (cursor)': consulta_pagina(CAMPOS_NINHO_PADRAO, meio_da_lista, LIMITE_PADRAO + 1, Ninho.usuario_id == 1),
+        'relatorios/ninhos/data': consulta_pagina(CAMPOS_NINHO_PADRAO, meio_da_lista, LIMITE_PADRAO + 1),
+        'relatorios/ninhos/data (regiao)': consulta_pagina(
+            CAMPOS_NINHO_PADRAO, meio_da_lista, LIMITE_PADRAO + 1, Ninho.regiao == 'Praia'),
+        'obter_estatisticas': ResumoNinhos.query.filter(
+            ResumoNinhos.dimensao.in_(DIMENSOES_RESUMO), ResumoNinhos.contagem > 0),
+        'obter_estatisticas (regiao critica)': ResumoNinhos.query.filter(
+            ResumoNinhos.dimensao == 'critico_regiao', ResumoNinhos.contagem > 0
+        ).order_by(ResumoNinhos.contagem.desc()).limit(1),
+        'obter_estatisticas (prestes a eclodir)': db.session.query(func.count()).select_from(Ninho).filter(
+            filtro_janela(date(2024, 1, 1), date(2024, 1, 6))),
+        'calendario de eclosoes': consulta_calendario(date(2024, 1, 1), date(2024, 1, 31)),
+        'calendario de eclosoes (regiao)': consulta_calendario(date(2024, 1, 1), date(2024, 1, 31), 'Praia'),
+        'tendencias': consulta_colunas(date(2024, 1, 1), date(2024, 12, 31)),
+        'tendencias (regiao)': consulta_colunas(date(2024, 1, 1), date(2024, 12, 31), 'Praia'),
+        'ranking (mes)': consulta_ranking('mes', 10),
+        'ranking (posicao)': _ranking_query('mes').filter(PontuacaoUsuario.total_pontos > 10),
+        'ranking critico por regiao': db.session.query(Ninho.regiao, func.count(Ninho.id)).filter(
+            Ninho.risco == 'crítico').group_by(Ninho.regiao),
+        'usuarios ativos': db.session.query(func.count(User.id)).filter(User.ativo == True),
+    }
+
+
+def _plano(conn, consulta):
+    """Executa a consulta com EXPLAIN na frente e devolve as linhas do plano."""
+    prefixo = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN (FORMAT JSON) '
+
+    def explicar(conn, cursor, statement, parameters, context, executemany):
+        return prefixo + statement, parameters
+
+    event.listen(conn, 'before_cursor_execute', explicar, retval=True)
+    try:
+        resultado = conn.execute(consulta.statement)
+        return resultado.cursor.fetchall()
+    finally:
+        event.remove(conn, 'before_cursor_execute', explicar)
+
+
+def _varreduras_sqlite(linhas):
+    # Cada linha é (id, pai, -, detalhe). "SCAN tabela" lê a tabela inteira e
+    # "SCAN tabela USING [COVERING] INDEX" lê o índice inteiro (numa página com
+    # cursor, desde o começo a cada página); só "SEARCH" é busca por faixa.
+    return [linha[3] for linha in linhas if linha[3].startswith('SCAN ') and 'CONSTANT ROW' not in linha[3]]
+
+
+def _varreduras_postgresql(linhas):
+    encontradas = []
+
+    def percorrer(no):
+        tipo = no.get('Node Type')
+        if tipo == 'Seq Scan':
+            encontradas.append(f"Seq Scan on {no.get('Relation Name')}")
+        elif tipo in ('Index Scan', 'Index Only Scan') and 'Index Cond' not in no:
+            encontradas.append(f"{tipo} (sem condição) on {no.get('Relation Name')}")
+        for filho in no.get('Plans', []):
+            percorrer(filho)
+
+    plano = linhas[0][0]
+    plano = json.loads(plano) if isinstance(plano, str) else plano
+    percorrer(plano[0]['Plan'])
+    return encontradas
+
+
+def verificar_planos():
+    """
+    Retorna {consulta: [varreduras completas]} para as consultas monitoradas
+    que leem alguma tabela inteira. No PostgreSQL a varredura sequencial é
+    desestimulada (enable_seqscan = off) para que tabelas pequenas de
+    desenvolvimento não mascarem a falta de um índice.
+    """
+    conn = db.session.connection()
+    postgresql = conn.dialect.name == 'postgresql'
+    if postgresql:
+        conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    try:
+        problemas = {}
+        for nome, consulta in consultas_monitoradas().items():
+            linhas = _plano(conn, consulta)
+            verificar = _varreduras_postgresql if postgresql else _varreduras_sqlite
+            varreduras = verificar(linhas)
+            if varreduras:
+                problemas[nome] = varreduras
+        return problemas
+    finally:
+        db.session.rollback()
@@ -0,0 +1,215 @@
+from collections import defaultdict
+from datetime import date
+from sqlalchemy import event, func, case, or_, and_, insert, select
+from sqlalchemy.orm import Session
+from src.models.user import User, db
+from src.models.ninho import Ninho
+from src.models.eventos import alteracoes, incrementar
+from src.models.versao import avancar_versao
+
+PONTOS_POR_RISCO = {'crítico': 10, 'sob observação': 5, 'estável': 2}
+BONUS_FOTO = 1
+
+
+class PontuacaoUsuario(db.Model):
+    """
+    Pontuação materializada de cada voluntário, por período: 'geral' ou um
+    mês no formato 'AAAA-MM'. Mantida incrementalmente a cada alteração de
+    Ninho, para que o ranking seja lido pelo índice sem varrer os ninhos.
+    """
+    __tablename__ = 'pontuacao_usuario'
+
+    usuario_id = db.Column(db.Integer, primary_key=True)
+    periodo = db.Column(db.String(7), primary_key=True)
+    total_pontos = db.Column(db.Integer, nullable=False, default=0)
+    total_ninhos = db.Column(db.Integer, nullable=False, default=0)
+    ativo = db.Column(db.Boolean, nullable=False, default=True)
+
+    __table_args__ = (
+        db.Index('ix_pontuacao_ranking', 'periodo', 'ativo', total_pontos.desc(), total_ninhos.desc(), 'usuario_id'),
+    )
+
+
+def pontos_do_ninho(risco, foto_path):
+    return PONTOS_POR_RISCO.get(risco, 0) + (BONUS_FOTO if foto_path is not None else 0)
+
+
+def periodo_atual(periodo):
+    """Converte 'geral'/'mes' na chave de período armazenada."""
+    return date.today().strftime('%Y-%m') if periodo == 'mes' else 'geral'
+
+
+@event.listens_for(Session, 'after_flush')
+def atualizar_pontuacao(session, flush_context):
+    usuarios = list(alteracoes(session, User, ('id', 'ativo')))
+    removidos = {antes['id'] for antes, depois in usuarios if depois is None}
+
+    deltas = defaultdict(lambda: [0, 0])
+    for antes, depois in alteracoes(session, Ninho, ('usuario_id', 'risco', 'foto_path', 'data_registro')):
+        for valores, sinal in ((antes, -1), (depois, 1)):
+            if valores is None or valores['usuario_id'] in removidos:
+                continue
+            pontos = pontos_do_ninho(valores['risco'], valores['foto_path'])
+            for periodo in ('geral', valores['data_registro'].strftime('%Y-%m')):
+                deltas[(valores['usuario_id'], periodo)][0] += sinal * pontos
+                deltas[(valores['usuario_id'], periodo)][1] += sinal
+
+    conn = None
+    tabela = PontuacaoUsuario.__table__
+    deltas = {chave: valores for chave, valores in deltas.items() if any(valores)}
+    if deltas:
+        conn = session.connection()
+        # Linhas novas (o primeiro ninho do mês) herdam o ativo do voluntário
+        usuarios_tabela = User.__table__
+        ativos = dict(conn.execute(select(usuarios_tabela.c.id, usuarios_tabela.c.ativo)
+                                   .where(usuarios_tabela.c.id.in_({usuario_id for usuario_id, _ in deltas}))).all())
+        linhas = [
+            {'usuario_id': usuario_id, 'periodo': periodo, 'total_pontos': pontos, 'total_ninhos': ninhos,
+             'ativo': ativos.get(usuario_id, False)}
+            for (usuario_id, periodo), (pontos, ninhos) in deltas.items()
+        ]
+        incrementar(conn, tabela, ('usuario_id', 'periodo'), linhas, fixas=('ativo',))
+
+    for antes, depois in usuarios:
+        conn = conn or session.connection()
+        if depois is None:
+            conn.execute(tabela.delete().where(tabela.c.usuario_id == antes['id']))
+        elif antes is not None:
+            conn.execute(tabela.update().where(tabela.c.usuario_id == depois['id']).values(ativo=depois['ativo']))
+
+
+def _ranking_query(periodo):
+    return PontuacaoUsuario.query.filter(
+        PontuacaoUsuario.periodo == periodo_atual(periodo),
+        PontuacaoUsuario.ativo == True,
+        PontuacaoUsuario.total_ninhos > 0
+    )
+
+
+def consulta_ranking(periodo='geral', limite=None):
+    # Colunas, não entidades: o ranking completo tem uma linha por voluntário
+    query = db.session.query(PontuacaoUsuario.usuario_id, User.username, User.nome_completo,
+                             PontuacaoUsuario.total_ninhos, PontuacaoUsuario.total_pontos)\
+        .join(User, User.id == PontuacaoUsuario.usuario_id)\
+        .filter(PontuacaoUsuario.periodo == periodo_atual(periodo),
+                PontuacaoUsuario.ativo == True,
+                PontuacaoUsuario.total_ninhos > 0)\
+        .order_by(PontuacaoUsuario.total_pontos.desc(),
+                  PontuacaoUsuario.total_ninhos.desc(),
+                  PontuacaoUsuario.usuario_id.asc())
+    if limite:
+        query = query.limit(limite)
+    return query
+
+
+def ranking_top(periodo='geral', limite=None):
+    """Top-N do ranking, em ordem, a partir da pontuação materializada."""
+    query = consulta_ranking(periodo, limite)
+    return [
+        {
+            'posicao': posicao,
+            'user_id': usuario_id,
+            'username': username,
+            'nome_completo': nome_completo,
+            'total_ninhos': total_ninhos,
+            'total_pontos': total_pontos
+        }
+        for posicao, (usuario_id, username, nome_completo, total_ninhos, total_pontos) in enumerate(query.all(), 1)
+    ]
+
+
+def total_no_ranking(periodo='geral'):
+    return _ranking_query(periodo).count()
+
+
+def posicao_usuario(usuario_id, periodo='geral'):
+    """Posição de um único voluntário, contando quem está à frente dele."""
+    pontuacao = _ranking_query(periodo).filter(PontuacaoUsuario.usuario_id == usuario_id).first()
+    if not pontuacao:
+        return None
+    a_frente = _ranking_query(periodo).filter(or_(
+        PontuacaoUsuario.total_pontos > pontuacao.total_pontos,
+        and_(PontuacaoUsuario.total_pontos == pontuacao.total_pontos,
+             PontuacaoUsuario.total_ninhos > pontuacao.total_ninhos),
+        and_(PontuacaoUsuario.total_pontos == pontuacao.total_pontos,
+             PontuacaoUsuario.total_ninhos == pontuacao.total_ninhos,
+             PontuacaoUsuario.usuario_id < usuario_id)
+    )).count()
+    return {
+        'posicao': a_frente + 1,
+        'user_id': usuario_id,
+        'total_ninhos': pontuacao.total_ninhos,
+        'total_pontos': pontuacao.total_pontos
+    }
+
+
+def ranking_sql(periodo='geral'):
+    """
+    Cálculo original do ranking direto sobre Ninho (JOIN + GROUP BY), usado
+    para conferir a pontuação materializada. Retorna {user_id: (pontos, ninhos)}.
+    """
+    pontos_expression = case(
+        *[(Ninho.risco == risco, pontos) for risco, pontos in PONTOS_POR_RISCO.items()],
+        else_=0
+    ) + case(
+        (Ninho.foto_path != None, BONUS_FOTO),
+        else_=0
+    )
+    query = db.session.query(
+        User.id,
+        func.count(Ninho.id),
+        func.sum(pontos_expression)
+    ).join(Ninho, User.id == Ninho.usuario_id).filter(User.ativo == True)
+
+    if periodo == 'mes':
+        query = query.filter(Ninho.data_registro >= date.today().replace(day=1))
+
+    return {user_id: (int(pontos or 0), ninhos) for user_id, ninhos, pontos in query.group_by(User.id)}
+
+
+def verificar_pontuacao():
+    """Retorna as divergências por período: {periodo: {user_id: (armazenado, sql)}}."""
+    divergencias = {}
+    for periodo in ('geral', 'mes'):
+        armazenado = {
+            p.usuario_id: (p.total_pontos, p.total_ninhos)
+            for p in _ranking_query(periodo)
+        }
+        calculado = ranking_sql(periodo)
+        diferentes = {
+            user_id: (armazenado.get(user_id), calculado.get(user_id))
+            for user_id in set(armazenado) | set(calculado)
+            if armazenado.get(user_id) != calculado.get(user_id)
+        }
+        if diferentes:
+            divergencias[periodo] = diferentes
+    return divergencias
+
+
+def reconstruir_pontuacao():
+    """Apaga e regrava a pontuação materializada a partir dos ninhos."""
+    totais = defaultdict(lambda: [0, 0])
+    colunas = db.session.query(Ninho.usuario_id, Ninho.risco, Ninho.foto_path, Ninho.data_registro)
+    for usuario_id, risco, foto_path, data_registro in colunas.yield_per(10000):
+        pontos = pontos_do_ninho(risco, foto_path)
+        for periodo in ('geral', data_registro.strftime('%Y-%m')):
+            totais[(usuario_id, periodo)][0] += pontos
+            totais[(usuario_id, periodo)][1] += 1
+
+    ativos = dict(db.session.query(User.id, User.ativo))
+    PontuacaoUsuario.query.delete()
+    linhas = [
+        {'usuario_id': usuario_id, 'periodo': periodo, 'total_pontos': pontos,
+         'total_ninhos': ninhos, 'ativo': ativos.get(usuario_id, False)}
+        for (usuario_id, periodo), (pontos, ninhos) in totais.items()
+    ]
+    if linhas:
+        db.session.execute(insert(PontuacaoUsuario), linhas)
+    avancar_versao(db.session.connection())
+    db.session.commit()
+
+
+def garantir_pontuacao():
+    """Constrói a pontuação na primeira execução sobre um banco já populado."""
+    if PontuacaoUsuario.query.first() is None and Ninho.query.first() is not None:
+        reconstruir_pontuacao()
@@ -0,0 +1,81 @@
+from src.models.user import User, db
+from src.models.ninho import Ninho
+
+# Campos de Ninho.to_dict (e alguns extras) com a coluna correspondente.
+# Listas de ninhos são montadas por uma única consulta projetada nestas
+# colunas, sem instanciar objetos ORM nem acessar Ninho.usuario por linha.
+CAMPOS_NINHO = {
+    'id': Ninho.id,
+    'regiao': Ninho.regiao,
+    'quantidade_ovos': Ninho.quantidade_ovos,
+    'status': Ninho.status,
+    'risco': Ninho.risco,
+    'dias_para_eclosao': Ninho.dias_para_eclosao,
+    'predadores': Ninho.predadores,
+    'latitude': Ninho.latitude,
+    'longitude': Ninho.longitude,
+    'foto_path': Ninho.foto_path,
+    'data_registro': Ninho.data_registro,
+    'data_prevista_eclosao': Ninho.data_prevista_eclosao,
+    'usuario_id': Ninho.usuario_id,
+    'id_cliente': Ninho.id_cliente,
+    'usuario_nome': User.username,
+    'usuario_nome_completo': User.nome_completo,
+}
+CAMPOS_NINHO_PADRAO = [campo for campo in CAMPOS_NINHO if campo != 'usuario_nome_completo']
+
+CAMPOS_USUARIO = {
+    'id': User.id,
+    'username': User.username,
+    'email': User.email,
+    'nome_completo': User.nome_completo,
+    'data_cadastro': User.data_cadastro,
+    'ativo': User.ativo,
+    'is_admin': User.is_admin,
+}
+
+_DATAS = {'data_registro', 'data_prevista_eclosao', 'data_cadastro'}
+
+
+def consultar_ninhos(campos, *extras):
+    """
+    Consulta de ninhos que seleciona apenas `campos` (mais as colunas em
+    `extras`), com JOIN em User somente quando um campo do voluntário é pedido.
+    """
+    colunas = [CAMPOS_NINHO[campo].label(campo) for campo in campos]
+    query = db.session.query(*extras, *colunas).select_from(Ninho)
+    if any(CAMPOS_NINHO[campo].class_ is User for campo in campos):
+        query = query.outerjoin(User, User.id == Ninho.usuario_id)
+    return query
+
+
+def linha_para_dict(linha, campos):
+    dados = {campo: getattr(linha, campo) for campo in campos}
+    for campo in _DATAS.intersection(dados):
+        if dados[campo] is not None:
+            dados[campo] = dados[campo].isoformat()
+    return dados
+
+
+def linhas_para_colunas(linhas, campos):
+    """Formato colunar: uma lista de valores por campo, na ordem de `campos`, em vez de um dict por linha."""
+    colunas = []
+    for campo in campos:
+        valores = [getattr(linha, campo) for linha in linhas]
+        if campo in _DATAS:
+            valores = [valor.isoformat() if valor is not None else None for valor in valores]
+        colunas.append(valores)
+    return colunas
+
+
+def serializar_ninhos(*filtros, campos=CAMPOS_NINHO_PADRAO):
+    """Lista de dicts de ninhos em uma única consulta, qualquer que seja o tamanho."""
+    query = consultar_ninhos(campos).filter(*filtros).order_by(Ninho.data_registro.desc(), Ninho.id.desc())
+    return [linha_para_dict(linha, campos) for linha in query]
+
+
+def serializar_usuarios(*filtros, campos=tuple(CAMPOS_USUARIO)):
+    """Equivalente de User.to_dict em lote, por consulta projetada."""
+    colunas = [CAMPOS_USUARIO[campo].label(campo) for campo in campos]
+    query = db.session.query(*colunas).filter(*filtros).order_by(User.id.asc())
+    return [linha_para_dict(linha, campos) for linha in query]
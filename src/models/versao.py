@@ -0,0 +1,36 @@
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+from src.models.user import User, db
+from src.models.ninho import Ninho
+
+
+class VersaoDados(db.Model):
+    """
+    Contador incrementado na mesma transação de qualquer gravação em Ninho ou
+    User. Respostas guardadas em cache registram a versão em que foram
+    calculadas e deixam de valer quando ela muda, em todos os processos.
+    """
+    __tablename__ = 'versao_dados'
+
+    id = db.Column(db.Integer, primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+
+
+def avancar_versao(conn):
+    tabela = VersaoDados.__table__
+    resultado = conn.execute(update(tabela).where(tabela.c.id == 1).values(versao=tabela.c.versao + 1))
+    if resultado.rowcount == 0:
+        conn.execute(insert(tabela).values(id=1, versao=1))
+
+
+def versao_atual():
+    return db.session.execute(select(VersaoDados.versao).where(VersaoDados.id == 1)).scalar() or 0
+
+
+@event.listens_for(Session, 'after_flush')
+def registrar_gravacao(session, flush_context):
+    modelos = (Ninho, User)
+    if (any(isinstance(obj, modelos) for obj in session.new)
+            or any(isinstance(obj, modelos) for obj in session.deleted)
+            or any(isinstance(obj, modelos) and session.is_modified(obj) for obj in session.dirty)):
+        avancar_versao(session.connection())
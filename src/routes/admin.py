@@ -1,6 +1,13 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, Response, jsonify, request, session
 from src.models.user import User, db
+from src.models.serializacao import serializar_usuarios
 from src.routes.auth import admin_required
+from src.services.identidade import cache_identidade
+from src.services.perfil_banco import estado_pool
+from src.services.cache_respostas import cache_respostas
+from src.services.metricas import metricas
+from src.services.limites import limitador
+from sqlalchemy import text
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -8,8 +15,7 @@ admin_bp = Blueprint('admin', __name__)
 @admin_required
 def get_all_users():
     """Obtém todos os usuários, ordenados por ID."""
-    users = User.query.order_by(User.id.asc()).all()
-    return jsonify([user.to_dict() for user in users]), 200
+    return jsonify(serializar_usuarios()), 200
 
 @admin_bp.route('/users/<int:user_id>', methods=['PUT'])
 @admin_required
@@ -27,6 +33,7 @@ def update_user_status(user_id):
         user.is_admin = data['is_admin']
 
     db.session.commit()
+    cache_identidade.invalidar(user.id)
     return jsonify({'message': 'Usuário atualizado com sucesso', 'user': user.to_dict()}), 200
 
 @admin_bp.route('/users/<int:user_id>', methods=['DELETE'])
@@ -39,4 +46,46 @@ def delete_user_by_admin(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
     db.session.commit()
-    return jsonify({'message': 'Usuário deletado com sucesso'}), 200
\ No newline at end of file
+    cache_identidade.invalidar(user_id)
+    return jsonify({'message': 'Usuário deletado com sucesso'}), 200
+
+@admin_bp.route('/banco', methods=['GET'])
+@admin_required
+def get_database_status():
+    """Estado do pool de conexões (em uso, ociosas, esperas e timeouts) deste processo."""
+    estado = estado_pool(db.engine)
+    if estado['dialeto'] == 'sqlite':
+        estado['journal_mode'] = db.session.execute(text('PRAGMA journal_mode')).scalar()
+    return jsonify(estado), 200
+
+@admin_bp.route('/cache', methods=['GET'])
+@admin_required
+def get_cache_status():
+    """Acertos e faltas do cache de respostas deste processo e a versão atual dos dados."""
+    return jsonify(cache_respostas.estado()), 200
+
+@admin_bp.route('/limites', methods=['GET'])
+@admin_required
+def get_rate_limits():
+    """Regras de limite por rota, requisições em andamento e rejeições (429/503) deste processo."""
+    return jsonify(limitador.estado()), 200
+
+@admin_bp.route('/metricas', methods=['GET'])
+@admin_required
+def get_metrics():
+    """Métricas deste processo no formato texto do Prometheus."""
+    extras = [('db_pool_' + chave, {}, valor) for chave, valor in estado_pool(db.engine).items()
+              if isinstance(valor, (int, float))]
+    cache = cache_respostas.estado()
+    extras += [('response_cache_hits', {}, cache['acertos']), ('response_cache_misses', {}, cache['faltas'])]
+    limites = limitador.estado()
+    extras += [('rate_limit_rejected', {'regra': item['regra'], 'motivo': item['motivo']}, item['quantidade'])
+               for item in limites['rejeicoes']]
+    extras += [('rate_limit_in_flight', {'regra': nome}, valor) for nome, valor in limites['em_andamento'].items()]
+    return Response(metricas.prometheus(extras), mimetype='text/plain; version=0.0.4')
+
+@admin_bp.route('/metricas/lentas', methods=['GET'])
+@admin_required
+def get_slow_requests():
+    """Amostras das últimas requisições lentas, com os comandos SQL executados."""
+    return jsonify(metricas.lentas()), 200
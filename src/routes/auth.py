@@ -1,18 +1,29 @@
 from flask import Blueprint, request, jsonify, session, url_for, current_app
 from src.models.user import User, db
-from werkzeug.security import check_password_hash
 from functools import wraps
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired
-from flask_mail import Message
-# A linha 'from src.main import mail' foi REMOVIDA do topo
+from src.services.fila_email import fila_email
+from src.services.identidade import cache_identidade
+from src.services.senhas import senhas, ServicoSenhasOcupado
+from src.services.limites import limitador
 
 auth_bp = Blueprint('auth', __name__)
 
-# Funções login_required e admin_required permanecem as mesmas
+def identidade_atual():
+    """Identidade do usuário da sessão (via cache), ou None se não logado ou inativo."""
+    if 'user_id' not in session:
+        return None
+    identidade = cache_identidade.obter(session['user_id'])
+    if not identidade or not identidade.ativo:
+        # Usuário removido ou desativado: a sessão deixa de valer imediatamente
+        session.clear()
+        return None
+    return identidade
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if not identidade_atual():
             return jsonify({'error': 'Login necessário'}), 401
         return f(*args, **kwargs)
     return decorated_function
@@ -20,22 +31,18 @@ def login_required(f):
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        identidade = identidade_atual()
+        if not identidade:
             return jsonify({'error': 'Login necessário'}), 401
-        user = User.query.get(session['user_id'])
-        if not user or not user.is_admin:
+        if not identidade.is_admin:
             return jsonify({'error': 'Acesso de administrador necessário'}), 403
         return f(*args, **kwargs)
     return decorated_function
 
 
 @auth_bp.route('/forgot-password', methods=['POST'])
+@limitador.limitar('forgot-password')
 def forgot_password():
-    # --- AQUI ESTÁ A CORREÇÃO ---
-    # Importamos 'mail' localmente, apenas quando esta função é chamada.
-    # Neste ponto, o app já está totalmente carregado e 'mail' existe.
-    from src.main import mail
-
     email = request.json.get('email')
     user = User.query.filter_by(email=email).first()
     if not user:
@@ -45,11 +52,13 @@ def forgot_password():
     token = s.dumps(user.email, salt='email-confirm-salt')
     reset_url = url_for('serve', path=f'reset.html?token={token}', _external=True)
 
-    msg = Message('Redefinição de Senha - Guardião das Tartaruguinhas',
-                  sender=current_app.config['MAIL_USERNAME'],
-                  recipients=[user.email])
-    msg.body = f'Para redefinir sua senha, clique no link a seguir: {reset_url}\n\nSe você não solicitou isso, ignore este e-mail.'
-    mail.send(msg)
+    # O envio acontece em segundo plano; a requisição só grava na fila.
+    fila_email.enfileirar(
+        'Redefinição de Senha - Guardião das Tartaruguinhas',
+        [user.email],
+        f'Para redefinir sua senha, clique no link a seguir: {reset_url}\n\nSe você não solicitou isso, ignore este e-mail.',
+        remetente=current_app.config['MAIL_USERNAME']
+    )
 
     return jsonify({'message': 'Se o e-mail estiver cadastrado, um link de recuperação será enviado.'}), 200
 
@@ -68,8 +77,12 @@ def reset_password():
         return jsonify({'error': 'Token inválido ou corrompido.'}), 400
 
     user = User.query.filter_by(email=email).first_or_404()
-    user.set_password(new_password)
+    try:
+        user.set_password(new_password)
+    except ServicoSenhasOcupado as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     db.session.commit()
+    cache_identidade.invalidar(user.id)
 
     return jsonify({'message': 'Sua senha foi redefinida com sucesso!'}), 200
 
@@ -77,17 +90,28 @@ def reset_password():
 # O resto das rotas (login, register, logout, me) permanecem as mesmas.
 # ... (cole aqui suas rotas de login, register, logout e me se elas estiverem neste arquivo) ...
 @auth_bp.route('/login', methods=['POST'])
+@limitador.limitar('login')
 def login():
     data = request.get_json()
     user = User.query.filter_by(username=data.get('username')).first()
     
-    if user and user.check_password(data.get('password')) and user.ativo:
+    try:
+        senha_correta = user is not None and user.check_password(data.get('password'))
+        if senha_correta and user.ativo and senhas.precisa_rehash(user.password_hash):
+            # Hash gravado com parâmetros antigos: aproveita a senha em claro para atualizá-lo
+            user.set_password(data.get('password'))
+            db.session.commit()
+    except ServicoSenhasOcupado as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+
+    if senha_correta and user.ativo:
         session['user_id'] = user.id
         session['username'] = user.username
         return jsonify({'message': 'Login realizado com sucesso', 'user': user.to_dict()}), 200
     return jsonify({'error': 'Credenciais inválidas ou usuário inativo'}), 401
 
 @auth_bp.route('/register', methods=['POST'])
+@limitador.limitar('register')
 def register():
     data = request.get_json()
     if User.query.filter_by(username=data.get('username')).first():
@@ -98,9 +122,14 @@ def register():
     new_user = User(
         username=data['username'], email=data['email'], nome_completo=data['nome_completo']
     )
-    new_user.set_password(data['password'])
+    try:
+        new_user.set_password(data['password'])
+    except ServicoSenhasOcupado as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     db.session.add(new_user)
     db.session.commit()
+    # O SQLite pode reaproveitar o id de um usuário removido, ainda em cache como inexistente
+    cache_identidade.invalidar(new_user.id)
     return jsonify({'message': 'Usuário cadastrado com sucesso', 'user': new_user.to_dict()}), 201
 
 @auth_bp.route('/logout', methods=['POST'])
@@ -110,8 +139,7 @@ def logout():
 
 @auth_bp.route('/me', methods=['GET'])
 def get_current_user():
-    if 'user_id' in session:
-        user = User.query.get(session['user_id'])
-        if user and user.ativo:
-            return jsonify({'user': user.to_dict()}), 200
+    identidade = identidade_atual()
+    if identidade:
+        return jsonify({'user': identidade.dados}), 200
     return jsonify({'error': 'Usuário não autenticado'}), 401
\ No newline at end of file
@@ -0,0 +1,24 @@
+from flask import Blueprint, jsonify, request
+from src.models.busca import buscar
+from src.routes.auth import login_required
+
+busca_bp = Blueprint('busca', __name__)
+
+LIMITE_MAXIMO = 50
+TIPOS = ('regiao', 'usuario')
+
+
+@busca_bp.route('/busca', methods=['GET'])
+@login_required
+def buscar_termos():
+    """Regiões e voluntários por nome, sem diferenciar acentos e tolerando erros de digitação: ?q=&tipo=&limite="""
+    consulta = request.args.get('q', '').strip()
+    tipo = request.args.get('tipo') or None
+    limite = request.args.get('limite', type=int, default=10)
+    if not consulta or len(consulta) > 100:
+        return jsonify({'error': "O parâmetro 'q' é obrigatório e deve ter até 100 caracteres."}), 400
+    if tipo is not None and tipo not in TIPOS:
+        return jsonify({'error': "O parâmetro 'tipo' deve ser regiao ou usuario."}), 400
+    if limite is None or not 1 <= limite <= LIMITE_MAXIMO:
+        return jsonify({'error': f"O parâmetro 'limite' deve estar entre 1 e {LIMITE_MAXIMO}."}), 400
+    return jsonify({'consulta': consulta, 'resultados': buscar(consulta, tipo, limite)}), 200
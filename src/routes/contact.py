@@ -1,13 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app
-from flask_mail import Message
+from src.services.fila_email import fila_email
+from src.services.limites import limitador
 
 contact_bp = Blueprint('contact', __name__)
 
 @contact_bp.route('/contact', methods=['POST'])
+@limitador.limitar('contact')
 def handle_contact_form():
-    # Importa 'mail' localmente para evitar importações circulares
-    from src.main import mail
-    
     data = request.get_json()
     name = data.get('name')
     email = data.get('email')
@@ -20,13 +19,7 @@ def handle_contact_form():
         # O destinatário do e-mail será o e-mail configurado no seu arquivo .env
         recipient_email = current_app.config['MAIL_USERNAME']
         
-        msg = Message(
-            subject=f"Novo Contato do App Guardião: {name}",
-            sender=current_app.config['MAIL_USERNAME'],
-            recipients=[recipient_email]
-        )
-        
-        msg.body = f"""
+        body = f"""
         Você recebeu uma nova mensagem de contato através do sistema Guardião das Tartaruguinhas.
 
         Nome: {name}
@@ -37,11 +30,16 @@ def handle_contact_form():
         {message}
         --------------------------------------------------
         """
-        
-        mail.send(msg)
+
+        fila_email.enfileirar(
+            f"Novo Contato do App Guardião: {name}",
+            [recipient_email],
+            body,
+            remetente=current_app.config['MAIL_USERNAME']
+        )
         
         return jsonify({'message': 'Mensagem enviada com sucesso! Obrigado pelo contato.'}), 200
 
-    except Exception as e:
-        print(f"Erro ao enviar e-mail de contato: {e}")
+    except Exception:
+        current_app.logger.exception('Erro ao enfileirar e-mail de contato')
         return jsonify({'error': 'Ocorreu um erro ao tentar enviar a mensagem.'}), 500
\ No newline at end of file
@@ -0,0 +1,91 @@
+from flask import Blueprint, jsonify, request
+from src.models.serializacao import CAMPOS_NINHO_PADRAO, consultar_ninhos, linha_para_dict
+from src.models.geo import ninhos_na_area, ninhos_no_raio, ninhos_proximos
+from src.models.mapa import agrupamentos, ZOOM_MAXIMO
+from src.routes.auth import login_required
+from src.services.paginacao import ParametroInvalido
+
+mapa_bp = Blueprint('mapa', __name__)
+
+LIMITE_PADRAO = 500
+LIMITE_MAXIMO = 5000
+
+
+def _numero(nome, minimo, maximo, tipo=float, padrao=None):
+    valor = request.args.get(nome, type=tipo, default=padrao)
+    if valor is None:
+        raise ParametroInvalido(f"O parâmetro '{nome}' é obrigatório e deve ser numérico.")
+    if not minimo <= valor <= maximo:
+        raise ParametroInvalido(f"O parâmetro '{nome}' deve estar entre {minimo} e {maximo}.")
+    return valor
+
+
+def _consulta():
+    return consultar_ninhos(CAMPOS_NINHO_PADRAO)
+
+
+def _com_distancia(encontrados):
+    return [dict(linha_para_dict(linha, CAMPOS_NINHO_PADRAO), distancia_km=round(distancia, 3))
+            for distancia, linha in encontrados]
+
+
+@mapa_bp.route('/ninhos/area', methods=['GET'])
+@login_required
+def ninhos_area():
+    """Ninhos dentro do retângulo visível no mapa: ?min_lat=&min_lon=&max_lat=&max_lon=&limite="""
+    try:
+        min_lat, max_lat = _numero('min_lat', -90, 90), _numero('max_lat', -90, 90)
+        min_lon, max_lon = _numero('min_lon', -180, 180), _numero('max_lon', -180, 180)
+        limite = _numero('limite', 1, LIMITE_MAXIMO, int, LIMITE_PADRAO)
+        if min_lat > max_lat or min_lon > max_lon:
+            raise ParametroInvalido('Os valores mínimos devem ser menores que os máximos.')
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+
+    linhas = ninhos_na_area(_consulta(), min_lat, min_lon, max_lat, max_lon, limite)
+    return jsonify({'ninhos': [linha_para_dict(linha, CAMPOS_NINHO_PADRAO) for linha in linhas]}), 200
+
+
+@mapa_bp.route('/ninhos/proximos', methods=['GET'])
+@login_required
+def ninhos_mais_proximos():
+    """Os k ninhos mais próximos de um ponto: ?lat=&lon=&k="""
+    try:
+        latitude, longitude = _numero('lat', -90, 90), _numero('lon', -180, 180)
+        k = _numero('k', 1, LIMITE_MAXIMO, int, 10)
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'ninhos': _com_distancia(ninhos_proximos(_consulta(), latitude, longitude, k))}), 200
+
+
+@mapa_bp.route('/ninhos/raio', methods=['GET'])
+@login_required
+def ninhos_no_raio_de():
+    """Ninhos a até raio_km de um ponto, do mais próximo ao mais distante: ?lat=&lon=&raio_km=&limite="""
+    try:
+        latitude, longitude = _numero('lat', -90, 90), _numero('lon', -180, 180)
+        raio_km = _numero('raio_km', 0, 500)
+        limite = _numero('limite', 1, LIMITE_MAXIMO, int, LIMITE_PADRAO)
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+
+    encontrados = ninhos_no_raio(_consulta(), latitude, longitude, raio_km, limite)
+    return jsonify({'ninhos': _com_distancia(encontrados)}), 200
+
+
+@mapa_bp.route('/mapa/agrupamentos/<int:z>/<int:x>/<int:y>', methods=['GET'])
+@login_required
+def agrupamentos_do_tile(z, x, y):
+    """Agrupamentos pré-calculados de ninhos para o tile Web Mercator z/x/y."""
+    if z > ZOOM_MAXIMO:
+        return jsonify({'error': f'Zoom máximo para agrupamentos é {ZOOM_MAXIMO}; use /api/ninhos/area.'}), 400
+    if x >= 2 ** z or y >= 2 ** z:
+        return jsonify({'error': 'Tile fora dos limites para este zoom.'}), 400
+
+    grupos = agrupamentos(z, x, y)
+    return jsonify({
+        'zoom': z, 'x': x, 'y': y,
+        'total_ninhos': sum(grupo['contagem'] for grupo in grupos),
+        'agrupamentos': grupos
+    }), 200
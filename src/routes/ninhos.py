@@ -1,7 +1,13 @@
-from flask import Blueprint, request, jsonify, session
+from datetime import date, timedelta
+from flask import Blueprint, request, jsonify, session, current_app
 from src.models.ninho import Ninho, db
 from src.routes.auth import login_required
-from sqlalchemy import func
+from src.models.estatisticas import obter_resumo
+from src.models.eclosao import calendario, hoje, JANELA_MAXIMA_DIAS
+from src.services.paginacao import paginar_ninhos, ParametroInvalido
+from src.services.importacao import importar_ninhos, ler_arquivo, ler_json, ImportacaoInterrompida
+from src.services.cache_respostas import cache_respostas
+from src.services.limites import limitador
 
 ninhos_bp = Blueprint('ninhos', __name__)
 
@@ -38,30 +44,113 @@ def criar_ninho():
         
         return jsonify({'message': 'Ninho criado com sucesso', 'ninho': novo_ninho.to_dict()}), 201
 
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        print(f"Erro ao criar ninho: {e}") # Log do erro no terminal para depuração
+        current_app.logger.exception('Erro ao criar ninho')
         return jsonify({'error': 'Ocorreu um erro interno ao salvar o ninho.'}), 500
 
 
+@ninhos_bp.route('/ninhos/lote', methods=['POST'])
+@login_required
+def importar_lote():
+    """
+    Importa vários ninhos do usuário logado de uma vez: lista JSON no corpo ou
+    arquivo .json/.csv/.xlsx no campo 'arquivo'. Retorna quantos foram
+    inseridos, quantos foram ignorados por id_cliente repetido e os erros por linha;
+    um arquivo ilegível dá 400, com esse relatório se a falha veio no meio dele.
+    """
+    try:
+        if 'arquivo' in request.files:
+            arquivo = request.files['arquivo']
+            linhas = ler_arquivo(arquivo.stream, arquivo.filename or '')
+        else:
+            linhas = ler_json(request.get_json(silent=True))
+        relatorio = importar_ninhos(linhas, session['user_id'])
+    except ImportacaoInterrompida as e:
+        # As linhas anteriores à falha já foram gravadas: o cliente recebe o relatório delas
+        db.session.rollback()
+        return jsonify(dict(e.relatorio, error=str(e))), 400
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    return jsonify(relatorio), 200
+
+
 @ninhos_bp.route('/ninhos', methods=['GET'])
 @login_required
 def listar_ninhos():
-    query = Ninho.query.filter_by(usuario_id=session['user_id'])
-    ninhos = query.order_by(Ninho.data_registro.desc()).all()
-    return jsonify({'ninhos': [ninho.to_dict() for ninho in ninhos]}), 200
+    """Lista os ninhos do usuário logado, paginados (?limit=, ?cursor=, ?fields=, ?format=columnar)."""
+    try:
+        pagina = paginar_ninhos(request.args, Ninho.usuario_id == session['user_id'])
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(pagina), 200
 
 
 @ninhos_bp.route('/estatisticas', methods=['GET'])
 @login_required
+@cache_respostas.em_cache('estatisticas', variacao=hoje)
 def obter_estatisticas():
-    stats = {
-        'total_ninhos': Ninho.query.count(),
-        'ninhos_por_status': dict(db.session.query(Ninho.status, func.count(Ninho.id)).group_by(Ninho.status).all()),
-        'ninhos_por_risco': dict(db.session.query(Ninho.risco, func.count(Ninho.id)).group_by(Ninho.risco).all()),
-        'ninhos_prestes_eclodir': Ninho.query.filter(Ninho.dias_para_eclosao <= 5).count(),
-        'media_ovos_critico': round(db.session.query(func.avg(Ninho.quantidade_ovos)).filter(Ninho.risco == 'crítico').scalar() or 0, 2),
-        'regiao_mais_criticos': (db.session.query(Ninho.regiao).filter(Ninho.risco == 'crítico').group_by(Ninho.regiao).order_by(func.count(Ninho.id).desc()).first() or [None])[0],
-        'ninhos_predadores_danificados': Ninho.query.filter(Ninho.predadores == True, Ninho.status == 'danificado').count()
-    }
-    return jsonify(stats), 200
\ No newline at end of file
+    stats = obter_resumo()
+    return jsonify(stats), 200
+
+
+def _data(nome, padrao):
+    valor = request.args.get(nome)
+    if not valor:
+        return padrao
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ParametroInvalido(f'O parâmetro {nome} deve ser uma data AAAA-MM-DD.')
+
+
+@ninhos_bp.route('/eclosoes/calendario', methods=['GET'])
+@login_required
+@cache_respostas.em_cache('calendario_eclosoes', ('inicio', 'fim', 'agrupar', 'regiao'), variacao=hoje)
+def calendario_eclosoes():
+    """Ninhos com eclosão prevista por dia ou semana: ?inicio=&fim= (padrão: próximos 30 dias), ?agrupar=dia|semana, ?regiao="""
+    try:
+        inicio = _data('inicio', hoje())
+        fim = _data('fim', inicio + timedelta(days=30))
+        agrupar = request.args.get('agrupar', 'dia')
+        if agrupar not in ('dia', 'semana'):
+            raise ParametroInvalido('O parâmetro agrupar deve ser dia ou semana.')
+        if not 0 <= (fim - inicio).days < JANELA_MAXIMA_DIAS:
+            raise ParametroInvalido(f'O fim deve ser posterior ao início, em uma janela de até {JANELA_MAXIMA_DIAS} dias.')
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    regiao = request.args.get('regiao') or None
+    return jsonify({
+        'inicio': inicio.isoformat(), 'fim': fim.isoformat(), 'agrupar': agrupar, 'regiao': regiao,
+        'periodos': calendario(inicio, fim, agrupar, regiao),
+    }), 200
+
+
+@ninhos_bp.route('/analises/tendencias', methods=['GET'])
+@login_required
+@cache_respostas.em_cache('tendencias', ('inicio', 'fim', 'granularidade', 'janela', 'regiao'), variacao=hoje)
+@limitador.limitar('tendencias')  # abaixo do cache: respostas já calculadas não gastam fichas
+def tendencias_ninhos():
+    """Séries de ninhos, ovos e predadores por período: ?inicio=&fim= (padrão: últimos 365 dias), ?granularidade=dia|semana|mes, ?janela=, ?regiao="""
+    # NumPy só é carregado quando alguém pede análises
+    from src.services.analise import GRANULARIDADES, MAX_PERIODOS, periodos, tendencias
+    try:
+        fim = _data('fim', hoje())
+        inicio = _data('inicio', fim - timedelta(days=364))
+        granularidade = request.args.get('granularidade', 'semana')
+        if granularidade not in GRANULARIDADES:
+            raise ParametroInvalido('O parâmetro granularidade deve ser dia, semana ou mes.')
+        try:
+            janela = int(request.args.get('janela', 4))
+        except ValueError:
+            raise ParametroInvalido('O parâmetro janela deve ser um número inteiro.')
+        if not 1 <= janela <= 52:
+            raise ParametroInvalido('O parâmetro janela deve estar entre 1 e 52.')
+        if fim < inicio:
+            raise ParametroInvalido('O fim deve ser posterior ao início.')
+        if len(periodos(inicio, fim, granularidade)) > MAX_PERIODOS:
+            raise ParametroInvalido(f'Intervalo grande demais: no máximo {MAX_PERIODOS} períodos.')
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(tendencias(inicio, fim, granularidade, janela, request.args.get('regiao') or None)), 200
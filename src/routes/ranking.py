@@ -1,94 +1,59 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, session, current_app
 from src.models.user import User, db
 from src.models.ninho import Ninho
+from src.models.pontuacao import ranking_top, total_no_ranking, posicao_usuario, periodo_atual
 from src.routes.auth import login_required
-from sqlalchemy import func, case
-from datetime import datetime, date
+from src.services.cache_respostas import cache_respostas, resposta_json
+from sqlalchemy import func
 
 ranking_bp = Blueprint('ranking', __name__)
 
-def get_ranking_data(periodo='geral'):
+def get_ranking_data(periodo='geral', limite=None):
     """
-    Busca e calcula os dados do ranking com base em um sistema de pontos.
+    Busca o ranking a partir da pontuação materializada (PontuacaoUsuario).
     - Crítico: 10 pontos
     - Sob Observação: 5 pontos
     - Estável: 2 pontos
     - Bônus por Foto: +1 ponto
     """
-    # Define a expressão de pontos usando a função CASE do SQL
-    pontos_expression = case(
-        (Ninho.risco == 'crítico', 10),
-        (Ninho.risco == 'sob observação', 5),
-        (Ninho.risco == 'estável', 2),
-        else_=0
-    ) + case(
-        (Ninho.foto_path != None, 1),
-        else_=0
-    )
-
-    # Inicia a consulta base
-    query = db.session.query(
-        User.id,
-        User.username,
-        User.nome_completo,
-        func.count(Ninho.id).label('total_ninhos'),
-        func.sum(pontos_expression).label('total_pontos')
-    ).join(Ninho, User.id == Ninho.usuario_id).filter(User.ativo == True)
-
-    # Aplica o filtro de período se for 'mes'
-    if periodo == 'mes':
-        today = date.today()
-        start_of_month = today.replace(day=1)
-        query = query.filter(Ninho.data_registro >= start_of_month)
-
-    # Agrupa, ordena e executa a consulta
-    ranking_data = query.group_by(User.id).order_by(
-        func.sum(pontos_expression).desc(), 
-        func.count(Ninho.id).desc()
-    ).all()
-    
-    # Formata a lista de saída
-    ranking_list = []
-    for position, user_data in enumerate(ranking_data, 1):
-        ranking_list.append({
-            'posicao': position,
-            'user_id': user_data.id,
-            'username': user_data.username,
-            'nome_completo': user_data.nome_completo,
-            'total_ninhos': user_data.total_ninhos or 0,
-            'total_pontos': int(user_data.total_pontos or 0) # Garante que seja inteiro
-        })
-
-    return ranking_list
+    return ranking_top(periodo, limite)
 
 @ranking_bp.route('/ranking', methods=['GET'])
 @login_required
 def get_ranking():
     """
     Rota principal do ranking, que pode retornar o ranking 'geral' ou do 'mes'.
-    Exemplo de uso: /api/ranking?periodo=mes
+    Exemplo de uso: /api/ranking?periodo=mes&limite=10
     """
     try:
         periodo = request.args.get('periodo', 'geral') # 'geral' é o padrão
         if periodo not in ['geral', 'mes']:
             return jsonify({'error': "Período inválido. Use 'geral' ou 'mes'."}), 400
+        limite = request.args.get('limite', type=int)
+        if limite is not None and limite < 1:
+            return jsonify({'error': 'O limite deve ser um número positivo.'}), 400
 
-        ranking_list = get_ranking_data(periodo)
+        def calcular():
+            ranking_list = get_ranking_data(periodo, limite)
+            return {
+                'periodo': periodo,
+                'ranking': ranking_list,
+                'total_usuarios_no_ranking': total_no_ranking(periodo) if limite else len(ranking_list)
+            }
 
-        return jsonify({
-            'periodo': periodo,
-            'ranking': ranking_list,
-            'total_usuarios_no_ranking': len(ranking_list)
-        }), 200
+        # A parte comum a todos os usuários vem do cache; só a posição de quem pede é consultada
+        dados = cache_respostas.valor(f'ranking|{periodo_atual(periodo)}|{limite}', calcular)
+        dados['minha_posicao'] = posicao_usuario(session['user_id'], periodo)
+        return resposta_json(dados)
 
-    except Exception as e:
-        # Log do erro no servidor para depuração
-        print(f"Erro ao gerar ranking: {e}")
+    except Exception:
+        current_app.logger.exception('Erro ao gerar ranking')
         return jsonify({'error': 'Ocorreu um erro interno ao gerar o ranking.'}), 500
 
 # A rota de estatísticas continua a mesma e pode ser mantida ou removida se não for mais usada.
 @ranking_bp.route('/ranking/estatisticas', methods=['GET'])
 @login_required
+@cache_respostas.em_cache('ranking_estatisticas')
 def get_ranking_statistics():
     """Rota para obter estatísticas gerais do sistema."""
     try:
@@ -1,9 +1,13 @@
+import csv
 import io
-from flask import Blueprint, Response, jsonify
+import tempfile
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from src.models.ninho import Ninho
 from src.routes.auth import admin_required
-from openpyxl import Workbook # Importa a biblioteca para criar Excel
+from src.services.limites import limitador
 from src.routes.auth import login_required 
+from src.models.serializacao import consultar_ninhos
+from src.services.paginacao import paginar_ninhos, ParametroInvalido
 from collections import defaultdict
 
 
@@ -13,53 +17,97 @@ relatorios_bp = Blueprint('relatorios', __name__)
 @login_required 
 #@admin_required
 def get_ninhos_data():
-    """Retorna uma lista completa de todos os ninhos para a tabela de relatórios."""
+    """Retorna os ninhos para a tabela de relatórios, paginados (?limit=, ?cursor=, ?fields=, ?regiao=, ?format=columnar)."""
+    filtros = [Ninho.regiao == request.args['regiao']] if request.args.get('regiao') else []
     try:
-        ninhos = Ninho.query.join(Ninho.usuario).order_by(Ninho.data_registro.desc()).all()
-        return jsonify([ninho.to_dict() for ninho in ninhos]), 200
+        return jsonify(paginar_ninhos(request.args, *filtros)), 200
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+LOTE_EXPORTACAO = 1000
+CAMPOS_EXPORTACAO = ['id', 'regiao', 'quantidade_ovos', 'status', 'risco', 'dias_para_eclosao', 'predadores',
+                     'latitude', 'longitude', 'data_registro', 'usuario_id', 'usuario_nome_completo']
+CABECALHO_EXPORTACAO = [
+    'ID Ninho', 'Região', 'Qtd Ovos', 'Status', 'Risco',
+    'Dias para Eclosão', 'Predadores', 'Latitude', 'Longitude',
+    'Data Registro', 'ID Voluntário', 'Nome Voluntário'
+]
+
+
+def linhas_exportacao():
+    """Lê os ninhos em lotes (cursor do servidor via yield_per), uma linha por vez."""
+    query = consultar_ninhos(CAMPOS_EXPORTACAO).order_by(Ninho.id).yield_per(LOTE_EXPORTACAO)
+    for ninho in query:
+        yield [
+            ninho.id, ninho.regiao, ninho.quantidade_ovos, ninho.status, ninho.risco,
+            ninho.dias_para_eclosao, 'Sim' if ninho.predadores else 'Não',
+            ninho.latitude, ninho.longitude, ninho.data_registro.strftime('%Y-%m-%d %H:%M'),
+            ninho.usuario_id, ninho.usuario_nome_completo
+        ]
+
+
+def gerar_csv():
+    """Gera o CSV em blocos de LOTE_EXPORTACAO linhas, à medida que são lidas."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CABECALHO_EXPORTACAO)
+    for numero, linha in enumerate(linhas_exportacao(), 1):
+        writer.writerow(linha)
+        if numero % LOTE_EXPORTACAO == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def gerar_xlsx():
+    """
+    Monta o .xlsx no modo write-only do openpyxl (linhas vão direto para
+    disco, memória constante) e envia o arquivo em blocos. O formato zip só
+    fica válido após o save, por isso o primeiro byte espera a planilha toda;
+    use o CSV quando o tempo até o primeiro byte importar.
+    """
+    from openpyxl import Workbook  # só carregado quando alguém exporta em Excel
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Relatorio de Ninhos")
+    ws.append(CABECALHO_EXPORTACAO)
+    for linha in linhas_exportacao():
+        ws.append(linha)
+
+    arquivo = tempfile.TemporaryFile()
+    wb.save(arquivo)
+    arquivo.seek(0)
+
+    def enviar():
+        with arquivo:
+            while bloco := arquivo.read(64 * 1024):
+                yield bloco
+    return enviar()
+
+
 @relatorios_bp.route('/relatorios/ninhos/export', methods=['GET'])
 @admin_required
+@limitador.limitar('export')
 def exportar_ninhos_excel():
-    """NOVA VERSÃO: Gera e retorna um arquivo Excel (.xlsx) com todos os dados dos ninhos."""
+    """Exporta todos os ninhos em .xlsx (padrão) ou CSV (?formato=csv), enviando em blocos."""
+    formato = request.args.get('formato', 'xlsx')
+    if formato not in ('xlsx', 'csv'):
+        return jsonify({'error': "Formato inválido. Use 'xlsx' ou 'csv'."}), 400
+
     try:
-        ninhos = Ninho.query.join(Ninho.usuario).all()
-        
-        # Cria um Workbook (arquivo Excel) em memória
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Relatorio de Ninhos"
-
-        # Escreve o cabeçalho
-        header = [
-            'ID Ninho', 'Região', 'Qtd Ovos', 'Status', 'Risco',
-            'Dias para Eclosão', 'Predadores', 'Latitude', 'Longitude',
-            'Data Registro', 'ID Voluntário', 'Nome Voluntário'
-        ]
-        ws.append(header)
-
-        # Escreve os dados de cada ninho
-        for ninho in ninhos:
-            row = [
-                ninho.id, ninho.regiao, ninho.quantidade_ovos, ninho.status, ninho.risco,
-                ninho.dias_para_eclosao, 'Sim' if ninho.predadores else 'Não',
-                ninho.latitude, ninho.longitude, ninho.data_registro.strftime('%Y-%m-%d %H:%M'),
-                ninho.usuario.id, ninho.usuario.nome_completo
-            ]
-            ws.append(row)
-
-        # Salva o arquivo em um stream de bytes em memória
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        # Retorna o arquivo como um download
+        if formato == 'csv':
+            return Response(
+                stream_with_context(gerar_csv()),
+                mimetype="text/csv",
+                headers={"Content-Disposition": "attachment;filename=relatorio_ninhos.csv"}
+            )
+
         return Response(
-            output,
+            gerar_xlsx(),
             mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={"Content-Disposition": "attachment;filename=relatorio_ninhos.xlsx"}
         )
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
@@ -1,11 +1,18 @@
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
+from flask import Blueprint, request, jsonify, current_app, send_from_directory, abort, session
 from werkzeug.utils import secure_filename
 from src.routes.auth import login_required
+from src.services.limites import limitador
+from src.services.envios import envios, EnvioNaoEncontrado, EnvioInvalido, DeslocamentoInvalido
+from src.services.imagens import (
+    MINIATURAS, nome_arquivo, validar_imagem, enviar_para_processamento, enviar_arquivo_para_processamento,
+    aguardar_processamento, FalhaProcessamento, ProcessamentoDemorado
+)
 import os
-import uuid
+import re
 
 upload_bp = Blueprint('upload', __name__)
 UPLOAD_FOLDER = 'uploads'
+NOME_IMUTAVEL = re.compile(r'^[0-9a-f]{32}(?:[0-9a-f]{32})?(?:_[a-z])?\.(?:jpg|jpeg|png|gif)$')
 
 def ensure_upload_folder():
     upload_path = os.path.join(current_app.static_folder, UPLOAD_FOLDER)
@@ -14,22 +21,155 @@ def ensure_upload_folder():
 
 @upload_bp.route('/upload', methods=['POST'])
 @login_required
+@limitador.limitar('upload')
 def upload_file():
     if 'file' not in request.files or not request.files['file'].filename:
         return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
 
     file = request.files['file']
-    filename = secure_filename(file.filename)
-    ext = filename.rsplit('.', 1)[1].lower()
-    if ext not in {'png', 'jpg', 'jpeg', 'gif'}:
+    ext = extensao_permitida(file.filename)
+    if not ext:
         return jsonify({'error': 'Tipo de arquivo não permitido.'}), 400
 
-    unique_filename = f"{uuid.uuid4().hex}.{ext}"
-    upload_path = ensure_upload_folder()
-    file.save(os.path.join(upload_path, unique_filename))
-    
-    return jsonify({'file_path': f"{UPLOAD_FOLDER}/{unique_filename}"}), 200
+    dados = file.read()
+    try:
+        validar_imagem(dados)
+    except Exception:
+        return jsonify({'error': 'O arquivo enviado não é uma imagem válida.'}), 400
+
+    # Redimensionamento, remoção do EXIF e miniaturas rodam no pool de processos;
+    # o nome é o hash do conteúdo, então a mesma foto enviada duas vezes é gravada uma vez.
+    try:
+        unique_filename = enviar_para_processamento(
+            dados, ensure_upload_folder(), workers=current_app.config.get('IMAGE_WORKERS', 2),
+            timeout=current_app.config.get('IMAGE_TIMEOUT', 30)
+        )
+    except FalhaProcessamento as e:
+        return erro_processamento(e)
+
+    return jsonify(resposta_foto(unique_filename)), 200
+
+
+def erro_processamento(e):
+    """Só devolvemos o nome de fotos já gravadas: a falha vira erro para o cliente reenviar."""
+    if isinstance(e, ProcessamentoDemorado):
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    return jsonify({'error': str(e)}), 400
+
+
+def extensao_permitida(nome):
+    filename = secure_filename(nome or '')
+    ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    return ext if ext in {'png', 'jpg', 'jpeg', 'gif'} else None
+
+
+def resposta_foto(unique_filename):
+    return {
+        'file_path': f"{UPLOAD_FOLDER}/{unique_filename}",
+        'miniaturas': {tamanho: f"{UPLOAD_FOLDER}/{nome_arquivo(unique_filename.rsplit('.', 1)[0], tamanho)}" for tamanho in MINIATURAS}
+    }
+
+
+# --- Upload retomável: para conexões instáveis em campo ---
+# POST cria a sessão, PUT envia cada parte (corpo cru, ?deslocamento=), GET diz
+# quanto já chegou para retomar e POST .../concluir confere o SHA-256.
+
+@upload_bp.route('/upload/sessoes', methods=['POST'])
+@login_required
+@limitador.limitar('upload')
+def criar_envio():
+    data = request.get_json(silent=True) or {}
+    ext = extensao_permitida(data.get('nome'))
+    if not ext:
+        return jsonify({'error': 'Tipo de arquivo não permitido.'}), 400
+    try:
+        tamanho = int(data.get('tamanho'))
+        return jsonify(envios.criar(session['user_id'], tamanho, ext)), 201
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Informe o tamanho do arquivo em bytes.'}), 400
+    except EnvioInvalido as e:
+        return jsonify({'error': str(e)}), 400
+
+@upload_bp.route('/upload/sessoes/<id_envio>', methods=['GET'])
+@login_required
+def estado_envio(id_envio):
+    try:
+        return jsonify(envios.estado(id_envio, session['user_id'])), 200
+    except EnvioNaoEncontrado as e:
+        return jsonify({'error': str(e)}), 404
+
+@upload_bp.route('/upload/sessoes/<id_envio>', methods=['PUT'])
+@login_required
+@limitador.limitar('upload-parte')
+def enviar_parte(id_envio):
+    """Grava o corpo (application/octet-stream) a partir de ?deslocamento=; 409 com `recebido` se deixaria um buraco."""
+    if request.content_length is None:
+        return jsonify({'error': 'Content-Length é obrigatório.'}), 411
+    try:
+        deslocamento = int(request.args.get('deslocamento', ''))
+    except ValueError:
+        return jsonify({'error': 'O parâmetro deslocamento deve ser um número inteiro.'}), 400
+    try:
+        # request.stream não passa pelo parser de formulários: nada é acumulado em memória
+        estado = envios.receber(id_envio, session['user_id'], deslocamento, request.content_length, request.stream)
+    except EnvioNaoEncontrado as e:
+        return jsonify({'error': str(e)}), 404
+    except DeslocamentoInvalido as e:
+        return jsonify({'error': str(e), 'recebido': e.recebido}), 409
+    except EnvioInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(estado), 200
+
+@upload_bp.route('/upload/sessoes/<id_envio>/concluir', methods=['POST'])
+@login_required
+def concluir_envio(id_envio):
+    sha256 = (request.get_json(silent=True) or {}).get('sha256')
+    try:
+        caminho, nome_base = envios.concluir(id_envio, session['user_id'], sha256)
+    except EnvioNaoEncontrado as e:
+        return jsonify({'error': str(e)}), 404
+    except EnvioInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        validar_imagem(caminho)
+    except Exception:
+        os.remove(caminho)
+        return jsonify({'error': 'O arquivo enviado não é uma imagem válida.'}), 400
+
+    try:
+        unique_filename = enviar_arquivo_para_processamento(
+            caminho, nome_base, ensure_upload_folder(), workers=current_app.config.get('IMAGE_WORKERS', 2),
+            timeout=current_app.config.get('IMAGE_TIMEOUT', 30)
+        )
+    except FalhaProcessamento as e:
+        return erro_processamento(e)
+    return jsonify(resposta_foto(unique_filename)), 200
+
+@upload_bp.route('/upload/sessoes/<id_envio>', methods=['DELETE'])
+@login_required
+def cancelar_envio(id_envio):
+    try:
+        envios.cancelar(id_envio, session['user_id'])
+    except EnvioNaoEncontrado as e:
+        return jsonify({'error': str(e)}), 404
+    return jsonify({'message': 'Envio cancelado.'}), 200
 
 @upload_bp.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory(os.path.join(current_app.static_folder, UPLOAD_FOLDER), filename)
\ No newline at end of file
+    """Serve uma foto; ?tamanho=p|m devolve a miniatura, quando ela existir."""
+    upload_path = os.path.join(current_app.static_folder, UPLOAD_FOLDER)
+    if not aguardar_processamento(filename):
+        abort(404)
+
+    tamanho = request.args.get('tamanho')
+    if tamanho in MINIATURAS:
+        miniatura = nome_arquivo(filename.rsplit('.', 1)[0], tamanho)
+        # Fotos antigas, anteriores às miniaturas, caem no arquivo original
+        if os.path.exists(os.path.join(upload_path, miniatura)):
+            filename = miniatura
+
+    response = send_from_directory(upload_path, filename)
+    if NOME_IMUTAVEL.match(filename):
+        # O nome é derivado do conteúdo (hash ou UUID): o arquivo nunca muda
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
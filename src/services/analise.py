@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import type_coerce
+from src.models.user import db
+from src.models.ninho import Ninho
+
+GRANULARIDADES = ('dia', 'semana', 'mes')
+PERCENTIS = (10, 25, 50, 75, 90)
+MAX_PERIODOS = 1000
+COLUNAS = [('data_registro', 'O'), ('regiao', 'O'), ('risco', 'O'), ('quantidade_ovos', 'i8'), ('predadores', 'i8')]
+
+
+def inicio_do_periodo(data, granularidade):
+    if granularidade == 'semana':
+        return data - timedelta(days=data.weekday())
+    if granularidade == 'mes':
+        return data.replace(day=1)
+    return data
+
+
+def periodos(inicio, fim, granularidade):
+    """Datas de início de cada período (dia, semana a partir de segunda ou mês) que cruza [inicio, fim]."""
+    datas, data = [], inicio_do_periodo(inicio, granularidade)
+    while data <= fim:
+        datas.append(data)
+        if granularidade == 'mes':
+            data = (data + timedelta(days=32)).replace(day=1)
+        else:
+            data += timedelta(days=7 if granularidade == 'semana' else 1)
+    return datas
+
+
+def consulta_colunas(inicio, fim, regiao=None):
+    """
+    Colunas analisadas dos ninhos registrados em [inicio, fim], numa faixa de
+    data_registro respondida só pelo índice ix_ninho_analise. Data e
+    predadores vêm crus do driver (texto ISO e 0/1 no SQLite), sem a conversão
+    linha a linha do SQLAlchemy; o NumPy converte a coluna inteira de uma vez.
+    """
+    consulta = db.session.query(
+        type_coerce(Ninho.data_registro, db.String), Ninho.regiao, Ninho.risco,
+        Ninho.quantidade_ovos, type_coerce(Ninho.predadores, db.Integer),
+    ).filter(Ninho.data_registro >= datetime.combine(inicio, datetime.min.time()),
+             Ninho.data_registro < datetime.combine(fim + timedelta(days=1), datetime.min.time()))
+    if regiao:
+        consulta = consulta.filter(Ninho.regiao == regiao)
+    return consulta
+
+
+def colunas_ninhos(inicio, fim, regiao=None):
+    """Resultado de consulta_colunas como um array estruturado do NumPy, um campo por coluna."""
+    # O array é preenchido direto do cursor do driver: montar um Row do SQLAlchemy
+    # (ou transpor uma lista de tuplas) por linha custaria mais que o cálculo todo
+    resultado = db.session.connection().execute(consulta_colunas(inicio, fim, regiao).statement)
+    try:
+        return np.fromiter(resultado.cursor, dtype=COLUNAS)
+    finally:
+        resultado.close()
+
+
+def _contagens_por_categoria(baldes, valores, quantidade):
+    """{categoria: contagem por período}, com um único bincount sobre (período, categoria)."""
+    # Poucas categorias distintas: codificar por dicionário sai mais barato que ordenar as strings
+    codigos = {}
+    indices = np.fromiter((codigos.setdefault(valor, len(codigos)) for valor in valores), dtype=np.int64, count=len(valores))
+    matriz = np.bincount(baldes * len(codigos) + indices, minlength=quantidade * len(codigos))
+    matriz = matriz.reshape(quantidade, len(codigos))
+    return {str(categoria): matriz[:, i].tolist() for categoria, i in sorted(codigos.items())}
+
+
+def _soma_movel(serie, janela):
+    """Soma dos últimos `janela` períodos (menos no começo da série) e quantos entraram nela, por somas acumuladas."""
+    acumulada = np.concatenate(([0.0], np.cumsum(serie, dtype=float)))
+    fim = np.arange(1, len(serie) + 1)
+    inicio = np.maximum(fim - janela, 0)
+    return acumulada[fim] - acumulada[inicio], fim - inicio
+
+
+def _percentis_por_periodo(baldes, ovos, quantidade):
+    """
+    Percentis da quantidade de ovos em cada período, sem laço por período:
+    ordena por (período, ovos) e interpola linearmente nas posições de cada
+    grupo, como np.percentile faz para um grupo só.
+    """
+    contagens = np.bincount(baldes, minlength=quantidade)
+    if not len(ovos):
+        return {f'p{percentil}': [None] * quantidade for percentil in PERCENTIS}
+    ordenados = ovos[np.lexsort((ovos, baldes))].astype(float)
+    comecos = np.cumsum(contagens) - contagens
+    ultimos = comecos + np.maximum(contagens - 1, 0)
+    maximo = len(ordenados) - 1
+    resultado = {}
+    for percentil in PERCENTIS:
+        posicao = comecos + np.maximum(contagens - 1, 0) * percentil / 100
+        abaixo = np.floor(posicao).astype(int)
+        acima = np.minimum(abaixo + 1, ultimos)
+        # Períodos vazios apontam para fora do vetor; o valor deles é descartado
+        abaixo, acima = abaixo.clip(max=maximo), acima.clip(max=maximo)
+        valores = ordenados[abaixo] + (posicao - np.floor(posicao)) * (ordenados[acima] - ordenados[abaixo])
+        resultado[f'p{percentil}'] = [round(float(v), 2) if n else None for v, n in zip(valores, contagens)]
+    return resultado
+
+
+def tendencias(inicio, fim, granularidade='semana', janela=4, regiao=None):
+    """
+    Séries de [inicio, fim] por período: ninhos no total, por região e por
+    risco, com média móvel de `janela` períodos; distribuição de ovos
+    (percentis no intervalo todo e em cada período) e taxa de predadores.
+    Tudo calculado em lote com NumPy sobre as colunas de uma consulta.
+    """
+    datas = periodos(inicio, fim, granularidade)
+    quantidade = len(datas)
+    colunas = colunas_ninhos(inicio, fim, regiao)
+    ovos, predadores = colunas['quantidade_ovos'], colunas['predadores']
+
+    dias = colunas['data_registro'].astype('datetime64[D]')
+    base = np.datetime64(datas[0], 'D')
+    if granularidade == 'mes':
+        baldes = (dias.astype('datetime64[M]') - base.astype('datetime64[M]')).astype(int)
+    else:
+        baldes = (dias - base).astype(int) // (7 if granularidade == 'semana' else 1)
+
+    total = np.bincount(baldes, minlength=quantidade)
+    com_predadores = np.bincount(baldes, weights=predadores, minlength=quantidade)
+    soma_ovos = np.bincount(baldes, weights=ovos, minlength=quantidade)
+    com_dados = total > 0
+    taxa = np.divide(com_predadores, total, out=np.zeros(quantidade), where=com_dados)
+    ninhos_janela, tamanhos = _soma_movel(total, janela)
+    predadores_janela, _ = _soma_movel(com_predadores, janela)
+
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'granularidade': granularidade,
+        'janela': janela,
+        'regiao': regiao,
+        'periodos': [data.isoformat() for data in datas],
+        'ninhos': {
+            'total': total.tolist(),
+            'media_movel': np.round(ninhos_janela / tamanhos, 3).tolist(),
+            'por_regiao': _contagens_por_categoria(baldes, colunas['regiao'], quantidade),
+            'por_risco': _contagens_por_categoria(baldes, colunas['risco'], quantidade),
+        },
+        'ovos': {
+            'total': int(ovos.sum()),
+            'media': [round(float(s / t), 2) if t else None for s, t in zip(soma_ovos, total)],
+            'percentis': {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTIS, np.percentile(ovos, PERCENTIS))} if len(ovos) else None,
+            'percentis_por_periodo': _percentis_por_periodo(baldes, ovos, quantidade),
+        },
+        'predadores': {
+            'taxa_geral': round(float(predadores.sum() / len(predadores)), 4) if len(predadores) else None,
+            'taxa': [round(float(v), 4) if tem else None for v, tem in zip(taxa, com_dados)],
+            # Taxa na janela (ninhos com predadores / ninhos), não a média das taxas de cada período
+            'media_movel': [round(float(p / t), 4) if t else None for p, t in zip(predadores_janela, ninhos_janela)],
+        },
+    }
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, jsonify, request
+from src.models.versao import versao_atual
+
+
+class CacheMemoria:
+    """LRU em memória do processo: {chave: (versao, corpo)}."""
+
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                self._entradas.move_to_end(chave)
+            return entrada
+
+    def gravar(self, chave, versao, corpo):
+        with self._lock:
+            self._entradas[chave] = (versao, corpo)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+class CacheSQLite:
+    """
+    Cache em um arquivo SQLite local, compartilhado pelos workers do gunicorn
+    da mesma máquina: o que um worker calculou serve aos demais. Ao gravar uma
+    versão nova, as entradas de versões anteriores (que nunca mais valem) são apagadas.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with self._conexao() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS resposta (chave TEXT PRIMARY KEY, versao INTEGER NOT NULL, corpo BLOB NOT NULL)')
+
+    def _conexao(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+        return conn
+
+    def obter(self, chave):
+        try:
+            return self._conexao().execute('SELECT versao, corpo FROM resposta WHERE chave = ?', (chave,)).fetchone()
+        except sqlite3.OperationalError:
+            # Arquivo travado, apagado ou corrompido: conta como falta e a resposta é calculada
+            return None
+
+    def gravar(self, chave, versao, corpo):
+        conn = self._conexao()
+        try:
+            conn.execute('INSERT OR REPLACE INTO resposta (chave, versao, corpo) VALUES (?, ?, ?)', (chave, versao, corpo))
+            conn.execute('DELETE FROM resposta WHERE versao < ?', (versao,))
+        except sqlite3.OperationalError:
+            # Banco ocupado por outro worker: a resposta só não fica no cache desta vez
+            pass
+
+    def limpar(self):
+        try:
+            self._conexao().execute('DELETE FROM resposta')
+        except sqlite3.OperationalError:
+            pass
+
+
+class CacheRespostas:
+    """
+    Cache de respostas de leitura, válido enquanto a versão dos dados
+    (src/models/versao.py) não mudar. Cada consulta lê a versão atual no banco
+    (uma busca por chave primária), então uma gravação em qualquer processo
+    invalida o cache de todos na requisição seguinte.
+
+    RESPONSE_CACHE_BACKEND escolhe onde guardar: 'memoria' (LRU por processo,
+    padrão) ou 'sqlite' (arquivo compartilhado entre os workers).
+    """
+
+    def __init__(self, app=None):
+        self.backend = CacheMemoria(256)
+        self.acertos = 0
+        self.faltas = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_BACKEND', 'memoria')
+        app.config.setdefault('RESPONSE_CACHE_SIZE', 256)
+        app.config.setdefault('RESPONSE_CACHE_PATH', os.path.join(app.instance_path, 'cache_respostas.db'))
+        if app.config['RESPONSE_CACHE_BACKEND'] == 'sqlite':
+            self.backend = CacheSQLite(app.config['RESPONSE_CACHE_PATH'])
+        else:
+            self.backend = CacheMemoria(app.config['RESPONSE_CACHE_SIZE'])
+        app.extensions['cache_respostas'] = self
+
+    def _contar(self, acerto):
+        with self._lock:
+            if acerto:
+                self.acertos += 1
+            else:
+                self.faltas += 1
+
+    def obter_ou_calcular(self, chave, calcular):
+        """
+        Corpo (bytes) da chave na versão atual dos dados, ou o resultado de
+        calcular() gravado no cache. Retorna (corpo, acerto).
+        """
+        versao = versao_atual()
+        entrada = self.backend.obter(chave)
+        if entrada is not None and entrada[0] == versao:
+            self._contar(True)
+            return entrada[1], True
+        self._contar(False)
+        corpo = calcular()
+        if corpo is not None:
+            self.backend.gravar(chave, versao, corpo)
+        return corpo, False
+
+    def valor(self, chave, calcular):
+        """Como obter_ou_calcular, para um valor serializável em JSON (parte de uma resposta)."""
+        corpo, _ = self.obter_ou_calcular(chave, lambda: json.dumps(calcular()).encode())
+        return json.loads(corpo)
+
+    def em_cache(self, nome, parametros=(), variacao=None):
+        """
+        Decorador de rotas GET cuja resposta é a mesma para todos os usuários.
+        A chave é o nome mais os `parametros` da query string (e o retorno de
+        `variacao()`, para respostas que dependem de algo além dos dados, como
+        o mês corrente). Só respostas 200 são guardadas.
+        """
+        def decorador(view):
+            @wraps(view)
+            def decorada(*args, **kwargs):
+                partes = [nome] + [f'{p}={request.args.get(p, "")}' for p in parametros]
+                if variacao:
+                    partes.append(str(variacao()))
+                status = {}
+
+                def calcular():
+                    resposta = current_app.make_response(view(*args, **kwargs))
+                    status['resposta'] = resposta
+                    return resposta.get_data() if resposta.status_code == 200 else None
+
+                corpo, acerto = self.obter_ou_calcular('|'.join(partes), calcular)
+                if corpo is None:
+                    return status['resposta']
+                resposta = current_app.response_class(corpo, mimetype='application/json')
+                resposta.headers['X-Cache'] = 'HIT' if acerto else 'MISS'
+                return com_etag(resposta)
+            return decorada
+        return decorador
+
+    def estado(self):
+        return {
+            'backend': type(self.backend).__name__,
+            'acertos': self.acertos,
+            'faltas': self.faltas,
+            'versao_dados': versao_atual(),
+        }
+
+
+def com_etag(resposta):
+    """Define o ETag pelo conteúdo e responde 304 se o cliente já tiver essa versão."""
+    resposta.set_etag(hashlib.sha1(resposta.get_data()).hexdigest())
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta.make_conditional(request)
+
+
+def resposta_json(dados):
+    return com_etag(jsonify(dados))
+
+
+cache_respostas = CacheRespostas()
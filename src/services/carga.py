@@ -0,0 +1,170 @@
+import io
+import json
+import random
+import threading
+import time
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+# Cenário: (nome, peso, método, caminho). O peso é a frequência relativa no sorteio.
+CENARIO = [
+    ('login', 2, 'POST', '/api/auth/login'),
+    ('listar_ninhos', 25, 'GET', '/api/ninhos?limit=50'),
+    ('estatisticas', 25, 'GET', '/api/estatisticas'),
+    ('ranking_mes', 20, 'GET', '/api/ranking?periodo=mes&limite=10'),
+    ('relatorios', 15, 'GET', '/api/relatorios/ninhos/data?limit=100'),
+    ('exportar_csv', 1, 'GET', '/api/relatorios/ninhos/export?formato=csv'),
+    ('upload', 2, 'POST', '/api/upload'),
+]
+
+
+def _foto(rng):
+    """JPEG pequeno e diferente a cada chamada, para o upload não cair sempre na deduplicação."""
+    from PIL import Image
+    imagem = Image.new('RGB', (320, 240), tuple(rng.randrange(256) for _ in range(3)))
+    saida = io.BytesIO()
+    imagem.save(saida, 'JPEG', quality=80)
+    return saida.getvalue()
+
+
+class ClienteLocal:
+    """
+    Dirige o app no próprio processo pelo test_client do Flask (pilha WSGI
+    completa). `ip` é o endereço de origem visto pelo app (limites por IP).
+    """
+
+    def __init__(self, app, ip='127.0.0.1'):
+        self.cliente = app.test_client()
+        self.ambiente = {'REMOTE_ADDR': ip}
+
+    def enviar(self, metodo, caminho, json_corpo=None, arquivo=None):
+        if arquivo:
+            resposta = self.cliente.post(caminho, data={'file': (io.BytesIO(arquivo), 'foto.jpg')},
+                                         environ_base=self.ambiente)
+        else:
+            resposta = self.cliente.open(caminho, method=metodo, json=json_corpo, environ_base=self.ambiente)
+        resposta.get_data()
+        resposta.close()
+        return resposta.status_code
+
+
+class ClienteHTTP:
+    """Dirige um servidor em execução (gunicorn, flask run) por HTTP, com cookie de sessão."""
+
+    def __init__(self, url_base):
+        self.url_base = url_base.rstrip('/')
+        self.abridor = build_opener(HTTPCookieProcessor(CookieJar()))
+
+    def enviar(self, metodo, caminho, json_corpo=None, arquivo=None):
+        cabecalhos, corpo = {}, None
+        if arquivo:
+            fronteira = 'carga%016x' % random.getrandbits(64)
+            cabecalhos['Content-Type'] = f'multipart/form-data; boundary={fronteira}'
+            corpo = (f'--{fronteira}\r\nContent-Disposition: form-data; name="file"; filename="foto.jpg"\r\n'
+                     f'Content-Type: image/jpeg\r\n\r\n').encode() + arquivo + f'\r\n--{fronteira}--\r\n'.encode()
+        elif json_corpo is not None:
+            cabecalhos['Content-Type'] = 'application/json'
+            corpo = json.dumps(json_corpo).encode()
+        try:
+            with self.abridor.open(Request(self.url_base + caminho, data=corpo, headers=cabecalhos, method=metodo)) as resposta:
+                resposta.read()
+                return resposta.status
+        except HTTPError as erro:
+            return erro.code
+
+
+def percentil(valores, fracao):
+    if not valores:
+        return None
+    return valores[min(int(len(valores) * fracao), len(valores) - 1)]
+
+
+ROTAS_ADMIN = {'exportar_csv', 'exportar_xlsx'}
+
+
+def executar_carga(criar_cliente, usuarios, senha, concorrencia=8, duracao=30.0, semente=1,
+                   admin=None, cenario=CENARIO, admins=1):
+    """
+    Roda `concorrencia` voluntários virtuais por `duracao` segundos. Cada um
+    entra com um dos `usuarios` (username) e sorteia requisições do cenário.
+    Se `admin` for dado, os `admins` primeiros voluntários entram com ele e são
+    os únicos a sortear as rotas de administrador. Retorna o relatório por endpoint (latências em ms,
+    vazão em req/s).
+    """
+    latencias = {nome: [] for nome, *_ in cenario}
+    erros = {nome: 0 for nome, *_ in cenario}
+    lock = threading.Lock()
+    fim = time.perf_counter() + duracao
+
+    def voluntario(numero):
+        rng = random.Random(semente * 1000 + numero)
+        cliente = criar_cliente()
+        e_admin = admin is not None and numero < admins
+        credenciais = {'username': admin if e_admin else usuarios[numero % len(usuarios)], 'password': senha}
+        proprio = [item for item in cenario if e_admin or item[0] not in ROTAS_ADMIN]
+        pesos = [peso for _, peso, *_ in proprio]
+        cliente.enviar('POST', '/api/auth/login', credenciais)
+        while time.perf_counter() < fim:
+            nome, _, metodo, caminho = rng.choices(proprio, weights=pesos)[0]
+            inicio = time.perf_counter()
+            try:
+                status = cliente.enviar(metodo, caminho,
+                                        json_corpo=credenciais if nome == 'login' else None,
+                                        arquivo=_foto(rng) if nome == 'upload' else None)
+            except Exception:
+                status = None
+            decorrido = (time.perf_counter() - inicio) * 1000
+            with lock:
+                latencias[nome].append(decorrido)
+                if status is None or status >= 400:
+                    erros[nome] += 1
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=voluntario, args=(numero,)) for numero in range(concorrencia)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - inicio
+
+    endpoints = {}
+    for nome, valores in latencias.items():
+        valores.sort()
+        endpoints[nome] = {
+            'requisicoes': len(valores),
+            'erros': erros[nome],
+            'vazao_rps': round(len(valores) / total, 2),
+            'p50_ms': round(percentil(valores, 0.50), 2) if valores else None,
+            'p95_ms': round(percentil(valores, 0.95), 2) if valores else None,
+            'p99_ms': round(percentil(valores, 0.99), 2) if valores else None,
+        }
+    return {
+        'concorrencia': concorrencia,
+        'duracao_s': round(total, 2),
+        'requisicoes': sum(item['requisicoes'] for item in endpoints.values()),
+        'vazao_rps': round(sum(item['requisicoes'] for item in endpoints.values()) / total, 2),
+        'endpoints': endpoints,
+    }
+
+
+def comparar_com_base(resultado, base, tolerancia=0.2, minimo_requisicoes=20):
+    """
+    Regressões em relação a uma execução de referência: p95 maior ou vazão
+    menor que a base além da `tolerancia`, ou taxa de erro maior. Endpoints com
+    poucas amostras nas duas execuções são ignorados (o percentil seria ruído).
+    """
+    regressoes = []
+    for nome, atual in resultado['endpoints'].items():
+        anterior = base.get('endpoints', {}).get(nome)
+        if not anterior or min(atual['requisicoes'], anterior['requisicoes']) < minimo_requisicoes:
+            continue
+        if atual['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia):
+            regressoes.append(f"{nome}: p95 {anterior['p95_ms']} -> {atual['p95_ms']} ms")
+        if atual['vazao_rps'] < anterior['vazao_rps'] * (1 - tolerancia):
+            regressoes.append(f"{nome}: vazão {anterior['vazao_rps']} -> {atual['vazao_rps']} req/s")
+        taxa_atual = atual['erros'] / atual['requisicoes']
+        taxa_anterior = anterior['erros'] / anterior['requisicoes']
+        if taxa_atual > taxa_anterior + 0.01:
+            regressoes.append(f"{nome}: erros {taxa_anterior:.1%} -> {taxa_atual:.1%}")
+    return regressoes
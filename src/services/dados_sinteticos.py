@@ -0,0 +1,92 @@
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+from src.models.user import User, db
+from src.services.senhas import senhas
+from src.services.importacao import importar_ninhos
+
+# Praias de desova com um centro aproximado; os ninhos se espalham ~10 km em volta.
+# O peso reflete que poucas praias concentram a maior parte dos ninhos.
+REGIOES = [
+    ('Tabuleiro do Embaubal', -2.55, -52.05, 30),
+    ('Rio Trombetas', -1.45, -56.55, 20),
+    ('Rio Guaporé', -12.45, -63.15, 12),
+    ('Rio Purus', -6.45, -64.40, 10),
+    ('Rio Juruá', -4.85, -66.85, 8),
+    ('Rio Javaés', -10.80, -49.95, 8),
+    ('Rio Branco', 1.85, -61.15, 5),
+    ('Rio Madeira', -5.95, -61.25, 4),
+    ('Rio Tapajós', -3.95, -55.55, 3),
+]
+RISCOS = [('estável', 55), ('sob observação', 30), ('crítico', 15)]
+STATUS = [('intacto', 70), ('ameaçado', 18), ('danificado', 12)]
+
+
+def _escolher(rng, opcoes):
+    return rng.choices([opcao[0] for opcao in opcoes], weights=[opcao[-1] for opcao in opcoes])[0]
+
+
+def gerar_usuarios(quantidade, senha, admins=0, prefixo='voluntario'):
+    """
+    Cria (ou reaproveita) os voluntários prefixo0001..prefixoN, todos com a
+    mesma senha. O hash é calculado uma vez e copiado, senão gerar milhares de
+    usuários levaria minutos de scrypt. Os `admins` primeiros são
+    administradores. Retorna os ids, na ordem.
+    """
+    hash_senha = senhas.gerar(senha)
+    nomes = [f'{prefixo}{numero:04d}' for numero in range(1, quantidade + 1)]
+    existentes = {user.username: user.id for user in User.query.filter(User.username.in_(nomes))}
+    novos = [
+        User(username=nome, email=f'{nome}@exemplo.org', nome_completo=f'Voluntário {nome[len(prefixo):]}',
+             password_hash=hash_senha, is_admin=posicao < admins)
+        for posicao, nome in enumerate(nomes) if nome not in existentes
+    ]
+    db.session.add_all(novos)
+    db.session.commit()
+    existentes.update({user.username: user.id for user in novos})
+    return [existentes[nome] for nome in nomes]
+
+
+def linhas_ninhos(rng, quantidade, semente, dias_historico=365):
+    """Ninhos sintéticos com distribuições plausíveis; id_cliente fixo por semente torna a geração idempotente."""
+    agora = datetime.utcnow()
+    for numero in range(quantidade):
+        regiao = _escolher(rng, REGIOES)
+        _, latitude, longitude, _ = next(r for r in REGIOES if r[0] == regiao)
+        risco = _escolher(rng, RISCOS)
+        status = _escolher(rng, STATUS)
+        yield {
+            'id_cliente': f'sintetico-{semente}-{numero}',
+            'regiao': regiao,
+            'quantidade_ovos': max(1, int(rng.gauss(95, 25))),
+            'status': status,
+            'risco': risco,
+            'dias_para_eclosao': rng.randint(0, 70),
+            'predadores': rng.random() < (0.45 if status == 'danificado' else 0.08),
+            'latitude': round(latitude + rng.gauss(0, 0.09), 6),
+            'longitude': round(longitude + rng.gauss(0, 0.09), 6),
+            # Mais registros recentes que antigos, como em uma temporada em andamento
+            'data_registro': agora - timedelta(days=dias_historico * rng.random() ** 2, seconds=rng.randint(0, 86399)),
+        }
+
+
+def gerar_dados(usuarios, ninhos, semente=42, senha='senha123', admins=0):
+    """
+    Popula o banco com `usuarios` voluntários e `ninhos` ninhos distribuídos
+    entre eles (alguns voluntários registram muito mais que outros). Mesma
+    semente, mesmos dados: rodar de novo não duplica nada.
+    """
+    rng = random.Random(semente)
+    ids = gerar_usuarios(usuarios, senha, admins)
+    # Pesos acumulados uma vez só: com weights=, choices() os refaz a cada sorteio (O(usuarios) por ninho)
+    acumulados = list(accumulate(1 / (posicao + 1) for posicao in range(len(ids))))
+    por_usuario = {}
+    for linha in linhas_ninhos(rng, ninhos, semente):
+        por_usuario.setdefault(rng.choices(ids, cum_weights=acumulados)[0], []).append(linha)
+
+    relatorio = {'usuarios': len(ids), 'inseridos': 0, 'ignorados': 0}
+    for usuario_id, linhas in por_usuario.items():
+        resultado = importar_ninhos(linhas, usuario_id)
+        relatorio['inseridos'] += resultado['inseridos']
+        relatorio['ignorados'] += resultado['ignorados']
+    return relatorio
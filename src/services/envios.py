@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from werkzeug.exceptions import ClientDisconnected
+
+try:
+    import fcntl
+except ImportError:  # fora do POSIX (desenvolvimento no Windows) as partes de uma sessão não são serializadas entre processos
+    fcntl = None
+
+BLOCO_LEITURA = 64 * 1024
+ID_ENVIO = re.compile(r'^[0-9a-f]{32}$')
+
+
+class EnvioNaoEncontrado(Exception):
+    """Sessão inexistente, expirada ou de outro usuário."""
+
+
+class EnvioInvalido(Exception):
+    """Parâmetros da sessão ou da parte enviada fora do aceito."""
+
+
+class DeslocamentoInvalido(Exception):
+    """A parte começa depois do que já foi recebido; `recebido` diz de onde continuar."""
+
+    def __init__(self, recebido):
+        super().__init__(f'A parte deve começar em {recebido} bytes ou antes.')
+        self.recebido = recebido
+
+
+class Envios:
+    """
+    Sessões de upload retomável, em disco (UPLOAD_SESSIONS_PATH) para valerem
+    em todos os workers. Cada sessão é uma pasta com `sessao.json` e o arquivo
+    `parcial`, cujo tamanho é o quanto já foi recebido: as partes só podem
+    começar nesse ponto ou antes (reenvio de uma parte cuja resposta se
+    perdeu), nunca deixar um buraco. O corpo de cada parte vai do socket para
+    o arquivo em blocos de BLOCO_LEITURA, e uma conexão que cai no meio da
+    parte mantém o que chegou. Sessões paradas por UPLOAD_SESSION_TTL
+    segundos são apagadas.
+    """
+
+    def __init__(self, app=None):
+        self.pasta = None
+        self.validade = 24 * 3600
+        self.tamanho_maximo = 16 * 1024 * 1024
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('UPLOAD_SESSIONS_PATH', os.path.join(app.instance_path, 'envios'))
+        app.config.setdefault('UPLOAD_SESSION_TTL', self.validade)
+        app.config.setdefault('UPLOAD_MAX_SIZE', app.config.get('MAX_CONTENT_LENGTH') or self.tamanho_maximo)
+        self.pasta = app.config['UPLOAD_SESSIONS_PATH']
+        self.validade = app.config['UPLOAD_SESSION_TTL']
+        self.tamanho_maximo = app.config['UPLOAD_MAX_SIZE']
+        app.extensions['envios'] = self
+
+    def _caminho(self, id_envio, *partes):
+        if not ID_ENVIO.match(id_envio):
+            raise EnvioNaoEncontrado('Envio não encontrado.')
+        return os.path.join(self.pasta, id_envio, *partes)
+
+    def _sessao(self, id_envio, usuario_id):
+        try:
+            with open(self._caminho(id_envio, 'sessao.json'), encoding='utf-8') as arquivo:
+                sessao = json.load(arquivo)
+        except FileNotFoundError:
+            raise EnvioNaoEncontrado('Envio não encontrado.')
+        if sessao['usuario_id'] != usuario_id:
+            raise EnvioNaoEncontrado('Envio não encontrado.')
+        return sessao
+
+    def _abrir(self, id_envio, modo):
+        try:
+            return open(self._caminho(id_envio, 'parcial'), modo)
+        except FileNotFoundError:
+            # Concluída ou cancelada entre a leitura da sessão e esta parte
+            raise EnvioNaoEncontrado('Envio não encontrado.')
+
+    def _estado(self, id_envio, sessao, recebido, atualizado):
+        return {
+            'id': id_envio,
+            'tamanho': sessao['tamanho'],
+            'recebido': recebido,
+            'expira_em': int(atualizado + self.validade),
+        }
+
+    def criar(self, usuario_id, tamanho, extensao):
+        if not 0 < tamanho <= self.tamanho_maximo:
+            raise EnvioInvalido(f'O tamanho deve estar entre 1 e {self.tamanho_maximo} bytes.')
+        self.limpar_expiradas()
+        id_envio = uuid.uuid4().hex
+        os.makedirs(self._caminho(id_envio))
+        open(self._caminho(id_envio, 'parcial'), 'wb').close()
+        sessao = {'usuario_id': usuario_id, 'tamanho': tamanho, 'extensao': extensao, 'criado_em': time.time()}
+        with open(self._caminho(id_envio, 'sessao.json'), 'w', encoding='utf-8') as arquivo:
+            json.dump(sessao, arquivo)
+        return self._estado(id_envio, sessao, 0, time.time())
+
+    def estado(self, id_envio, usuario_id):
+        sessao = self._sessao(id_envio, usuario_id)
+        with self._abrir(id_envio, 'rb') as arquivo:
+            info = os.fstat(arquivo.fileno())
+        return self._estado(id_envio, sessao, info.st_size, info.st_mtime)
+
+    def receber(self, id_envio, usuario_id, deslocamento, tamanho_parte, fluxo):
+        """Grava a parte que começa em `deslocamento`, lendo `fluxo` em blocos. Retorna o estado da sessão."""
+        sessao = self._sessao(id_envio, usuario_id)
+        if deslocamento < 0 or deslocamento + tamanho_parte > sessao['tamanho']:
+            raise EnvioInvalido('A parte ultrapassa o tamanho declarado do arquivo.')
+        with self._abrir(id_envio, 'r+b') as arquivo:
+            if fcntl:
+                # Reenvio concorrente da mesma parte (por outro worker): um de cada vez
+                fcntl.flock(arquivo, fcntl.LOCK_EX)
+            if not os.path.exists(self._caminho(id_envio, 'parcial')):
+                # Concluída enquanto esperava a vez: o arquivo já saiu da sessão e não pode mudar
+                raise EnvioNaoEncontrado('Envio não encontrado.')
+            recebido = os.fstat(arquivo.fileno()).st_size
+            if deslocamento > recebido:
+                raise DeslocamentoInvalido(recebido)
+            arquivo.seek(deslocamento)
+            restante = tamanho_parte
+            try:
+                while restante and (bloco := fluxo.read(min(BLOCO_LEITURA, restante))):
+                    arquivo.write(bloco)
+                    restante -= len(bloco)
+            except ClientDisconnected:
+                # Conexão perdida no meio da parte: o que chegou fica, e o cliente retoma dali
+                pass
+            recebido = max(recebido, arquivo.tell())
+        return self._estado(id_envio, sessao, recebido, time.time())
+
+    def concluir(self, id_envio, usuario_id, sha256):
+        """
+        Confere que o arquivo está completo e que o SHA-256 bate, e o tira da
+        sessão com um rename atômico (nenhuma parte atrasada o altera depois).
+        Retorna (caminho, sha256); o arquivo passa a ser de quem chamou.
+        """
+        sessao = self._sessao(id_envio, usuario_id)
+        with self._abrir(id_envio, 'rb') as arquivo:
+            if fcntl:
+                fcntl.flock(arquivo, fcntl.LOCK_EX)
+            recebido = os.fstat(arquivo.fileno()).st_size
+            if recebido != sessao['tamanho']:
+                raise EnvioInvalido(f"Arquivo incompleto: {recebido} de {sessao['tamanho']} bytes recebidos.")
+            resumo = hashlib.sha256()
+            while bloco := arquivo.read(BLOCO_LEITURA):
+                resumo.update(bloco)
+            if resumo.hexdigest() != (sha256 or '').lower():
+                raise EnvioInvalido('O SHA-256 informado não confere com o arquivo recebido.')
+            destino = os.path.join(self.pasta, f"{id_envio}.{sessao['extensao']}")
+            os.replace(self._caminho(id_envio, 'parcial'), destino)
+        shutil.rmtree(self._caminho(id_envio), ignore_errors=True)
+        return destino, resumo.hexdigest()
+
+    def cancelar(self, id_envio, usuario_id):
+        self._sessao(id_envio, usuario_id)
+        shutil.rmtree(self._caminho(id_envio), ignore_errors=True)
+
+    def limpar_expiradas(self):
+        """Apaga sessões paradas há mais de UPLOAD_SESSION_TTL segundos (e arquivos concluídos esquecidos). Retorna quantas."""
+        if not os.path.isdir(self.pasta):
+            return 0
+        limite = time.time() - self.validade
+        apagadas = 0
+        for nome in os.listdir(self.pasta):
+            caminho = os.path.join(self.pasta, nome)
+            # A data da sessão é a da última parte gravada
+            referencia = os.path.join(caminho, 'parcial') if os.path.isdir(caminho) else caminho
+            try:
+                if os.path.getmtime(referencia if os.path.exists(referencia) else caminho) >= limite:
+                    continue
+                if os.path.isdir(caminho):
+                    shutil.rmtree(caminho)
+                else:
+                    os.remove(caminho)
+                apagadas += 1
+            except FileNotFoundError:
+                continue
+        return apagadas
+
+
+envios = Envios()
@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele só há a variante gzip
+    brotli = None
+
+# Tipos que valem a pena comprimir (imagens e fontes já são comprimidas).
+COMPRIMIVEIS = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+class ArquivoEstatico:
+    __slots__ = ('dados', 'variantes', 'etag', 'mimetype', 'mtime')
+
+    def __init__(self, dados, mimetype, mtime):
+        self.dados = dados
+        self.mimetype = mimetype
+        self.mtime = mtime
+        self.etag = hashlib.sha256(dados).hexdigest()[:32]
+        self.variantes = {}
+        if mimetype.startswith(COMPRIMIVEIS):
+            if brotli is not None:
+                self.variantes['br'] = brotli.compress(dados, quality=11)
+            self.variantes['gzip'] = gzip.compress(dados, compresslevel=9, mtime=0)
+
+
+class ManifestoEstatico:
+    """
+    Índice em memória dos arquivos de static/, montado no primeiro acesso.
+    Cada arquivo é lido uma vez, ganha um ETag forte (hash do conteúdo) e
+    variantes pré-comprimidas em gzip/brotli, de modo que servir index.html
+    ou app.js não toca o disco nem recomprime nada por requisição.
+    A pasta de uploads fica de fora: ela muda em tempo de execução.
+    """
+
+    def __init__(self, pasta, ignorar=('uploads',), recarregar=False):
+        self.pasta = pasta
+        self.ignorar = set(ignorar)
+        self.recarregar = recarregar
+        self.arquivos = None
+
+    def construir(self):
+        arquivos = {}
+        for raiz, diretorios, nomes in os.walk(self.pasta):
+            if raiz == self.pasta:
+                diretorios[:] = [d for d in diretorios if d not in self.ignorar]
+            for nome in nomes:
+                caminho = os.path.join(raiz, nome)
+                chave = os.path.relpath(caminho, self.pasta).replace(os.sep, '/')
+                mimetype = mimetypes.guess_type(nome)[0] or 'application/octet-stream'
+                with open(caminho, 'rb') as arquivo:
+                    arquivos[chave] = ArquivoEstatico(arquivo.read(), mimetype, os.path.getmtime(caminho))
+        self.arquivos = arquivos
+
+    def _desatualizado(self):
+        return any(
+            not os.path.exists(os.path.join(self.pasta, chave))
+            or os.path.getmtime(os.path.join(self.pasta, chave)) != arquivo.mtime
+            for chave, arquivo in self.arquivos.items()
+        )
+
+    def _indice(self):
+        # Montado sob demanda: a compressão em brotli não pesa no boot do worker
+        if self.arquivos is None or (self.recarregar and self._desatualizado()):
+            self.construir()
+        return self.arquivos
+
+    def __contains__(self, caminho):
+        return caminho in self._indice()
+
+    def responder(self, caminho):
+        """Resposta para `caminho` (com 304 quando o ETag confere), ou None se não existir."""
+        arquivo = self._indice().get(caminho)
+        if arquivo is None:
+            return None
+
+        codificacao = next(
+            (c for c in ('br', 'gzip') if c in arquivo.variantes and c in request.accept_encodings),
+            None
+        )
+        etag = f"{arquivo.etag}-{codificacao}" if codificacao else arquivo.etag
+        headers = {
+            'ETag': f'"{etag}"',
+            # Os nomes não têm hash de versão, então o navegador revalida sempre (304 barato)
+            'Cache-Control': 'no-cache',
+            'Vary': 'Accept-Encoding',
+        }
+
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+
+        corpo = arquivo.variantes[codificacao] if codificacao else arquivo.dados
+        if codificacao:
+            headers['Content-Encoding'] = codificacao
+        return Response(corpo, mimetype=arquivo.mimetype, headers=headers)
@@ -0,0 +1,156 @@
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_, and_
+from src.models.user import db
+from src.models.mensagem import EmailPendente
+
+
+class FilaEmail:
+    """
+    Fila persistente de e-mails de saída.
+
+    As rotas apenas gravam um EmailPendente e retornam; threads em segundo
+    plano reservam lotes de mensagens, enviam cada lote por uma única conexão
+    SMTP e reagendam falhas com backoff exponencial. Como a reserva é feita
+    por UPDATE condicional no banco, vários processos do gunicorn podem
+    consumir a mesma fila sem enviar uma mensagem duas vezes.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._acordar = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MAIL_QUEUE_WORKERS', 2)
+        app.config.setdefault('MAIL_QUEUE_BATCH_SIZE', 20)
+        app.config.setdefault('MAIL_QUEUE_MAX_RETRIES', 5)
+        app.config.setdefault('MAIL_QUEUE_RETRY_BASE', 30)
+        app.config.setdefault('MAIL_QUEUE_POLL_INTERVAL', 15)
+        app.config.setdefault('MAIL_QUEUE_RESERVATION_TIMEOUT', 600)
+        self.app = app
+        app.extensions['fila_email'] = self
+        # As threads só sobem no processo que atende requisições, não em comandos da CLI.
+        app.before_request(self.iniciar)
+
+    def iniciar(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for numero in range(self.app.config['MAIL_QUEUE_WORKERS']):
+                thread = threading.Thread(target=self._trabalhar, name=f'fila-email-{numero}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def enfileirar(self, assunto, destinatarios, corpo, remetente=None):
+        """Grava a mensagem na fila e acorda os workers. Deve ser chamado dentro do app."""
+        email = EmailPendente(assunto=assunto, remetente=remetente, corpo=corpo)
+        email.lista_destinatarios = destinatarios
+        db.session.add(email)
+        db.session.commit()
+        self._acordar.set()
+        return email
+
+    def reservar_lote(self):
+        """Marca como 'enviando' até MAIL_QUEUE_BATCH_SIZE mensagens prontas e as retorna."""
+        agora = datetime.utcnow()
+        expirado = agora - timedelta(seconds=self.app.config['MAIL_QUEUE_RESERVATION_TIMEOUT'])
+        disponivel = or_(
+            and_(EmailPendente.status == 'pendente', EmailPendente.proxima_tentativa <= agora),
+            # Reservas antigas de um worker que morreu voltam para a fila
+            and_(EmailPendente.status == 'enviando', EmailPendente.reservado_em < expirado)
+        )
+        candidatos = db.session.query(EmailPendente.id).filter(disponivel)\
+            .order_by(EmailPendente.id).limit(self.app.config['MAIL_QUEUE_BATCH_SIZE']).all()
+
+        reservados = []
+        for (email_id,) in candidatos:
+            resultado = db.session.execute(
+                update(EmailPendente)
+                .where(EmailPendente.id == email_id, disponivel)
+                .values(status='enviando', reservado_em=agora)
+                .execution_options(synchronize_session=False)
+            )
+            if resultado.rowcount == 1:
+                reservados.append(email_id)
+        db.session.commit()
+        if not reservados:
+            return []
+        return EmailPendente.query.filter(EmailPendente.id.in_(reservados)).order_by(EmailPendente.id).all()
+
+    def _mail(self):
+        """Flask-Mail só é importado e configurado quando há algo a enviar."""
+        if 'mail' not in self.app.extensions:
+            from flask_mail import Mail
+            Mail(self.app)
+        return self.app.extensions['mail']
+
+    def processar_lote(self):
+        """Envia um lote pela mesma conexão SMTP. Retorna quantas mensagens foram processadas."""
+        lote = self.reservar_lote()
+        if not lote:
+            return 0
+
+        from flask_mail import Message
+        mail = self._mail()
+        try:
+            with mail.connect() as conexao:
+                for email in lote:
+                    try:
+                        conexao.send(Message(
+                            subject=email.assunto,
+                            sender=email.remetente,
+                            recipients=email.lista_destinatarios,
+                            body=email.corpo
+                        ))
+                        email.status = 'enviado'
+                        email.enviado_em = datetime.utcnow()
+                        email.ultimo_erro = None
+                    except Exception as e:
+                        self._registrar_falha(email, e)
+        except Exception as e:
+            # Falha ao abrir a conexão (ou ao encerrá-la): o que não foi enviado é reagendado
+            for email in lote:
+                if email.status == 'enviando':
+                    self._registrar_falha(email, e)
+        db.session.commit()
+        return len(lote)
+
+    def processar_tudo(self):
+        """Esvazia a fila de forma síncrona (usado pela CLI e em testes)."""
+        total = 0
+        while processados := self.processar_lote():
+            total += processados
+        return total
+
+    def _registrar_falha(self, email, erro):
+        email.tentativas += 1
+        email.ultimo_erro = str(erro)[:1000]
+        if email.tentativas >= self.app.config['MAIL_QUEUE_MAX_RETRIES']:
+            email.status = 'falhou'
+            self.app.logger.error(f"E-mail {email.id} descartado após {email.tentativas} tentativas: {erro}")
+        else:
+            espera = self.app.config['MAIL_QUEUE_RETRY_BASE'] * 2 ** (email.tentativas - 1)
+            email.status = 'pendente'
+            email.proxima_tentativa = datetime.utcnow() + timedelta(seconds=espera)
+
+    def _trabalhar(self):
+        while True:
+            processados = 0
+            with self.app.app_context():
+                try:
+                    processados = self.processar_lote()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Erro ao processar a fila de e-mails')
+            if not processados:
+                self._acordar.wait(self.app.config['MAIL_QUEUE_POLL_INTERVAL'])
+                self._acordar.clear()
+
+
+fila_email = FilaEmail()
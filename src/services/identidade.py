@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from src.models.user import User, db
+
+try:
+    import fcntl
+except ImportError:  # fora do POSIX dois incrementos simultâneos podem gravar o mesmo valor; ambos ainda mudam o contador
+    fcntl = None
+
+Identidade = namedtuple('Identidade', 'id ativo is_admin dados')
+TAMANHO_SINAL = 8
+
+
+class CacheIdentidade:
+    """
+    Cache LRU com TTL da identidade de cada usuário logado (id, ativo,
+    is_admin e o to_dict usado por /auth/me), compartilhado pelos decoradores
+    de autorização. No caminho quente a autorização não vai ao banco.
+
+    Alterações de um usuário chamam invalidar(), que remove a entrada local e
+    incrementa o contador de um arquivo de sinal, regravado no lugar (o
+    arquivo tem sempre TAMANHO_SINAL bytes); os demais processos do gunicorn
+    leem esse contador a cada consulta e esvaziam o próprio cache quando ele
+    muda, então a revogação vale já na requisição seguinte em qualquer worker.
+    O conteúdo, e não o mtime, é o que conta: duas invalidações dentro da
+    mesma marca de tempo do sistema de arquivos dão contadores diferentes.
+    """
+
+    def __init__(self, app=None):
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._versao_sinal = None
+        self._geracao = 0
+        self.capacidade = 1024
+        self.ttl = 60
+        self.arquivo_sinal = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IDENTITY_CACHE_SIZE', 1024)
+        app.config.setdefault('IDENTITY_CACHE_TTL', 60)
+        app.config.setdefault('IDENTITY_CACHE_SIGNAL_FILE', os.path.join(app.instance_path, 'identidade.sinal'))
+        self.capacidade = app.config['IDENTITY_CACHE_SIZE']
+        self.ttl = app.config['IDENTITY_CACHE_TTL']
+        self.arquivo_sinal = app.config['IDENTITY_CACHE_SIGNAL_FILE']
+        app.extensions['cache_identidade'] = self
+
+    def _versao_atual(self):
+        try:
+            descritor = os.open(self.arquivo_sinal, os.O_RDONLY)
+        except (OSError, TypeError):
+            return None
+        try:
+            return os.read(descritor, TAMANHO_SINAL)
+        finally:
+            os.close(descritor)
+
+    def obter(self, user_id):
+        """Identidade do usuário, do cache ou (em caso de falta) do banco. None se não existir."""
+        agora = time.monotonic()
+        versao = self._versao_atual()
+        with self._lock:
+            if versao != self._versao_sinal:
+                self._entradas.clear()
+                self._versao_sinal = versao
+            geracao = self._geracao
+            entrada = self._entradas.get(user_id)
+            if entrada is not None and entrada[0] > agora:
+                self._entradas.move_to_end(user_id)
+                return entrada[1]
+
+        user = db.session.get(User, user_id)
+        identidade = Identidade(user.id, user.ativo, user.is_admin, user.to_dict()) if user else None
+        with self._lock:
+            if versao != self._versao_sinal or geracao != self._geracao:
+                # Invalidação durante a leitura: o que veio do banco pode ser anterior a ela
+                return identidade
+            self._entradas[user_id] = (agora + self.ttl, identidade)
+            self._entradas.move_to_end(user_id)
+            while len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+        return identidade
+
+    def invalidar(self, user_id):
+        with self._lock:
+            self._entradas.pop(user_id, None)
+            self._geracao += 1
+        if self.arquivo_sinal:
+            self._avancar_sinal()
+
+    def _avancar_sinal(self):
+        os.makedirs(os.path.dirname(self.arquivo_sinal), exist_ok=True)
+        descritor = os.open(self.arquivo_sinal, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                # Invalidações simultâneas em workers diferentes: um incremento de cada vez
+                fcntl.flock(descritor, fcntl.LOCK_EX)
+            contador = int.from_bytes(os.read(descritor, TAMANHO_SINAL), 'big')
+            os.lseek(descritor, 0, os.SEEK_SET)
+            os.write(descritor, ((contador + 1) % 2 ** (8 * TAMANHO_SINAL)).to_bytes(TAMANHO_SINAL, 'big'))
+            # Arquivos do formato antigo (um byte por invalidação) voltam ao tamanho fixo
+            os.ftruncate(descritor, TAMANHO_SINAL)
+        finally:
+            os.close(descritor)
+
+
+cache_identidade = CacheIdentidade()
@@ -0,0 +1,187 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TempoEsgotado
+from concurrent.futures.process import BrokenProcessPool
+
+# Lado maior, em pixels, de cada variante gerada para uma foto.
+TAMANHO_ORIGINAL = 2048
+MINIATURAS = {'p': 200, 'm': 640}
+QUALIDADE_JPEG = 85
+EXTENSAO = 'jpg'
+# Os processos do pool não nascem de um fork do worker web, que carrega threads,
+# locks e conexões abertas: o forkserver (ou o spawn) parte de um processo limpo
+METODO_INICIO = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+_pool = None
+_pool_lock = threading.RLock()
+_pendentes = {}
+
+
+class FalhaProcessamento(Exception):
+    """A foto não pôde ser processada; os arquivos parciais já foram apagados."""
+
+
+class ProcessamentoDemorado(FalhaProcessamento):
+    """O processamento não terminou no prazo; ele continua e um novo envio o aproveita."""
+
+
+def nome_arquivo(nome_base, tamanho=None):
+    return f"{nome_base}_{tamanho}.{EXTENSAO}" if tamanho else f"{nome_base}.{EXTENSAO}"
+
+
+def hash_conteudo(dados):
+    return hashlib.sha256(dados).hexdigest()
+
+
+def _abrir(origem):
+    """A foto em memória (bytes) ou já gravada em disco (caminho, no upload retomável)."""
+    from PIL import Image  # Pillow só é carregado no primeiro upload
+    return Image.open(io.BytesIO(origem) if isinstance(origem, bytes) else origem)
+
+
+def validar_imagem(origem):
+    """Confere só o cabeçalho, sem decodificar a imagem inteira. Lança exceção se inválida."""
+    with _abrir(origem) as imagem:
+        imagem.verify()
+
+
+def _salvar(imagem, caminho):
+    temporario = f"{caminho}.tmp"
+    # Sem o parâmetro exif o JPEG é gravado sem metadados (GPS, câmera etc.)
+    imagem.save(temporario, 'JPEG', quality=QUALIDADE_JPEG, optimize=True, progressive=True)
+    os.replace(temporario, caminho)
+
+
+def processar_imagem(origem, pasta, nome_base):
+    """
+    Decodifica a foto, aplica a rotação do EXIF, descarta os metadados e grava
+    o original reduzido a TAMANHO_ORIGINAL mais uma miniatura por entrada de
+    MINIATURAS. Roda em um processo do pool, fora do processo web.
+    """
+    from PIL import Image, ImageOps
+    try:
+        with _abrir(origem) as imagem:
+            imagem = ImageOps.exif_transpose(imagem)
+            if imagem.mode in ('RGBA', 'LA', 'P'):
+                imagem = imagem.convert('RGBA')
+                fundo = Image.new('RGB', imagem.size, (255, 255, 255))
+                fundo.paste(imagem, mask=imagem.getchannel('A'))
+                imagem = fundo
+            elif imagem.mode != 'RGB':
+                imagem = imagem.convert('RGB')
+
+            imagem.thumbnail((TAMANHO_ORIGINAL, TAMANHO_ORIGINAL), Image.LANCZOS)
+            for tamanho, lado in sorted(MINIATURAS.items(), key=lambda item: -item[1]):
+                miniatura = imagem.copy()
+                miniatura.thumbnail((lado, lado), Image.LANCZOS)
+                _salvar(miniatura, os.path.join(pasta, nome_arquivo(nome_base, tamanho)))
+            # O original é gravado por último: a existência dele indica processamento concluído
+            _salvar(imagem, os.path.join(pasta, nome_arquivo(nome_base)))
+    except Exception:
+        # Nada de miniaturas sem original (nem .tmp) para trás
+        _apagar_variantes(pasta, nome_base)
+        raise
+    return nome_arquivo(nome_base)
+
+
+def _apagar_variantes(pasta, nome_base):
+    for nome in [nome_arquivo(nome_base, tamanho) for tamanho in MINIATURAS] + [nome_arquivo(nome_base)]:
+        for caminho in (os.path.join(pasta, nome), os.path.join(pasta, f"{nome}.tmp")):
+            _descartar(caminho)
+
+
+def _obter_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(METODO_INICIO))
+        return _pool
+
+
+def _submeter(workers, *args):
+    """Agenda no pool; um pool quebrado (processo morto, por falta de memória por exemplo) é recriado."""
+    global _pool
+    with _pool_lock:
+        try:
+            return _obter_pool(workers).submit(processar_imagem, *args)
+        except BrokenProcessPool:
+            _pool.shutdown(wait=False)
+            _pool = None
+            return _obter_pool(workers).submit(processar_imagem, *args)
+
+
+def enviar_para_processamento(dados, pasta, workers=2, timeout=30):
+    """
+    Processa a foto no pool de processos e retorna o nome final do arquivo
+    quando o original e as miniaturas estão gravados. Fotos idênticas (mesmo
+    SHA-256) são processadas uma única vez: se o arquivo já existe, nada é
+    refeito, e se já está na fila, espera-se pelo mesmo processamento.
+    Lança FalhaProcessamento (ou ProcessamentoDemorado, após `timeout` segundos).
+    """
+    return _processar(dados, pasta, hash_conteudo(dados), workers, timeout)
+
+
+def enviar_arquivo_para_processamento(caminho, nome_base, pasta, workers=2, timeout=30):
+    """
+    Como enviar_para_processamento, para uma foto já em disco (upload
+    retomável) cujo SHA-256 é `nome_base`: o processo do pool lê o arquivo,
+    sem que ele passe pela memória do processo web, e ele é apagado ao fim.
+    """
+    return _processar(caminho, pasta, nome_base, workers, timeout, descartar=caminho)
+
+
+def _descartar(caminho):
+    if caminho:
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+
+def _processar(origem, pasta, nome_base, workers, timeout, descartar=None):
+    nome = nome_arquivo(nome_base)
+    if os.path.exists(os.path.join(pasta, nome)):
+        _descartar(descartar)
+        return nome
+    with _pool_lock:
+        futuro = _pendentes.get(nome)
+        novo = futuro is None
+        if novo:
+            futuro = _submeter(workers, origem, pasta, nome_base)
+            _pendentes[nome] = futuro
+    if novo:
+        def concluido(_):
+            _pendentes.pop(nome, None)
+            _descartar(descartar)
+        futuro.add_done_callback(concluido)
+    else:
+        _descartar(descartar)
+
+    try:
+        futuro.result(timeout=timeout)
+    except TempoEsgotado:
+        raise ProcessamentoDemorado('A foto ainda está sendo processada. Tente novamente em instantes.')
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            # O processo morreu no meio: o que ele gravou fica incompleto
+            _apagar_variantes(pasta, nome_base)
+        raise FalhaProcessamento('A foto não pôde ser processada.') from e
+    return nome
+
+
+def aguardar_processamento(nome, timeout=30):
+    """
+    Se `nome` ainda está sendo processado neste processo, espera terminar.
+    Retorna False se o processamento falhou ou excedeu o tempo.
+    """
+    futuro = _pendentes.get(nome)
+    if futuro is None:
+        return True
+    try:
+        futuro.result(timeout=timeout)
+        return True
+    except Exception:
+        return False
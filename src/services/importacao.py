@@ -0,0 +1,246 @@
+import csv
+import io
+import json
+import math
+import zipfile
+from datetime import datetime, timezone
+from itertools import islice
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db
+from src.models.ninho import Ninho
+
+LOTE_IMPORTACAO = 1000
+TAMANHO_ID_CLIENTE = 64
+CAMPOS_OBRIGATORIOS = ('regiao', 'quantidade_ovos', 'status', 'risco', 'dias_para_eclosao')
+VERDADEIROS = {'true', '1', 'sim', 's', 'yes'}
+
+
+class ArquivoInvalido(ValueError):
+    """O arquivo não pôde ser lido: corrompido, em outra codificação ou fora do formato."""
+
+
+class ImportacaoInterrompida(ArquivoInvalido):
+    """O arquivo ficou ilegível no meio: `relatorio` traz o que já foi gravado e a linha da falha."""
+
+    def __init__(self, mensagem, relatorio):
+        super().__init__(mensagem)
+        self.relatorio = relatorio
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor).strip()
+
+
+def validar_linha(dados):
+    """
+    Converte uma linha (dict vinda de JSON, CSV ou XLSX) nos valores de um
+    Ninho. Levanta ValueError com a mensagem para o relatório de erros.
+    """
+    if not isinstance(dados, dict):
+        raise ValueError('Cada ninho deve ser um objeto.')
+    faltando = [campo for campo in CAMPOS_OBRIGATORIOS if _texto(dados.get(campo)) == '']
+    if faltando:
+        raise ValueError(f"Campos obrigatórios ausentes: {', '.join(faltando)}.")
+
+    valores = {
+        'regiao': _texto(dados['regiao'])[:100],
+        'status': _texto(dados['status'])[:20],
+        'risco': _texto(dados['risco'])[:20],
+        'predadores': _texto(dados.get('predadores')).lower() in VERDADEIROS,
+        'foto_path': _texto(dados.get('foto_path')) or None,
+    }
+    for campo in ('quantidade_ovos', 'dias_para_eclosao'):
+        try:
+            # "inf" e "nan" passam pelo float(), mas não são quantidades (int() levantaria OverflowError)
+            numero = float(_texto(dados[campo]))
+            if not math.isfinite(numero):
+                raise ValueError
+            valores[campo] = int(numero)
+        except (ValueError, OverflowError):
+            raise ValueError(f"O campo '{campo}' deve ser um número inteiro.")
+        if valores[campo] < 0:
+            raise ValueError(f"O campo '{campo}' não pode ser negativo.")
+    for campo, limite in (('latitude', 90), ('longitude', 180)):
+        texto = _texto(dados.get(campo))
+        try:
+            valores[campo] = float(texto) if texto else None
+        except ValueError:
+            raise ValueError(f"O campo '{campo}' deve ser numérico.")
+        if valores[campo] is not None and not math.isfinite(valores[campo]):
+            raise ValueError(f"O campo '{campo}' deve ser numérico.")
+        if valores[campo] is not None and not -limite <= valores[campo] <= limite:
+            raise ValueError(f"O campo '{campo}' deve estar entre -{limite} e {limite}.")
+
+    data_registro = dados.get('data_registro')
+    if not isinstance(data_registro, datetime) and _texto(data_registro):
+        try:
+            data_registro = datetime.fromisoformat(_texto(data_registro).replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError("O campo 'data_registro' deve estar no formato ISO 8601.")
+    if isinstance(data_registro, datetime):
+        # Gravada em UTC sem fuso, como o datetime.utcnow() dos ninhos criados pela API
+        if data_registro.tzinfo is not None:
+            data_registro = data_registro.astimezone(timezone.utc).replace(tzinfo=None)
+        valores['data_registro'] = data_registro
+
+    id_cliente = _texto(dados.get('id_cliente'))
+    if len(id_cliente) > TAMANHO_ID_CLIENTE:
+        raise ValueError(f"O campo 'id_cliente' deve ter no máximo {TAMANHO_ID_CLIENTE} caracteres.")
+    valores['id_cliente'] = id_cliente or None
+    return valores
+
+
+def ler_json(conteudo):
+    """Aceita uma lista de ninhos ou um objeto {"ninhos": [...]}."""
+    try:
+        dados = json.loads(conteudo) if isinstance(conteudo, (str, bytes)) else conteudo
+    except ValueError as e:
+        raise ArquivoInvalido(f'JSON inválido: {e}') from e
+    if isinstance(dados, dict):
+        dados = dados.get('ninhos')
+    if not isinstance(dados, list):
+        raise ValueError('Envie uma lista de ninhos ou um objeto {"ninhos": [...]}.')
+    return iter(dados)
+
+
+def _ler(linhas, formato, erros):
+    """Repassa as linhas trocando os erros de leitura do formato por ArquivoInvalido."""
+    try:
+        yield from linhas
+    except erros as e:
+        raise ArquivoInvalido(f'{formato} ilegível: {e}') from e
+
+
+def ler_csv(arquivo):
+    """Lê o CSV linha a linha; a primeira linha traz os nomes dos campos."""
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    return _ler(csv.DictReader(texto), 'CSV', (csv.Error, UnicodeDecodeError))
+
+
+def ler_xlsx(arquivo):
+    """Lê a primeira planilha em modo read-only; a primeira linha traz os nomes dos campos."""
+    from openpyxl import load_workbook
+    try:
+        planilha = load_workbook(arquivo, read_only=True, data_only=True).worksheets[0]
+    except Exception as e:  # zip corrompido, XML inválido, planilha sem abas...
+        raise ArquivoInvalido(f'Planilha ilegível: {e}') from e
+    return _ler(_linhas_xlsx(planilha), 'Planilha', (zipfile.BadZipFile, KeyError, ValueError, SyntaxError))
+
+
+def _linhas_xlsx(planilha):
+    linhas = planilha.iter_rows(values_only=True)
+    cabecalho = [_texto(celula) for celula in next(linhas, ())]
+    for linha in linhas:
+        if any(celula is not None for celula in linha):
+            yield dict(zip(cabecalho, linha))
+
+
+def ler_arquivo(arquivo, nome):
+    extensao = nome.rsplit('.', 1)[-1].lower() if '.' in nome else ''
+    if extensao == 'csv':
+        return ler_csv(arquivo)
+    if extensao == 'xlsx':
+        return ler_xlsx(arquivo)
+    if extensao == 'json':
+        return ler_json(arquivo.read())
+    raise ValueError('Formato não suportado. Use .json, .csv ou .xlsx.')
+
+
+def _gravar_lote(validos, usuario_id):
+    """
+    Grava um lote em uma transação e retorna quantos ninhos foram inseridos e
+    quantos já existiam. Usa add_all (o flush do SQLAlchemy agrupa os INSERTs
+    em executemany) para que os listeners de estatísticas, ranking e mapa
+    continuem recebendo cada ninho novo.
+    """
+    ids_cliente = [valores['id_cliente'] for _, valores in validos if valores['id_cliente']]
+    existentes = set()
+    if ids_cliente:
+        existentes = {id_cliente for (id_cliente,) in db.session.query(Ninho.id_cliente).filter(
+            Ninho.usuario_id == usuario_id, Ninho.id_cliente.in_(ids_cliente)
+        )}
+
+    novos, vistos = [], set()
+    for _, valores in validos:
+        id_cliente = valores['id_cliente']
+        if id_cliente in existentes or id_cliente in vistos:
+            continue
+        if id_cliente:
+            vistos.add(id_cliente)
+        novos.append(Ninho(usuario_id=usuario_id, **valores))
+
+    db.session.add_all(novos)
+    db.session.commit()
+    return len(novos), len(validos) - len(novos)
+
+
+def _gravar_um_a_um(validos, usuario_id):
+    """
+    Grava o lote ninho a ninho, cada um em um savepoint, depois que um
+    reenvio concorrente gravou alguns dos id_cliente: os que conflitam contam
+    como ignorados, os demais são inseridos.
+    """
+    inseridos = 0
+    for _, valores in validos:
+        try:
+            with db.session.begin_nested():
+                db.session.add(Ninho(usuario_id=usuario_id, **valores))
+            inseridos += 1
+        except IntegrityError:
+            pass
+    db.session.commit()
+    return inseridos, len(validos) - inseridos
+
+
+def importar_ninhos(linhas, usuario_id, lote=LOTE_IMPORTACAO):
+    """
+    Importa os ninhos de `linhas` (iterável de dicts) para o usuário, em
+    transações de até `lote` linhas. Linhas inválidas entram no relatório sem
+    interromper a importação; linhas cujo id_cliente já foi importado por
+    este usuário são ignoradas, então reenviar o mesmo arquivo é seguro. Se o
+    arquivo fica ilegível no meio, as linhas anteriores são gravadas e
+    ImportacaoInterrompida traz o relatório com a linha da falha.
+    """
+    relatorio = {'inseridos': 0, 'ignorados': 0, 'erros': []}
+    numeradas = enumerate(linhas, 1)
+    lidas = 0
+    while True:
+        bloco, falha = [], None
+        try:
+            for item in islice(numeradas, lote):
+                bloco.append(item)
+        except ArquivoInvalido as e:
+            # As linhas lidas antes da falha ainda são gravadas
+            falha = e
+        if not bloco and falha is None:
+            return relatorio
+        lidas += len(bloco)
+
+        validos = []
+        for numero, dados in bloco:
+            try:
+                validos.append((numero, validar_linha(dados)))
+            except ValueError as e:
+                id_cliente = dados.get('id_cliente') if isinstance(dados, dict) else None
+                relatorio['erros'].append({'linha': numero, 'id_cliente': id_cliente, 'erro': str(e)})
+        if not validos:
+            _interromper(relatorio, falha, lidas)
+            continue
+
+        try:
+            inseridos, ignorados = _gravar_lote(validos, usuario_id)
+        except IntegrityError:
+            # Outra requisição (um reenvio concorrente) gravou alguns destes
+            # id_cliente entre a consulta e o commit
+            db.session.rollback()
+            inseridos, ignorados = _gravar_um_a_um(validos, usuario_id)
+        relatorio['inseridos'] += inseridos
+        relatorio['ignorados'] += ignorados
+        _interromper(relatorio, falha, lidas)
+
+
+def _interromper(relatorio, falha, lidas):
+    """Depois de gravar o que foi lido, encerra a importação se a leitura falhou."""
+    if falha is not None:
+        relatorio['erros'].append({'linha': lidas + 1, 'id_cliente': None, 'erro': str(falha)})
+        raise ImportacaoInterrompida(str(falha), relatorio)
@@ -0,0 +1,226 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict, namedtuple
+from functools import wraps
+from flask import current_app, jsonify, request, session
+
+# Baldes parados há mais que isso estão cheios em qualquer regra e podem ser apagados
+LIMPEZA_SEGUNDOS = 3600
+LIMPEZA_A_CADA = 1000
+
+
+class Regra(namedtuple('Regra', 'por_minuto rajada simultaneas')):
+    """
+    Fichas repostas por minuto e tamanho do balde (a rajada aceita de uma
+    vez), para cada IP e cada usuário logado; e requisições da rota em
+    andamento ao mesmo tempo em cada processo.
+    """
+
+
+REGRAS_PADRAO = {
+    # scrypt a cada tentativa (src/services/senhas.py)
+    'login': Regra(20, 10, 4),
+    'register': Regra(5, 5, 2),
+    # só gravam na fila de e-mails: o limite é contra abuso, não contra custo
+    'forgot-password': Regra(5, 3, 4),
+    'contact': Regra(5, 3, 4),
+    # corpos de até 16 MB e processamento das imagens
+    'upload': Regra(30, 10, 4),
+    # partes do upload retomável: muitas por foto, mas cada uma segura um worker enquanto chega
+    'upload-parte': Regra(600, 100, 8),
+    # planilha com a tabela inteira
+    'export': Regra(6, 2, 1),
+    # segundos de cálculo quando a resposta não está no cache
+    'tendencias': Regra(30, 10, 2),
+}
+
+
+class BaldesMemoria:
+    """Baldes no processo: {chave: (fichas, atualizado)}. Cada worker limita por conta própria."""
+
+    def __init__(self):
+        self._baldes = {}
+        self._lock = threading.Lock()
+
+    def consumir(self, chave, capacidade, taxa, agora):
+        with self._lock:
+            fichas, atualizado = self._baldes.get(chave, (capacidade, agora))
+            fichas = min(capacidade, fichas + max(agora - atualizado, 0) * taxa)
+            aceito = fichas >= 1
+            self._baldes[chave] = (fichas - aceito, agora)
+            return aceito, fichas - aceito
+
+    def limpar(self, antes):
+        with self._lock:
+            for chave in [chave for chave, (_, atualizado) in self._baldes.items() if atualizado < antes]:
+                del self._baldes[chave]
+
+
+class BaldesSQLite:
+    """
+    Baldes em um arquivo SQLite local, compartilhados pelos workers do
+    gunicorn da mesma máquina: o limite vale para o servidor, não para cada
+    processo. Repor e consumir é um único UPSERT, atômico entre processos.
+    """
+
+    CONSUMIR = '''
+        INSERT INTO balde (chave, fichas, atualizado, aceito) VALUES (:chave, :capacidade - 1, :agora, 1)
+        ON CONFLICT (chave) DO UPDATE SET
+            aceito = min(:capacidade, fichas + max(:agora - atualizado, 0) * :taxa) >= 1,
+            fichas = min(:capacidade, fichas + max(:agora - atualizado, 0) * :taxa)
+                     - (min(:capacidade, fichas + max(:agora - atualizado, 0) * :taxa) >= 1),
+            atualizado = :agora
+        RETURNING aceito, fichas
+    '''
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+
+    def _conexao(self):
+        # Aberta na primeira requisição limitada de cada thread, não ao importar o app
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            conn = sqlite3.connect(self.caminho, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS balde (chave TEXT PRIMARY KEY, fichas REAL NOT NULL, '
+                         'atualizado REAL NOT NULL, aceito INTEGER NOT NULL)')
+            self._local.conn = conn
+        return conn
+
+    def consumir(self, chave, capacidade, taxa, agora):
+        try:
+            aceito, fichas = self._conexao().execute(self.CONSUMIR, {
+                'chave': chave, 'capacidade': capacidade, 'taxa': taxa, 'agora': agora,
+            }).fetchone()
+        except sqlite3.OperationalError:
+            # Arquivo ocupado por outro worker além do timeout: na dúvida, a requisição passa
+            return True, 0
+        return bool(aceito), fichas
+
+    def limpar(self, antes):
+        try:
+            self._conexao().execute('DELETE FROM balde WHERE atualizado < ?', (antes,))
+        except sqlite3.OperationalError:
+            pass
+
+
+class Limitador:
+    """
+    Controle de admissão das rotas caras: cada rota decorada com
+    limitar(nome) tem um balde de fichas por IP e outro por usuário logado
+    (429 com Retry-After quando algum está vazio) e um teto de requisições
+    simultâneas por processo (503 imediato, sem fila). As rejeições são
+    contadas por regra e motivo para as métricas.
+
+    RATE_LIMIT_BACKEND escolhe onde ficam os baldes: 'sqlite' (arquivo
+    compartilhado entre os workers, padrão) ou 'memoria' (por processo).
+    RATE_LIMITS ajusta as regras: {'login': {'por_minuto': 30}, ...}.
+    """
+
+    def __init__(self, app=None):
+        self.ativo = True
+        self.regras = dict(REGRAS_PADRAO)
+        self.backend = BaldesMemoria()
+        self.rejeicoes = defaultdict(int)
+        self._em_andamento = defaultdict(int)
+        self._chamadas = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_ENABLED', True)
+        app.config.setdefault('RATE_LIMIT_BACKEND', 'sqlite')
+        app.config.setdefault('RATE_LIMIT_PATH', os.path.join(app.instance_path, 'limites.db'))
+        app.config.setdefault('RATE_LIMITS', {})
+        self.ativo = app.config['RATE_LIMIT_ENABLED']
+        self.regras = dict(REGRAS_PADRAO)
+        for nome, valores in app.config['RATE_LIMITS'].items():
+            self.regras[nome] = self.regras.get(nome, Regra(60, 60, 8))._replace(**valores)
+        if app.config['RATE_LIMIT_BACKEND'] == 'sqlite':
+            self.backend = BaldesSQLite(app.config['RATE_LIMIT_PATH'])
+        else:
+            self.backend = BaldesMemoria()
+        app.extensions['limites'] = self
+
+    def _espera(self, nome, regra):
+        """Consome uma ficha dos baldes do IP e do usuário; segundos até a próxima ficha se algum estiver vazio."""
+        agora = time.time()
+        taxa = regra.por_minuto / 60
+        chaves = [f'{nome}:ip:{request.remote_addr}']
+        if 'user_id' in session:
+            chaves.append(f'{nome}:usuario:{session["user_id"]}')
+        for chave in chaves:
+            aceito, fichas = self.backend.consumir(chave, regra.rajada, taxa, agora)
+            if not aceito:
+                return max(1, math.ceil((1 - fichas) / taxa))
+        with self._lock:
+            self._chamadas += 1
+            limpar = self._chamadas % LIMPEZA_A_CADA == 0
+        if limpar:
+            self.backend.limpar(agora - LIMPEZA_SEGUNDOS)
+        return None
+
+    def _rejeitar(self, nome, motivo, status, mensagem, espera):
+        with self._lock:
+            self.rejeicoes[(nome, motivo)] += 1
+        return jsonify({'error': mensagem}), status, {'Retry-After': str(espera)}
+
+    def _liberar(self, nome):
+        with self._lock:
+            self._em_andamento[nome] -= 1
+
+    def limitar(self, nome):
+        """Decorador de rota. Abaixo de login_required/admin_required, para o balde do usuário valer."""
+        def decorador(view):
+            @wraps(view)
+            def decorada(*args, **kwargs):
+                if not self.ativo:
+                    return view(*args, **kwargs)
+                regra = self.regras[nome]
+                espera = self._espera(nome, regra)
+                if espera:
+                    return self._rejeitar(nome, 'taxa', 429, 'Muitas requisições; tente novamente mais tarde.', espera)
+                with self._lock:
+                    livre = self._em_andamento[nome] < regra.simultaneas
+                    if livre:
+                        self._em_andamento[nome] += 1
+                if not livre:
+                    return self._rejeitar(nome, 'simultaneas', 503, 'Servidor ocupado; tente novamente em instantes.', 1)
+                try:
+                    resposta = current_app.make_response(view(*args, **kwargs))
+                except BaseException:
+                    self._liberar(nome)
+                    raise
+                if resposta.is_streamed:
+                    # Exportações continuam trabalhando enquanto enviam: a vaga só volta no fim do envio
+                    resposta.call_on_close(lambda: self._liberar(nome))
+                else:
+                    self._liberar(nome)
+                return resposta
+            return decorada
+        return decorador
+
+    def estado(self):
+        with self._lock:
+            return {
+                'ativo': self.ativo,
+                'backend': type(self.backend).__name__,
+                'regras': {nome: regra._asdict() for nome, regra in self.regras.items()},
+                'em_andamento': {nome: self._em_andamento[nome] for nome in self.regras},
+                'rejeicoes': [{'regra': nome, 'motivo': motivo, 'quantidade': quantidade}
+                              for (nome, motivo), quantidade in sorted(self.rejeicoes.items())],
+            }
+
+    def limpar_contadores(self):
+        with self._lock:
+            self.rejeicoes.clear()
+
+
+limitador = Limitador()
@@ -0,0 +1,174 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Limites (em segundos) dos baldes do histograma de latência
+BALDES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_SQL_AMOSTRA = 50
+
+
+def _numero(valor):
+    """
+    Valor no formato de exposição do Prometheus: contagens como inteiros e
+    tempos com a precisão toda do float (repr), sem arredondar contadores
+    grandes para notação científica.
+    """
+    if isinstance(valor, (bool, int)):
+        return str(int(valor))
+    valor = float(valor)
+    if math.isnan(valor):
+        return 'NaN'
+    if math.isinf(valor):
+        return '+Inf' if valor > 0 else '-Inf'
+    return repr(valor)
+
+
+class EstatisticaRota:
+    __slots__ = ('baldes', 'contagem', 'soma', 'consultas', 'tempo_sql', 'bytes', 'por_status')
+
+    def __init__(self):
+        self.baldes = [0] * (len(BALDES_LATENCIA) + 1)
+        self.contagem = 0
+        self.soma = 0.0
+        self.consultas = 0
+        self.tempo_sql = 0.0
+        self.bytes = 0
+        self.por_status = defaultdict(int)
+
+
+class Metricas:
+    """
+    Instrumentação do caminho quente, por rota (regra do Flask) e método:
+    histograma de latência, número de comandos SQL e tempo gasto no banco
+    (eventos do engine do SQLAlchemy), bytes de resposta e status. Requisições
+    acima de METRICS_SLOW_REQUEST_MS guardam uma amostra com os SQL executados.
+
+    Os números são do processo; o endpoint de métricas de cada worker é
+    coletado separadamente (como faz o Prometheus com múltiplos alvos).
+    """
+
+    def __init__(self, app=None):
+        self.ativo = True
+        self.limite_lenta = 0.5
+        self._rotas = defaultdict(EstatisticaRota)
+        self._lentas = deque(maxlen=20)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_SLOW_REQUEST_MS', 500)
+        self.ativo = app.config['METRICS_ENABLED']
+        self.limite_lenta = app.config['METRICS_SLOW_REQUEST_MS'] / 1000
+        app.before_request(self._inicio)
+        app.after_request(self._fim)
+        event.listen(Engine, 'before_cursor_execute', self._antes_sql)
+        event.listen(Engine, 'after_cursor_execute', self._depois_sql)
+        app.extensions['metricas'] = self
+
+    def _inicio(self):
+        if self.ativo:
+            g.metricas_inicio = time.perf_counter()
+            g.metricas_sql = [0, 0.0, []]
+
+    def _antes_sql(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'metricas_sql' in g:
+            context.metricas_inicio = time.perf_counter()
+
+    def _depois_sql(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'metricas_sql' in g and hasattr(context, 'metricas_inicio'):
+            sql = g.metricas_sql
+            sql[0] += 1
+            sql[1] += time.perf_counter() - context.metricas_inicio
+            if len(sql[2]) < MAX_SQL_AMOSTRA:
+                sql[2].append(statement)
+
+    def _fim(self, resposta):
+        inicio = g.pop('metricas_inicio', None)
+        sql = g.pop('metricas_sql', None)
+        if inicio is None:
+            return resposta
+        duracao = time.perf_counter() - inicio
+        rota = request.url_rule.rule if request.url_rule else '<sem rota>'
+        chave = (rota, request.method)
+        tamanho = resposta.content_length if not resposta.is_streamed else None
+
+        with self._lock:
+            estatistica = self._rotas[chave]
+            estatistica.baldes[bisect_left(BALDES_LATENCIA, duracao)] += 1
+            estatistica.contagem += 1
+            estatistica.soma += duracao
+            estatistica.consultas += sql[0]
+            estatistica.tempo_sql += sql[1]
+            estatistica.bytes += tamanho or 0
+            estatistica.por_status[resposta.status_code] += 1
+            if duracao >= self.limite_lenta:
+                self._lentas.append({
+                    'rota': rota, 'metodo': request.method, 'caminho': request.full_path,
+                    'status': resposta.status_code, 'duracao_ms': round(duracao * 1000, 1),
+                    'consultas': sql[0], 'tempo_sql_ms': round(sql[1] * 1000, 1), 'sql': sql[2],
+                    'quando': time.time(),
+                })
+        return resposta
+
+    def lentas(self):
+        with self._lock:
+            return list(self._lentas)
+
+    def limpar(self):
+        with self._lock:
+            self._rotas.clear()
+            self._lentas.clear()
+
+    def prometheus(self, extras=()):
+        """Métricas no formato texto do Prometheus. `extras` são linhas (nome, rótulos, valor) de gauges."""
+        with self._lock:
+            rotas = {chave: (list(e.baldes), e.contagem, e.soma, e.consultas, e.tempo_sql, e.bytes, dict(e.por_status))
+                     for chave, e in self._rotas.items()}
+
+        linhas = [
+            '# HELP http_request_duration_seconds Latência das requisições por rota.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for (rota, metodo), (baldes, contagem, soma, *_) in sorted(rotas.items()):
+            rotulos = f'rota="{rota}",metodo="{metodo}"'
+            acumulado = 0
+            for limite, quantidade in zip(BALDES_LATENCIA + ('+Inf',), baldes):
+                acumulado += quantidade
+                linhas.append(f'http_request_duration_seconds_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+            linhas.append(f'http_request_duration_seconds_sum{{{rotulos}}} {_numero(soma)}')
+            linhas.append(f'http_request_duration_seconds_count{{{rotulos}}} {contagem}')
+
+        contadores = (
+            ('http_requests_total', 'Requisições por rota e status.', None),
+            ('db_queries_total', 'Comandos SQL executados por rota.', 3),
+            ('db_time_seconds_total', 'Tempo gasto no banco por rota.', 4),
+            ('http_response_bytes_total', 'Bytes de corpo enviados por rota (respostas não streamed).', 5),
+        )
+        for nome, ajuda, indice in contadores:
+            linhas += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} counter']
+            for (rota, metodo), valores in sorted(rotas.items()):
+                rotulos = f'rota="{rota}",metodo="{metodo}"'
+                if indice is None:
+                    for status, quantidade in sorted(valores[6].items()):
+                        linhas.append(f'{nome}{{{rotulos},status="{status}"}} {quantidade}')
+                else:
+                    linhas.append(f'{nome}{{{rotulos}}} {_numero(valores[indice])}')
+
+        nomes_extras = set()
+        for nome, rotulos, valor in extras:
+            if nome not in nomes_extras:
+                linhas.append(f'# TYPE {nome} gauge')
+                nomes_extras.add(nome)
+            rotulos = ','.join(f'{chave}="{v}"' for chave, v in rotulos.items())
+            linhas.append(f'{nome}{{{rotulos}}} {_numero(valor)}' if rotulos else f'{nome} {_numero(valor)}')
+        return '\n'.join(linhas) + '\n'
+
+
+metricas = Metricas()
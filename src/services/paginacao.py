@@ -0,0 +1,88 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+from src.models.ninho import Ninho
+from src.models.serializacao import (
+    CAMPOS_NINHO, CAMPOS_NINHO_PADRAO, consultar_ninhos, linha_para_dict, linhas_para_colunas
+)
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+FORMATOS = ('rows', 'columnar')
+
+
+class ParametroInvalido(ValueError):
+    """Parâmetro de paginação ou projeção inválido (responde 400)."""
+
+
+def codificar_cursor(data_registro, ninho_id):
+    bruto = json.dumps([data_registro.isoformat(), ninho_id]).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data_registro, ninho_id = json.loads(bruto)
+        return datetime.fromisoformat(data_registro), int(ninho_id)
+    except (ValueError, TypeError):
+        raise ParametroInvalido('Cursor inválido.')
+
+
+def ler_parametros(args):
+    """Lê limit, cursor, fields e format da query string."""
+    try:
+        limite = int(args.get('limit', LIMITE_PADRAO))
+    except ValueError:
+        raise ParametroInvalido('O parâmetro limit deve ser um número.')
+    if not 1 <= limite <= LIMITE_MAXIMO:
+        raise ParametroInvalido(f'O parâmetro limit deve estar entre 1 e {LIMITE_MAXIMO}.')
+
+    cursor = args.get('cursor')
+    posicao = decodificar_cursor(cursor) if cursor else None
+
+    campos = CAMPOS_NINHO_PADRAO
+    if args.get('fields'):
+        campos = [campo.strip() for campo in args['fields'].split(',') if campo.strip()]
+        desconhecidos = [campo for campo in campos if campo not in CAMPOS_NINHO]
+        if desconhecidos:
+            raise ParametroInvalido(f"Campos desconhecidos: {', '.join(desconhecidos)}.")
+
+    formato = args.get('format') or 'rows'
+    if formato not in FORMATOS:
+        raise ParametroInvalido(f"O parâmetro format deve ser {' ou '.join(FORMATOS)}.")
+    return limite, posicao, campos, formato
+
+
+def consulta_pagina(campos, posicao, limite, *filtros):
+    """Consulta de uma página a partir de `posicao` ((data_registro, id) do último item visto)."""
+    query = consultar_ninhos(campos, Ninho.id.label('chave_id'), Ninho.data_registro.label('chave_data'))
+    query = query.filter(*filtros)
+    if posicao:
+        # Comparação de row values: vira uma busca por faixa no índice (SEARCH), enquanto
+        # o equivalente com OR faz o SQLite percorrer o índice desde o começo a cada página
+        query = query.filter(tuple_(Ninho.data_registro, Ninho.id) < tuple_(*posicao))
+    return query.order_by(Ninho.data_registro.desc(), Ninho.id.desc()).limit(limite)
+
+
+def paginar_ninhos(args, *filtros):
+    """
+    Página de ninhos em ordem decrescente de (data_registro, id), usando
+    paginação por cursor (keyset): cada página é uma busca por intervalo no
+    índice, com custo independente de quantas páginas vieram antes.
+    Só as colunas pedidas em `fields` são selecionadas. Com format=columnar,
+    os nomes dos campos vêm uma vez e os valores em uma lista por campo.
+    """
+    limite, posicao, campos, formato = ler_parametros(args)
+    linhas = consulta_pagina(campos, posicao, limite + 1, *filtros).all()
+
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo_cursor = codificar_cursor(linhas[-1].chave_data, linhas[-1].chave_id)
+
+    if formato == 'columnar':
+        return {'campos': campos, 'colunas': linhas_para_colunas(linhas, campos), 'proximo_cursor': proximo_cursor}
+    ninhos = [linha_para_dict(linha, campos) for linha in linhas]
+    return {'ninhos': ninhos, 'proximo_cursor': proximo_cursor}
@@ -0,0 +1,126 @@
+import sqlite3
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMedido(QueuePool):
+    """QueuePool que conta quantas vezes uma requisição esperou por conexão e quantas desistiram (timeout)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_metricas = threading.Lock()
+        self.esperas = 0
+        self.tempo_espera = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        # Sem conexão ociosa e sem overflow disponível: a chamada vai bloquear
+        cheio = self._max_overflow > -1 and self.checkedin() == 0 and self.checkedout() >= self.size() + self._max_overflow
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._lock_metricas:
+                self.timeouts += 1
+            raise
+        finally:
+            if cheio:
+                with self._lock_metricas:
+                    self.esperas += 1
+                    self.tempo_espera += time.perf_counter() - inicio
+
+
+class PerfilBanco:
+    """
+    Opções do engine conforme o banco em uso. Deve ser inicializado antes do
+    db.init_app, pois define SQLALCHEMY_ENGINE_OPTIONS.
+
+    - SQLite: journal WAL (leitores não esperam o escritor), synchronous=NORMAL,
+      busy_timeout e mmap_size aplicados a cada conexão aberta.
+    - PostgreSQL: pool dimensionado pelas threads de cada worker do gunicorn
+      (WEB_THREADS) mais as threads de segundo plano (DB_POOL_EXTRA), com
+      pre-ping e reciclagem das conexões.
+
+    Nos dois casos o pool é um PoolMedido, cujo estado sai em estado_pool().
+    """
+
+    def __init__(self, app=None):
+        self.config = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('WEB_THREADS', 1)
+        app.config.setdefault('DB_POOL_EXTRA', 2)
+        app.config.setdefault('DB_POOL_SIZE', app.config['WEB_THREADS'] + app.config['DB_POOL_EXTRA'])
+        app.config.setdefault('DB_MAX_OVERFLOW', app.config['DB_POOL_SIZE'])
+        app.config.setdefault('DB_POOL_TIMEOUT', 10)
+        app.config.setdefault('DB_POOL_RECYCLE', 1800)
+        app.config.setdefault('SQLITE_JOURNAL_MODE', 'WAL')
+        app.config.setdefault('SQLITE_SYNCHRONOUS', 'NORMAL')
+        app.config.setdefault('SQLITE_BUSY_TIMEOUT_MS', 5000)
+        app.config.setdefault('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+        self.config = app.config
+
+        opcoes = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        for chave, valor in self.opcoes_engine(app.config['SQLALCHEMY_DATABASE_URI']).items():
+            opcoes.setdefault(chave, valor)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes
+        event.listen(Engine, 'connect', self._ao_conectar)
+        app.extensions['perfil_banco'] = self
+
+    def opcoes_engine(self, uri):
+        url = make_url(uri)
+        if url.get_backend_name() == 'sqlite':
+            if url.database in (None, '', ':memory:'):
+                return {}
+            return {
+                'poolclass': PoolMedido,
+                'pool_size': self.config['DB_POOL_SIZE'],
+                'max_overflow': self.config['DB_MAX_OVERFLOW'],
+                'pool_timeout': self.config['DB_POOL_TIMEOUT'],
+            }
+        return {
+            'poolclass': PoolMedido,
+            'pool_size': self.config['DB_POOL_SIZE'],
+            'max_overflow': self.config['DB_MAX_OVERFLOW'],
+            'pool_timeout': self.config['DB_POOL_TIMEOUT'],
+            'pool_recycle': self.config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+        }
+
+    def _ao_conectar(self, conexao_dbapi, registro):
+        if not isinstance(conexao_dbapi, sqlite3.Connection):
+            return
+        cursor = conexao_dbapi.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={int(self.config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.execute(f"PRAGMA journal_mode={self.config['SQLITE_JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA synchronous={self.config['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA mmap_size={int(self.config['SQLITE_MMAP_SIZE'])}")
+        cursor.close()
+
+
+def estado_pool(engine):
+    """Situação atual do pool de conexões, para monitoramento."""
+    pool = engine.pool
+    estado = {'dialeto': engine.dialect.name, 'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        estado.update({
+            'tamanho': pool.size(),
+            'em_uso': pool.checkedout(),
+            'ociosas': pool.checkedin(),
+            'overflow': pool.overflow(),
+        })
+    if isinstance(pool, PoolMedido):
+        estado.update({
+            'esperas': pool.esperas,
+            'tempo_espera_ms': round(pool.tempo_espera * 1000, 1),
+            'timeouts': pool.timeouts,
+        })
+    return estado
+
+
+perfil_banco = PerfilBanco()
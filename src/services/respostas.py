@@ -0,0 +1,115 @@
+import gzip
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from src.services.estaticos import COMPRIMIVEIS
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele fica o json da biblioteca padrão
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele só há gzip
+    brotli = None
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """
+    jsonify com o orjson, quando instalado: a mesma saída do provedor padrão
+    do Flask (chaves ordenadas, datas no formato HTTP, `default` para o resto),
+    exceto que textos não ASCII saem em UTF-8 em vez de escapados. Objetos que
+    o orjson recusa (inteiros acima de 64 bits, por exemplo) voltam ao json
+    da biblioteca padrão.
+    """
+
+    def _orjson(self, obj, indentar=False, nova_linha=False):
+        opcoes = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            opcoes |= orjson.OPT_SORT_KEYS
+        if indentar:
+            opcoes |= orjson.OPT_INDENT_2
+        if nova_linha:
+            opcoes |= orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(obj, default=self.default, option=opcoes)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.keys() - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._orjson(obj, indentar=bool(kwargs.get('indent'))).decode()
+        except orjson.JSONEncodeError:
+            return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            # Bytes direto para a resposta, sem passar por str
+            corpo = self._orjson(obj, indentar, nova_linha=True)
+        except orjson.JSONEncodeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(corpo, mimetype=self.mimetype)
+
+
+class Compressao:
+    """
+    Comprime as respostas da API (JSON e texto) acima de COMPRESS_MIN_SIZE
+    bytes com brotli ou gzip, conforme o Accept-Encoding do cliente; abaixo
+    disso o cabeçalho extra e a CPU não compensam. Respostas em streaming
+    (exportações) e arquivos enviados direto do disco passam intactos. O ETag
+    vira fraco, de modo que o 304 vale para qualquer codificação.
+    """
+
+    def __init__(self, app=None):
+        self.ativo = True
+        self.tamanho_minimo = 1024
+        self.nivel_gzip = 6
+        self.qualidade_brotli = 4
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', self.tamanho_minimo)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', self.nivel_gzip)
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', self.qualidade_brotli)
+        self.ativo = app.config['COMPRESS_ENABLED']
+        self.tamanho_minimo = app.config['COMPRESS_MIN_SIZE']
+        self.nivel_gzip = app.config['COMPRESS_GZIP_LEVEL']
+        self.qualidade_brotli = app.config['COMPRESS_BROTLI_QUALITY']
+        # Registrar depois das métricas: os after_request rodam na ordem inversa,
+        # então as métricas contam os bytes já comprimidos
+        app.after_request(self._comprimir)
+        app.extensions['compressao'] = self
+
+    @staticmethod
+    def codificacoes():
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def comprimir(self, corpo, codificacao):
+        if codificacao == 'br':
+            return brotli.compress(corpo, quality=self.qualidade_brotli)
+        return gzip.compress(corpo, compresslevel=self.nivel_gzip, mtime=0)
+
+    def _comprimir(self, resposta):
+        if (not self.ativo or resposta.direct_passthrough or resposta.is_streamed
+                or resposta.status_code in (204, 304) or 'Content-Encoding' in resposta.headers
+                or not (resposta.mimetype or '').startswith(COMPRIMIVEIS)
+                or (resposta.content_length or 0) < self.tamanho_minimo):
+            return resposta
+        resposta.vary.add('Accept-Encoding')
+        codificacao = request.accept_encodings.best_match(self.codificacoes())
+        if not codificacao:
+            return resposta
+        resposta.set_data(self.comprimir(resposta.get_data(), codificacao))
+        resposta.headers['Content-Encoding'] = codificacao
+        etag, fraco = resposta.get_etag()
+        if etag and not fraco:
+            resposta.set_etag(etag, weak=True)
+        return resposta
+
+
+compressao = Compressao()
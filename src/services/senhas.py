@@ -0,0 +1,97 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class ServicoSenhasOcupado(Exception):
+    """Há mais cálculos de hash pendentes do que o limite configurado."""
+
+
+class ServicoSenhas:
+    """
+    Gera e confere hashes de senha com os parâmetros da configuração
+    (PASSWORD_HASH_METHOD, no formato do Werkzeug: 'scrypt:n:r:p' ou
+    'pbkdf2:sha256:iteracoes').
+
+    Por padrão (PASSWORD_HASH_WORKERS = 0) o hash é calculado na própria
+    thread da requisição. Com PASSWORD_HASH_WORKERS > 0 o cálculo vai para um
+    pool limitado de threads (o scrypt e o pbkdf2 do hashlib liberam o GIL),
+    então uma rajada de logins ocupa no máximo esse número de núcleos por
+    processo e o excedente espera na fila em vez de tomar a CPU das demais
+    rotas. Isso só tem efeito com workers web de várias threads (WEB_THREADS
+    > 1): com uma thread por processo há no máximo um hash por vez de qualquer
+    forma, e o pool só acrescentaria a troca de thread. Se a fila passar de
+    PASSWORD_HASH_MAX_PENDING, a espera por vaga é limitada por
+    PASSWORD_HASH_QUEUE_TIMEOUT segundos e então ServicoSenhasOcupado é levantada.
+    """
+
+    def __init__(self, app=None):
+        self.metodo = 'scrypt:32768:8:1'
+        self.tamanho_sal = 16
+        self.workers = 0
+        self.max_pendentes = 32
+        self.tempo_espera = 10
+        self._pool = None
+        self._vagas = None
+        self._prefixos = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', self.metodo)
+        app.config.setdefault('PASSWORD_HASH_SALT_LENGTH', self.tamanho_sal)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', self.workers)
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', self.max_pendentes)
+        app.config.setdefault('PASSWORD_HASH_QUEUE_TIMEOUT', self.tempo_espera)
+        self.configurar(
+            app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_SALT_LENGTH'],
+            app.config['PASSWORD_HASH_WORKERS'], app.config['PASSWORD_HASH_MAX_PENDING'],
+            app.config['PASSWORD_HASH_QUEUE_TIMEOUT']
+        )
+        app.extensions['senhas'] = self
+
+    def configurar(self, metodo, tamanho_sal=16, workers=0, max_pendentes=32, tempo_espera=10):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+            self.metodo = metodo
+            self.tamanho_sal = tamanho_sal
+            self.workers = workers
+            self.max_pendentes = max_pendentes
+            self.tempo_espera = tempo_espera
+            self._pool = None
+
+    def _executar(self, funcao, *args):
+        if self.workers <= 0:
+            return funcao(*args)
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='senhas')
+                self._vagas = threading.BoundedSemaphore(self.max_pendentes)
+            pool, vagas = self._pool, self._vagas
+        if not vagas.acquire(timeout=self.tempo_espera):
+            raise ServicoSenhasOcupado('Muitas verificações de senha em andamento; tente novamente.')
+        try:
+            return pool.submit(funcao, *args).result()
+        finally:
+            vagas.release()
+
+    def gerar(self, senha):
+        return self._executar(generate_password_hash, senha, self.metodo, self.tamanho_sal)
+
+    def verificar(self, hash_senha, senha):
+        return self._executar(check_password_hash, hash_senha, senha)
+
+    def prefixo(self, metodo):
+        """Prefixo 'metodo:parametros' que o Werkzeug grava para o método (ex.: 'scrypt' -> 'scrypt:32768:8:1')."""
+        if metodo not in self._prefixos:
+            self._prefixos[metodo] = generate_password_hash('', metodo, 1).split('$', 1)[0]
+        return self._prefixos[metodo]
+
+    def precisa_rehash(self, hash_senha):
+        """True se o hash foi gerado com parâmetros diferentes dos configurados."""
+        return hash_senha.split('$', 1)[0] != self.prefixo(self.metodo)
+
+
+senhas = ServicoSenhas()
@@ -139,6 +139,20 @@ async function apiCall(endpoint, options = {}) {
     }
 }
 
+// Percorre todas as páginas de um endpoint paginado por cursor. As páginas vêm
+// no formato colunar (nomes dos campos uma vez só) e são remontadas em objetos.
+async function apiCallAllPages(endpoint) {
+    const separator = endpoint.includes('?') ? '&' : '?';
+    let items = [], cursor = null;
+    do {
+        const data = await apiCall(`${endpoint}${separator}limit=500&format=columnar${cursor ? `&cursor=${cursor}` : ''}`);
+        const linhas = data.colunas[0].map((_, i) => Object.fromEntries(data.campos.map((campo, j) => [campo, data.colunas[j][i]])));
+        items = items.concat(linhas);
+        cursor = data.proximo_cursor;
+    } while (cursor);
+    return items;
+}
+
 async function checkAuthStatus() {
     try {
         const data = await apiCall('/auth/me');
@@ -224,9 +238,7 @@ async function handleCreateNinho(e) {
     try {
         const foto = formData.get('foto');
         if (foto && foto.size > 0) {
-            const uploadFormData = new FormData();
-            uploadFormData.append('file', foto);
-            const uploadData = await apiCall('/upload', { method: 'POST', body: uploadFormData });
+            const uploadData = await uploadFoto(foto);
             ninhoData.foto_path = uploadData.file_path;
         }
         delete ninhoData.foto;
@@ -240,11 +252,46 @@ async function handleCreateNinho(e) {
     }
 }
 
+// Upload retomável em partes: com sinal fraco em campo, uma queda só reenvia a parte em curso
+const PARTE_UPLOAD = 512 * 1024;
+
+async function uploadFoto(foto) {
+    if (!window.crypto?.subtle) {
+        // Sem Web Crypto (página fora de HTTPS) não há como calcular o SHA-256: upload simples
+        const uploadFormData = new FormData();
+        uploadFormData.append('file', foto);
+        return apiCall('/upload', { method: 'POST', body: uploadFormData });
+    }
+    const json = { 'Content-Type': 'application/json' };
+    const resumo = await crypto.subtle.digest('SHA-256', await foto.arrayBuffer());
+    const sha256 = Array.from(new Uint8Array(resumo), b => b.toString(16).padStart(2, '0')).join('');
+    const envio = await apiCall('/upload/sessoes', { method: 'POST', headers: json, body: JSON.stringify({ nome: foto.name, tamanho: foto.size }) });
+    let recebido = 0, falhas = 0;
+    while (recebido < foto.size) {
+        try {
+            const response = await fetch(`/api/upload/sessoes/${envio.id}?deslocamento=${recebido}`, {
+                method: 'PUT', headers: { 'Content-Type': 'application/octet-stream' },
+                body: foto.slice(recebido, recebido + PARTE_UPLOAD),
+            });
+            const data = await response.json();
+            if (response.ok || response.status === 409) { recebido = data.recebido; falhas = 0; continue; }
+            if (response.status < 500 && response.status !== 429) throw new Error(data.error);
+        } catch (error) {
+            if (!(error instanceof TypeError)) throw error;  // TypeError: falha de rede
+        }
+        if (++falhas > 5) throw new Error('Conexão instável: não foi possível enviar a foto.');
+        await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** falhas));
+        // Pergunta ao servidor quanto chegou antes de retomar (se ainda sem rede, o 409 da próxima parte diz)
+        try { recebido = (await apiCall(`/upload/sessoes/${envio.id}`)).recebido; } catch (error) { /* tenta de novo */ }
+    }
+    return apiCall(`/upload/sessoes/${envio.id}/concluir`, { method: 'POST', headers: json, body: JSON.stringify({ sha256 }) });
+}
+
 async function loadNinhos() {
     const listEl = sel('#ninhos-list');
     listEl.innerHTML = '<p>Carregando seus ninhos...</p>';
     try {
-        const data = await apiCall('/ninhos');
+        const data = { ninhos: await apiCallAllPages('/ninhos') };
         if (data.ninhos.length === 0) {
             listEl.innerHTML = '<p>Você ainda não cadastrou nenhum ninho.</p>';
             return;
@@ -264,7 +311,7 @@ async function loadNinhos() {
                         Registrado em: ${new Date(n.data_registro).toLocaleDateString('pt-BR')}
                     </div>
                 </div>
-                ${n.foto_path ? `<img src="/uploads/${n.foto_path.split('/')[1]}" style="width:60px;height:60px;border-radius:8px;">` : ''}
+                ${n.foto_path ? `<img src="/api/uploads/${n.foto_path.split('/')[1]}?tamanho=p" style="width:60px;height:60px;border-radius:8px;">` : ''}
             </div>
         `}).join('');
     } catch (error) {
@@ -353,7 +400,7 @@ async function loadReportDataAndRenderTable() {
     const container = sel('#report-table-container');
     container.innerHTML = '<p>Carregando todos os registros...</p>';
     try {
-        allNestsReportData = await apiCall('/relatorios/ninhos/data');
+        allNestsReportData = await apiCallAllPages('/relatorios/ninhos/data?fields=regiao,quantidade_ovos,status,risco,data_registro,usuario_nome');
         sel('#filter-regiao').value = '';
         sel('#filter-status').value = '';
         sel('#filter-risco').value = '';